@@ -0,0 +1,63 @@
+from argparse import ArgumentParser
+import json
+import random
+import time
+
+import depthai as dai
+
+from robopipe_api.detections_stream import pack_detections
+from robopipe_api.utils.detections_parser import parse_detections
+
+
+def create_detections(count: int, spatial: bool):
+    detections = dai.SpatialImgDetections() if spatial else dai.ImgDetections()
+    items = []
+
+    for _ in range(count):
+        detection = dai.SpatialImgDetection() if spatial else dai.ImgDetection()
+        detection.label = random.randint(0, 80)
+        detection.confidence = random.random()
+        detection.xmin, detection.ymin = random.random() / 2, random.random() / 2
+        detection.xmax, detection.ymax = detection.xmin + 0.5, detection.ymin + 0.5
+
+        if spatial:
+            detection.spatialCoordinates = dai.Point3f(
+                random.uniform(-1000, 1000),
+                random.uniform(-1000, 1000),
+                random.uniform(0, 5000),
+            )
+
+        items.append(detection)
+
+    detections.detections = items
+
+    return detections
+
+
+def run(detections, messages: int, binary: bool):
+    start = time.perf_counter()
+
+    for _ in range(messages):
+        if binary:
+            message = pack_detections(detections)
+        else:
+            message = json.dumps({"detections": parse_detections(detections)})
+
+    return (time.perf_counter() - start) / messages * 1e6, len(message)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="Compare JSON and binary detections messages")
+    parser.add_argument("-d", "--detections", type=int, default=50)
+    parser.add_argument("-n", "--messages", type=int, default=3000)
+    parser.add_argument("--spatial", action="store_true")
+    args = parser.parse_args()
+
+    detections = create_detections(args.detections, args.spatial)
+
+    print(f"{args.detections} detections, {args.messages} messages")
+    print(f"{'format':<10}{'serialize us':>14}{'size B':>10}")
+
+    for name, binary in (("json", False), ("binary", True)):
+        duration, size = run(detections, args.messages, binary)
+        print(f"{name:<10}{duration:>14.1f}{size:>10}")
@@ -0,0 +1,93 @@
+from argparse import ArgumentParser
+import fractions
+import time
+
+import av
+import depthai as dai
+import numpy as np
+
+from robopipe_api.utils.image import img_frame_to_video_frame
+
+
+def create_img_frame(width: int, height: int, img_type: dai.RawImgFrame.Type):
+    if img_type == dai.RawImgFrame.Type.NV12:
+        data = np.random.randint(0, 256, width * height * 3 // 2, dtype=np.uint8)
+    else:
+        data = np.random.randint(0, 256, width * height, dtype=np.uint8)
+
+    img_frame = dai.ImgFrame()
+    img_frame.setType(img_type)
+    img_frame.setWidth(width)
+    img_frame.setHeight(height)
+    img_frame.setData(data)
+
+    return img_frame
+
+
+def create_codec_context(width: int, height: int, fps: int, pix_fmt: str):
+    codec_context = av.CodecContext.create("libx264", "w")
+    codec_context.width = width
+    codec_context.height = height
+    codec_context.pix_fmt = pix_fmt
+    codec_context.time_base = 1 / fractions.Fraction(fps)
+    codec_context.options = {"tune": "zerolatency", "preset": "ultrafast"}
+    codec_context.open()
+
+    return codec_context
+
+
+def run(img_frame: dai.ImgFrame, frames: int, fps: int, rgb_round_trip: bool):
+    sample_frame = img_frame_to_video_frame(img_frame)
+    pix_fmt = "yuv420p"
+
+    if not rgb_round_trip and sample_frame.format.name == "nv12":
+        pix_fmt = "nv12"
+
+    codec_context = create_codec_context(
+        img_frame.getWidth(), img_frame.getHeight(), fps, pix_fmt
+    )
+    conversion = 0.0
+    encoding = 0.0
+
+    for pts in range(frames):
+        start = time.perf_counter()
+        frame = img_frame_to_video_frame(img_frame)
+
+        if rgb_round_trip:
+            frame = frame.to_rgb()
+
+        frame.pts = pts
+        converted = time.perf_counter()
+        codec_context.encode(frame)
+        encoded = time.perf_counter()
+
+        conversion += converted - start
+        encoding += encoded - converted
+
+    codec_context.encode(None)
+
+    return conversion / frames * 1000, encoding / frames * 1000
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="Compare RGB round trip with native encoding")
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument("-n", "--frames", type=int, default=300)
+    parser.add_argument("-t", "--type", choices=["NV12", "RAW8"], default="NV12")
+    args = parser.parse_args()
+
+    img_frame = create_img_frame(
+        args.width, args.height, getattr(dai.RawImgFrame.Type, args.type)
+    )
+
+    print(f"{args.type} {args.width}x{args.height}, {args.frames} frames")
+    print(f"{'path':<10}{'convert ms':>12}{'encode ms':>12}{'total ms':>12}")
+
+    for name, rgb_round_trip in (("rgb24", True), ("native", False)):
+        conversion, encoding = run(img_frame, args.frames, args.fps, rgb_round_trip)
+        print(
+            f"{name:<10}{conversion:>12.2f}{encoding:>12.2f}"
+            f"{conversion + encoding:>12.2f}"
+        )
@@ -0,0 +1,72 @@
+from argparse import ArgumentParser
+import threading
+import time
+
+import av
+import numpy as np
+
+from robopipe_api.process_encoder import ProcessVideoEncoder
+from robopipe_api.video_encoder import VideoEncoder
+
+
+class SyntheticSensor:
+    class config:
+        fps = 30
+
+    def __init__(self, width: int, height: int):
+        self.array = np.random.randint(0, 256, (height * 3 // 2, width), dtype=np.uint8)
+
+    def get_video_array(self):
+        self.array = np.roll(self.array, 4, axis=1)
+
+        return self.array, "nv12", time.monotonic()
+
+    def get_video_frame(self):
+        return av.VideoFrame.from_ndarray(*self.get_video_array()[:2])
+
+
+def encode(encoder: VideoEncoder, frames: int):
+    for _ in range(frames):
+        fragment = encoder.encode_frame(encoder.read_frame())
+
+        if fragment is not None:
+            fragment.release()
+
+
+def run(streams: int, frames: int, width: int, height: int, in_process: bool):
+    encoder_class = ProcessVideoEncoder if in_process else VideoEncoder
+    encoders = [encoder_class(SyntheticSensor(width, height)) for _ in range(streams)]
+    threads = [
+        threading.Thread(target=encode, args=(encoder, frames)) for encoder in encoders
+    ]
+
+    start = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed = time.perf_counter() - start
+
+    if in_process:
+        for encoder in encoders:
+            encoder.close()
+
+    return streams * frames / elapsed
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(prog="Compare thread and process video encoding")
+    parser.add_argument("-s", "--streams", type=int, default=4)
+    parser.add_argument("-n", "--frames", type=int, default=150)
+    parser.add_argument("--width", type=int, default=1920)
+    parser.add_argument("--height", type=int, default=1080)
+    args = parser.parse_args()
+
+    print(f"{args.streams} streams of {args.width}x{args.height} NV12")
+
+    for name, in_process in (("threads", False), ("processes", True)):
+        fps = run(args.streams, args.frames, args.width, args.height, in_process)
+        print(f"{name:<10}{fps:>8.1f} frames/s total")
@@ -1,4 +1,6 @@
 import sys
 from .robopipe import main
 
-sys.exit(main())
+# Encoder worker processes are spawned and import the main module again
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,205 @@
+import anyio
+import anyio.from_thread
+import anyio.to_thread
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Hashable
+
+from .camera.camera_manager import CameraManager
+from .camera.sensor.sensor_base import SensorBase
+from .error import SensorNotFoundException
+from .log import logger
+from .stream import StreamKey
+from .subscriber import DropPolicy, SubscriberQueue
+from .websocket import MessageSink
+
+
+class BroadcastSubscriber:
+    def __init__(
+        self,
+        handler: MessageSink,
+        max_queue_size: int,
+        variant: Hashable = None,
+        decimation: int = 1,
+    ):
+        self.handler = handler
+        self.variant = variant
+        self.decimation = decimation
+        # Every message stands on its own, so a slow client skips to the latest ones
+        self.queue = SubscriberQueue(max_queue_size, DropPolicy.DROP_OLDEST)
+        self.sent = 0
+
+    def wants(self, index: int) -> bool:
+        return index % self.decimation == 0
+
+    async def send_messages(self):
+        async for message in self.queue:
+            await self.handler.send(message)
+            self.sent += 1
+
+
+class BroadcastStream:
+    def __init__(self, sensor: SensorBase):
+        self.sensor = sensor
+        self.subscribers: list[BroadcastSubscriber] = []
+        self.capturing = False
+        self.index = 0
+
+    def broadcast(self, index: int, messages: dict[Hashable, Any] | None):
+        for subscriber in self.subscribers:
+            if messages is None:
+                subscriber.queue.close()
+            elif subscriber.variant in messages and subscriber.wants(index):
+                subscriber.queue.put(messages[subscriber.variant])
+
+
+class BroadcastService(ABC):
+    # Used in the logs, e.g. "MJPEG subscriber ... dropped frames"
+    NAME = "Broadcast"
+    ITEMS = "messages"
+
+    def __init__(self, camera_manager: CameraManager):
+        self.camera_manager = camera_manager
+        self.streams: dict[StreamKey, BroadcastStream] = {}
+
+    def __del__(self):
+        self.stop()
+
+    def stop(self):
+        for stream in self.streams.values():
+            stream.broadcast(0, None)
+
+        self.streams.clear()
+
+    def open(self, sensor: SensorBase) -> Any:
+        return sensor
+
+    def close(self, source: Any):
+        pass
+
+    @abstractmethod
+    def read(self, source: Any) -> Any: ...
+
+    @abstractmethod
+    def serialize(self, source: Any, item: Any, variant: Hashable) -> Any: ...
+
+    async def subscribe(
+        self,
+        key: StreamKey,
+        handler: MessageSink,
+        on_close: Callable[[], None] | None = None,
+        max_queue_size: int = 2,
+        variant: Hashable = None,
+        decimation: int = 1,
+    ):
+        mxid, sensor_name = key
+        camera = self.camera_manager[mxid]
+
+        if sensor_name not in camera.sensors.keys():
+            raise SensorNotFoundException()
+
+        sensor = camera.sensors[sensor_name]
+
+        if key not in self.streams or self.streams[key].sensor is not sensor:
+            self.streams[key] = BroadcastStream(sensor)
+
+        stream = self.streams[key]
+        subscriber = BroadcastSubscriber(handler, max_queue_size, variant, decimation)
+        stream.subscribers.append(subscriber)
+
+        async with anyio.create_task_group() as tg:
+            if not stream.capturing:
+                stream.capturing = True
+                tg.start_soon(anyio.to_thread.run_sync, self.stream, key, stream)
+
+            try:
+                await subscriber.send_messages()
+            except Exception:
+                pass
+
+            self.unsubscribe(key, handler)
+
+            try:
+                await handler.close()
+            except Exception:
+                pass
+
+            if on_close is not None:
+                on_close()
+
+    def unsubscribe(self, key: StreamKey, handler: MessageSink):
+        stream = self.streams.get(key)
+
+        if stream is None:
+            return
+
+        for subscriber in stream.subscribers:
+            if subscriber.handler != handler:
+                continue
+
+            stream.subscribers.remove(subscriber)
+            subscriber.queue.close()
+            subscriber.queue.clear()
+            logger.debug(
+                f"{self.NAME} subscriber of {key} left after {subscriber.sent} sent and "
+                f"{subscriber.queue.dropped} dropped {self.ITEMS}"
+            )
+            break
+
+        if not stream.subscribers:
+            del self.streams[key]
+
+    def end_capture(
+        self, key: StreamKey, stream: BroadcastStream, failed: bool = False
+    ) -> bool:
+        # Runs on the event loop, so a joining subscriber either keeps the capture
+        # going or finds it stopped and starts a new one
+        if not failed and self.streams.get(key) is stream and stream.subscribers:
+            return False
+
+        stream.capturing = False
+
+        if failed and self.streams.get(key) is stream:
+            del self.streams[key]
+
+        # Subscribers of a replaced or failed stream are not closed by anyone else
+        if self.streams.get(key) is not stream:
+            stream.broadcast(0, None)
+
+        return True
+
+    def stream(self, key: StreamKey, stream: BroadcastStream):
+        source = self.open(stream.sensor)
+
+        try:
+            while True:
+                if not (self.streams.get(key) is stream and stream.subscribers):
+                    if anyio.from_thread.run_sync(self.end_capture, key, stream):
+                        break
+
+                    continue
+
+                try:
+                    item = self.read(source)
+                except:
+                    anyio.from_thread.run_sync(self.end_capture, key, stream, True)
+                    break
+
+                index = stream.index
+                stream.index += 1
+                variants = {
+                    subscriber.variant
+                    for subscriber in list(stream.subscribers)
+                    if subscriber.wants(index)
+                }
+
+                # An item is serialized once per variant and shared by its subscribers
+                messages = {
+                    variant: self.serialize(source, item, variant)
+                    for variant in variants
+                }
+
+                if messages:
+                    anyio.from_thread.run_sync(stream.broadcast, index, messages)
+        finally:
+            self.close(source)
@@ -0,0 +1,51 @@
+import anyio
+import anyio.to_thread
+import depthai as dai
+
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import time
+from typing import AsyncIterator, Generator
+
+from .utils.image import encode_img_frame
+from .utils.tar_stream import TAR_END, tar_entry
+
+
+async def stream_burst_archive(
+    img_frames: Generator[dai.ImgFrame, None, None],
+    format: str = "jpeg",
+    max_workers: int | None = None,
+) -> AsyncIterator[bytes]:
+    pending: deque[tuple[str, float, Future[bytes]]] = deque()
+
+    # PIL releases the GIL while encoding, so the images are encoded in parallel
+    # with each other and with the capture of the following frames
+    executor = ThreadPoolExecutor(max_workers or os.cpu_count())
+
+    # Driven from the event loop, so a disconnected client cancels the burst and
+    # the finally clause stops the capture
+    try:
+        while (
+            img_frame := await anyio.to_thread.run_sync(next, img_frames, None)
+        ) is not None:
+            pending.append(
+                (
+                    f"{img_frame.getSequenceNum():08d}.{format}",
+                    time.time(),
+                    executor.submit(encode_img_frame, img_frame, format),
+                )
+            )
+
+            while pending and pending[0][2].done():
+                name, mtime, image = pending.popleft()
+                yield tar_entry(name, image.result(), mtime)
+
+        while pending:
+            name, mtime, image = pending.popleft()
+            yield tar_entry(name, await anyio.to_thread.run_sync(image.result), mtime)
+
+        yield TAR_END
+    finally:
+        img_frames.close()
+        executor.shutdown(wait=False, cancel_futures=True)
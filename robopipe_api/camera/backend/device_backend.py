@@ -0,0 +1,46 @@
+import depthai as dai
+
+from abc import ABC, abstractmethod
+from functools import lru_cache
+import os
+
+from ..pipeline.pipeline import Pipeline
+
+
+class DeviceBackend(ABC):
+    @abstractmethod
+    def get_all_connected_devices(self) -> list[dai.DeviceInfo]: ...
+
+    @abstractmethod
+    def open_device(self, name: str) -> dai.Device: ...
+
+    @abstractmethod
+    def boot_device(self, pipeline: Pipeline, name: str) -> dai.Device: ...
+
+
+class DepthaiBackend(DeviceBackend):
+    def get_all_connected_devices(self) -> list[dai.DeviceInfo]:
+        return dai.Device.getAllConnectedDevices()
+
+    def open_device(self, name: str) -> dai.Device:
+        return dai.Device(name)
+
+    def boot_device(self, pipeline: Pipeline, name: str) -> dai.Device:
+        return dai.Device(pipeline.pipeline, dai.DeviceInfo(name))
+
+
+@lru_cache(maxsize=1)
+def device_backend_factory() -> DeviceBackend:
+    backend = os.getenv("CAMERA_BACKEND") or "depthai"
+
+    if backend == "simulated":
+        from .simulated_backend import SimulatedBackend
+
+        return SimulatedBackend(
+            int(os.getenv("SIMULATED_CAMERAS") or 1),
+            os.getenv("SIMULATED_VIDEO_SOURCE"),
+        )
+    elif backend == "depthai":
+        return DepthaiBackend()
+
+    raise ValueError(f"Unknown camera backend: {backend}")
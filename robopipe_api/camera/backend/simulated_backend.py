@@ -0,0 +1,662 @@
+import av
+import depthai as dai
+import numpy as np
+
+from collections import deque
+import datetime
+import math
+import threading
+import time
+
+from ...log import logger
+from ...utils.detections_parser import CASCADE_HEADER
+from ..pipeline.depth_pipeline import DepthPipeline
+from ..roi import ROI_SEPARATOR
+from ..pipeline.pipeline import Pipeline
+from ..pipeline.pipeline_queue_type import PipelineQueueType
+from .device_backend import DeviceBackend
+
+
+class SimulatedOutputQueue:
+    def __init__(self, name: str, max_size: int = 16):
+        self.name = name
+        self.max_size = max(max_size, 1)
+        self.messages: deque = deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+    def put(self, message):
+        with self.condition:
+            if self.closed:
+                return
+
+            # Mirrors the non-blocking XLink outputs, slow readers lose old messages
+            self.messages.append(message)
+
+            while len(self.messages) > self.max_size:
+                self.messages.popleft()
+
+            self.condition.notify_all()
+
+    def __wait(self):
+        while not self.messages:
+            if self.closed:
+                raise RuntimeError(f"Communication exception - queue {self.name}")
+
+            self.condition.wait()
+
+    def get(self):
+        with self.condition:
+            self.__wait()
+
+            return self.messages.popleft()
+
+    def tryGet(self):
+        with self.condition:
+            return self.messages.popleft() if self.messages else None
+
+    def getAll(self) -> list:
+        with self.condition:
+            self.__wait()
+            messages = list(self.messages)
+            self.messages.clear()
+
+            return messages
+
+    def tryGetAll(self) -> list:
+        with self.condition:
+            messages = list(self.messages)
+            self.messages.clear()
+
+            return messages
+
+    def has(self) -> bool:
+        return bool(self.messages)
+
+    def close(self):
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+
+class SimulatedInputQueue:
+    def __init__(self, name: str, on_message):
+        self.name = name
+        self.on_message = on_message
+
+    def send(self, message):
+        self.on_message(message)
+
+
+class SimulatedFrameSource:
+    PATTERN_SPEED = 8
+
+    def __init__(self, video_path: str | None = None):
+        self.video_path = video_path
+        self.container = None
+        self.frame: av.VideoFrame | None = None
+        self.patterns: dict[tuple[int, int], np.ndarray] = {}
+        self.tick = 0
+
+    def advance(self):
+        self.tick += 1
+
+        if self.video_path is None:
+            return
+
+        while True:
+            if self.container is None:
+                self.container = av.open(self.video_path)
+
+            try:
+                self.frame = next(self.container.decode(video=0))
+                return
+            except StopIteration:
+                # Loops the file
+                self.container.close()
+                self.container = None
+
+    def read(self, width: int, height: int, format: str) -> np.ndarray:
+        if self.frame is not None:
+            if format == "bgr24p":
+                return (
+                    self.frame.reformat(width, height, "bgr24")
+                    .to_ndarray()
+                    .transpose((2, 0, 1))
+                )
+
+            return self.frame.reformat(width, height, format).to_ndarray()
+
+        luma = self.read_pattern(width, height)
+
+        if format == "nv12":
+            return np.vstack((luma, np.full((height // 2, width), 128, dtype=np.uint8)))
+        elif format == "bgr24p":
+            return np.stack((luma, luma, luma))
+
+        return luma
+
+    def read_pattern(self, width: int, height: int) -> np.ndarray:
+        if (width, height) not in self.patterns:
+            gradient = (np.arange(2 * width) * 255 // max(width - 1, 1)).astype(
+                np.uint8
+            )
+            self.patterns[(width, height)] = np.tile(gradient, (height, 1))
+
+        offset = self.tick * self.PATTERN_SPEED % width
+
+        return np.ascontiguousarray(
+            self.patterns[(width, height)][:, offset : offset + width]
+        )
+
+    def close(self):
+        if self.container is not None:
+            self.container.close()
+            self.container = None
+
+
+class SimulatedEncoder:
+    CODECS = {
+        dai.VideoEncoderProperties.Profile.H264_BASELINE: (
+            "libx264",
+            dai.EncodedFrame.Profile.AVC,
+        ),
+        dai.VideoEncoderProperties.Profile.H264_HIGH: (
+            "libx264",
+            dai.EncodedFrame.Profile.AVC,
+        ),
+        dai.VideoEncoderProperties.Profile.H264_MAIN: (
+            "libx264",
+            dai.EncodedFrame.Profile.AVC,
+        ),
+        dai.VideoEncoderProperties.Profile.H265_MAIN: (
+            "libx265",
+            dai.EncodedFrame.Profile.HEVC,
+        ),
+        dai.VideoEncoderProperties.Profile.MJPEG: (
+            "mjpeg",
+            dai.EncodedFrame.Profile.JPEG,
+        ),
+    }
+    OPTIONS = {
+        "libx264": {"tune": "zerolatency", "preset": "ultrafast"},
+        "libx265": {
+            "tune": "zerolatency",
+            "preset": "ultrafast",
+            "x265-params": "log-level=none",
+        },
+        "mjpeg": {},
+    }
+
+    def __init__(
+        self, node: dai.node.VideoEncoder, width: int, height: int, fps: float
+    ):
+        codec_name, self.profile = self.CODECS[node.getProfile()]
+        self.width = width
+        self.height = height
+        self.codec_context = av.CodecContext.create(codec_name, "w")
+        self.codec_context.width = width
+        self.codec_context.height = height
+        self.codec_context.pix_fmt = "yuvj420p" if codec_name == "mjpeg" else "yuv420p"
+        self.codec_context.time_base = 1 / av.utils.Fraction(round(fps))
+        self.codec_context.gop_size = node.getKeyframeFrequency()
+        self.codec_context.options = self.OPTIONS[codec_name]
+        self.frame_index = 0
+
+    def encode(
+        self, data: np.ndarray, format: str, timestamp: datetime.timedelta
+    ) -> list[dai.EncodedFrame]:
+        frame = av.VideoFrame.from_ndarray(data, format)
+        frame.pts = self.frame_index
+        self.frame_index += 1
+        encoded_frames = []
+
+        for packet in self.codec_context.encode(frame):
+            encoded_frame = dai.EncodedFrame()
+            encoded_frame.setData(np.frombuffer(bytes(packet), dtype=np.uint8))
+            encoded_frame.setProfile(self.profile)
+            encoded_frame.setFrameType(
+                dai.EncodedFrame.FrameType.I
+                if packet.is_keyframe
+                else dai.EncodedFrame.FrameType.P
+            )
+            encoded_frame.setWidth(self.width)
+            encoded_frame.setHeight(self.height)
+            encoded_frame.setSequenceNum(self.frame_index - 1)
+            encoded_frame.setTimestamp(timestamp)
+            encoded_frames.append(encoded_frame)
+
+        return encoded_frames
+
+
+def create_nn_data(layers: dict[str, list[float]]) -> dai.NNData:
+    # Layers set on the host are only serialized when sent to a device, the getters
+    # read the raw tensors
+    nn_data = dai.NNData()
+    raw = nn_data.getRaw()
+    tensors = []
+    data = b""
+
+    for name, values in layers.items():
+        tensor = dai.TensorInfo()
+        tensor.name = name
+        tensor.dataType = dai.TensorInfo.DataType.FP16
+        tensor.offset = len(data)
+        tensor.dims = [len(values)]
+        tensor.numDimensions = 1
+        tensor.strides = [2]
+        tensors.append(tensor)
+        data += np.array(values, dtype="<f2").tobytes()
+
+    raw.tensors = tensors
+    raw.data = list(data)
+
+    return nn_data
+
+
+class SimulatedSensor:
+    def __init__(
+        self,
+        device: "SimulatedDevice",
+        pipeline: Pipeline,
+        sensor_name: str,
+        video_source: str | None,
+    ):
+        self.device = device
+        self.sensor_name = sensor_name
+        self.source = SimulatedFrameSource(video_source)
+        self.capture_still = False
+
+        node = pipeline.get_sensor_node(sensor_name)
+        self.color = isinstance(node, (dai.node.ColorCamera, dai.node.Camera))
+        self.fps = node.getFps()
+
+        if isinstance(node, dai.node.MonoCamera):
+            self.width = node.getResolutionWidth()
+            self.height = node.getResolutionHeight()
+            self.still_size = (self.width, self.height)
+        else:
+            self.width, self.height = node.getVideoSize()
+            self.still_size = node.getStillSize()
+
+        roi_manips = getattr(pipeline, "rois", {}).get(sensor_name)
+        self.roi = roi_manips is not None
+
+        if self.roi:
+            # The image manips crop the video and still outputs of the sensor
+            video_config = roi_manips[PipelineQueueType.VIDEO].initialConfig
+            self.width = video_config.getResizeWidth()
+            self.height = video_config.getResizeHeight()
+            self.still_size = (
+                math.ceil(
+                    self.still_size[0]
+                    * (video_config.getCropXMax() - video_config.getCropXMin())
+                    / 2
+                )
+                * 2,
+                math.ceil(
+                    self.still_size[1]
+                    * (video_config.getCropYMax() - video_config.getCropYMin())
+                    / 2
+                )
+                * 2,
+            )
+
+        self.encoders: dict[PipelineQueueType, SimulatedEncoder] = {}
+
+        for queue_type, video_encoders in (
+            (PipelineQueueType.ENCODED, getattr(pipeline, "video_encoders", {})),
+            (PipelineQueueType.MJPEG, getattr(pipeline, "mjpeg_encoders", {})),
+        ):
+            if sensor_name in video_encoders:
+                self.encoders[queue_type] = SimulatedEncoder(
+                    video_encoders[sensor_name], self.width, self.height, self.fps
+                )
+
+        self.nn_node: dai.node.NeuralNetwork | None = None
+        self.nn_size: tuple[int, int] | None = None
+        self.cascade = sensor_name in getattr(pipeline, "cascades", {})
+
+        if sensor_name in getattr(pipeline, "neural_networks", {}):
+            self.nn_node = pipeline.neural_networks[sensor_name]
+            nn_config = pipeline.nn_configs.get(sensor_name)
+            # Networks rediscovered from a rebuilt pipeline have no config left
+            self.nn_size = (
+                tuple(nn_config.input_shape[:2])
+                if nn_config is not None
+                else (self.width, self.height)
+            )
+
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def get_queue(self, queue_type: PipelineQueueType) -> SimulatedOutputQueue | None:
+        return self.device.output_queues.get(
+            queue_type.get_queue_name(self.sensor_name)
+        )
+
+    def run(self):
+        sequence_num = 0
+        next_frame = time.monotonic()
+
+        try:
+            while not self.device.closed.is_set():
+                self.source.advance()
+                timestamp = datetime.timedelta(seconds=time.monotonic())
+                self.produce(sequence_num, timestamp)
+                sequence_num += 1
+
+                next_frame += 1 / self.fps
+                delay = next_frame - time.monotonic()
+
+                if delay > 0:
+                    self.device.closed.wait(delay)
+                else:
+                    # Can't keep up, drops the frames instead of catching up
+                    next_frame = time.monotonic()
+        except Exception as e:
+            logger.error(f"Simulated sensor {self.sensor_name} failed: {e}")
+        finally:
+            self.source.close()
+
+    def produce(self, sequence_num: int, timestamp: datetime.timedelta):
+        format = "nv12" if self.color else "gray"
+        img_type = dai.ImgFrame.Type.NV12 if self.color else dai.ImgFrame.Type.RAW8
+        data = None
+
+        def get_data():
+            nonlocal data
+
+            if data is None:
+                data = self.source.read(self.width, self.height, format)
+
+            return data
+
+        video_queue = self.get_queue(PipelineQueueType.VIDEO)
+
+        if video_queue is not None:
+            if self.nn_size is not None and not self.roi:
+                # The network's passthrough replaces the video output
+                width, height = self.nn_size
+                video_queue.put(
+                    self.create_img_frame(
+                        self.source.read(width, height, "bgr24p"),
+                        dai.ImgFrame.Type.BGR888p,
+                        width,
+                        height,
+                        sequence_num,
+                        timestamp,
+                    )
+                )
+            else:
+                video_queue.put(
+                    self.create_img_frame(
+                        get_data(),
+                        img_type,
+                        self.width,
+                        self.height,
+                        sequence_num,
+                        timestamp,
+                    )
+                )
+
+        still_queue = self.get_queue(PipelineQueueType.STILL)
+
+        # Mono and depth scripts forward every frame as a still
+        if still_queue is not None and (self.capture_still or not self.color):
+            self.capture_still = False
+            width, height = self.still_size
+            still_queue.put(
+                self.create_img_frame(
+                    self.source.read(width, height, format),
+                    img_type,
+                    width,
+                    height,
+                    sequence_num,
+                    timestamp,
+                )
+            )
+
+        for queue_type, encoder in self.encoders.items():
+            queue = self.get_queue(queue_type)
+
+            if queue is None:
+                continue
+
+            for encoded_frame in encoder.encode(get_data(), format, timestamp):
+                queue.put(encoded_frame)
+
+        nn_queue = self.get_queue(PipelineQueueType.NN)
+
+        if nn_queue is not None and self.nn_node is not None:
+            nn_queue.put(self.create_nn_output(sequence_num, timestamp))
+
+    @staticmethod
+    def create_img_frame(
+        data: np.ndarray,
+        img_type: dai.ImgFrame.Type,
+        width: int,
+        height: int,
+        sequence_num: int,
+        timestamp: datetime.timedelta,
+    ) -> dai.ImgFrame:
+        img_frame = dai.ImgFrame()
+        img_frame.setType(img_type)
+        img_frame.setWidth(width)
+        img_frame.setHeight(height)
+        img_frame.setData(data.reshape(-1))
+        img_frame.setSequenceNum(sequence_num)
+        img_frame.setTimestamp(timestamp)
+
+        return img_frame
+
+    def create_nn_output(self, sequence_num: int, timestamp: datetime.timedelta):
+        # A single detection sweeping across the frame
+        x = sequence_num % 100 / 125
+
+        if self.cascade:
+            # Combined by the script of the cascade, one classification per detection
+            output = dai.Buffer()
+            output.setData(
+                list(
+                    CASCADE_HEADER.pack(1, 8)
+                    + np.array(
+                        [0, 0.9, x, 0.4, x + 0.2, 0.6, 0.2, 0.8], "<f4"
+                    ).tobytes()
+                )
+            )
+            output.setSequenceNum(sequence_num)
+            output.setTimestamp(timestamp)
+
+            return output
+
+        if isinstance(self.nn_node, dai.node.SpatialDetectionNetwork):
+            output = dai.SpatialImgDetections()
+            detection = dai.SpatialImgDetection()
+            detection.spatialCoordinates = dai.Point3f(0, 0, 1000)
+        elif isinstance(self.nn_node, dai.node.DetectionNetwork):
+            output = dai.ImgDetections()
+            detection = dai.ImgDetection()
+        else:
+            output = create_nn_data({"output": [x, 0.4, x + 0.2, 0.6]})
+            output.setSequenceNum(sequence_num)
+            output.setTimestamp(timestamp)
+
+            return output
+
+        detection.label = 0
+        detection.confidence = 0.9
+        detection.xmin = x
+        detection.ymin = 0.4
+        detection.xmax = x + 0.2
+        detection.ymax = 0.6
+        output.detections = [detection]
+        output.setSequenceNum(sequence_num)
+        output.setTimestamp(timestamp)
+
+        return output
+
+
+class SimulatedDevice:
+    DEVICE_NAME = "OAK-D-SIMULATED"
+
+    def __init__(
+        self,
+        device_info: dai.DeviceInfo,
+        pipeline: Pipeline | None = None,
+        video_source: str | None = None,
+    ):
+        self.device_info = device_info
+        self.input_queues: dict[str, SimulatedInputQueue] = {}
+        self.output_queues: dict[str, SimulatedOutputQueue] = {}
+        self.closed = threading.Event()
+        self.sensors: dict[str, SimulatedSensor] = {}
+
+        if pipeline is None:
+            return
+
+        sensor_names = list(pipeline.cameras.keys())
+
+        if isinstance(pipeline, DepthPipeline) and pipeline.stereo_node is not None:
+            sensor_names.append(pipeline.get_depth_name())
+
+        sensor_names.extend(getattr(pipeline, "rois", {}).keys())
+
+        for sensor_name in sensor_names:
+            sensor = SimulatedSensor(self, pipeline, sensor_name, video_source)
+            self.sensors[sensor_name] = sensor
+            sensor.thread.start()
+
+    def close(self):
+        self.closed.set()
+
+        for queue in self.output_queues.values():
+            queue.close()
+
+        for sensor in self.sensors.values():
+            sensor.thread.join()
+
+    def getDeviceName(self) -> str:
+        return self.DEVICE_NAME
+
+    def getDeviceInfo(self) -> dai.DeviceInfo:
+        return self.device_info
+
+    def getConnectedCameraFeatures(self) -> list[dai.CameraFeatures]:
+        color = dai.CameraFeatures()
+        color.socket = dai.CameraBoardSocket.CAM_A
+        color.sensorName = "IMX378"
+        color.width = 4056
+        color.height = 3040
+        color.supportedTypes = [dai.CameraSensorType.COLOR]
+        color.hasAutofocusIC = True
+        features = [color]
+
+        for socket in (dai.CameraBoardSocket.CAM_B, dai.CameraBoardSocket.CAM_C):
+            mono = dai.CameraFeatures()
+            mono.socket = socket
+            mono.sensorName = "OV9282"
+            mono.width = 1280
+            mono.height = 800
+            mono.supportedTypes = [dai.CameraSensorType.MONO]
+            features.append(mono)
+
+        return features
+
+    def getAvailableStereoPairs(self) -> list[dai.StereoPair]:
+        stereo_pair = dai.StereoPair()
+        stereo_pair.left = dai.CameraBoardSocket.CAM_B
+        stereo_pair.right = dai.CameraBoardSocket.CAM_C
+
+        return [stereo_pair]
+
+    def getIrDrivers(self) -> list:
+        return []
+
+    def getInputQueue(self, name: str) -> SimulatedInputQueue:
+        if name not in self.input_queues:
+            self.input_queues[name] = SimulatedInputQueue(
+                name, lambda message: self.on_input(name, message)
+            )
+
+        return self.input_queues[name]
+
+    def getOutputQueue(
+        self, name: str, maxSize: int = 16, blocking: bool = True
+    ) -> SimulatedOutputQueue:
+        if name not in self.output_queues:
+            self.output_queues[name] = SimulatedOutputQueue(name, maxSize)
+
+        return self.output_queues[name]
+
+    def on_input(self, name: str, message):
+        queue_type, sensor_name = PipelineQueueType.parse_queue_name(name)
+
+        if (
+            queue_type == PipelineQueueType.CONTROL
+            and isinstance(message, dai.CameraControl)
+            and message.getCaptureStill()
+        ):
+            # The still output of a sensor also feeds its ROIs
+            for name, sensor in self.sensors.items():
+                if name == sensor_name or name.startswith(sensor_name + ROI_SEPARATOR):
+                    sensor.capture_still = True
+
+    def getChipTemperature(self) -> dai.ChipTemperature:
+        chip_temperature = dai.ChipTemperature()
+
+        for sensor in ("average", "css", "dss", "mss", "upa"):
+            setattr(chip_temperature, sensor, 40.0)
+
+        return chip_temperature
+
+    def getCmxMemoryUsage(self) -> dai.MemoryInfo:
+        return self.__create_memory_info(2 * 1024 * 1024)
+
+    def getDdrMemoryUsage(self) -> dai.MemoryInfo:
+        return self.__create_memory_info(512 * 1024 * 1024)
+
+    @staticmethod
+    def __create_memory_info(total: int) -> dai.MemoryInfo:
+        memory_info = dai.MemoryInfo()
+        memory_info.total = total
+        memory_info.used = 0
+        memory_info.remaining = total
+
+        return memory_info
+
+    def setIrFloodLightIntensity(self, intensity: float):
+        pass
+
+    def setIrLaserDotProjectorIntensity(self, intensity: float):
+        pass
+
+
+class SimulatedBackend(DeviceBackend):
+    def __init__(self, cameras: int = 1, video_source: str | None = None):
+        self.video_source = video_source
+        self.devices: list[dai.DeviceInfo] = []
+
+        for index in range(cameras):
+            device_info = dai.DeviceInfo()
+            device_info.name = f"SIMULATED{index}"
+            device_info.mxid = f"SIMULATED{index}"
+            device_info.state = dai.XLinkDeviceState.X_LINK_UNBOOTED
+            device_info.protocol = dai.XLinkProtocol.X_LINK_TCP_IP
+            device_info.platform = dai.XLinkPlatform.X_LINK_MYRIAD_X
+            self.devices.append(device_info)
+
+    def get_device_info(self, name: str) -> dai.DeviceInfo:
+        for device_info in self.devices:
+            if name in (device_info.name, device_info.mxid):
+                return device_info
+
+        raise RuntimeError(f"No simulated device named {name}")
+
+    def get_all_connected_devices(self) -> list[dai.DeviceInfo]:
+        return list(self.devices)
+
+    def open_device(self, name: str) -> SimulatedDevice:
+        return SimulatedDevice(self.get_device_info(name))
+
+    def boot_device(self, pipeline: Pipeline, name: str) -> SimulatedDevice:
+        return SimulatedDevice(self.get_device_info(name), pipeline, self.video_source)
@@ -2,8 +2,9 @@ import depthai as dai
 
 import time
 
-from ..error import CameraShutDownException, CameraException
+from ..error import CameraShutDownException, CameraException, SensorNotFoundException
 from ..log import logger
+from .backend.device_backend import DeviceBackend, device_backend_factory
 from .camera_stats import CameraStats
 from .device_info import DeviceInfo
 from .ir import IRConfig
@@ -12,6 +13,8 @@ from .pipeline.pipeline import Pipeline, PipelineQueueType
 from .pipeline.streaming_pipeline import StreamingPipeline
 from .pipeline.nn_pipeline import NNPipeline
 from .nn import CameraNNConfig
+from .roi import RoiConfig, get_roi_stream_name, parse_roi_stream_name
+from .video_encoding import VideoEncodingConfig
 from .sensor.depth_sensor import DepthSensor
 from .sensor.sensor_base import SensorBase
 from .sensor.sensor import Sensor
@@ -20,11 +23,21 @@ from .sensor.sensor import Sensor
 class Camera:
     DEFAULT_POE_IP = "169.254.1.222"
 
-    def __init__(self, mxid: str, name: str, pipeline: Pipeline | None = None):
+    def __init__(
+        self,
+        mxid: str,
+        name: str,
+        pipeline: Pipeline | None = None,
+        backend: DeviceBackend | None = None,
+    ):
         self.mxid = mxid
+        self.backend = backend or device_backend_factory()
         self.boot_name = name if name == Camera.DEFAULT_POE_IP else mxid
+        self.encodings: dict[str, VideoEncodingConfig] = {}
+        self.mjpeg_sensors: set[str] = set()
+        self.rois: dict[str, RoiConfig] = {}
 
-        self.camera_handle = dai.Device(self.boot_name)
+        self.camera_handle = self.backend.open_device(self.boot_name)
         self.camera_name = self.camera_handle.getDeviceName()
         self.all_sensors = {
             sensor.socket.name: sensor
@@ -56,8 +69,8 @@ class Camera:
 
         for _ in range(retries):
             try:
-                self.camera_handle = dai.Device(
-                    self.pipeline.pipeline, dai.DeviceInfo(self.boot_name)
+                self.camera_handle = self.backend.boot_device(
+                    self.pipeline, self.boot_name
                 )
                 return
             except Exception as e:
@@ -75,6 +88,10 @@ class Camera:
                 return self.camera_handle.getOutputQueue(
                     q_name, blocking=False, maxSize=1
                 )
+            elif q_type in (PipelineQueueType.ENCODED, PipelineQueueType.MJPEG):
+                return self.camera_handle.getOutputQueue(
+                    q_name, blocking=False, maxSize=30
+                )
             else:
                 return self.camera_handle.getOutputQueue(q_name)
 
@@ -108,6 +125,21 @@ class Camera:
                     restart_pipeline,
                 )
 
+        # ROIs share the controls of their sensor but have their own outputs
+        for stream_name in self.rois.keys():
+            sensor_name = parse_roi_stream_name(stream_name)[0]
+
+            if sensor_name in self.sensors and stream_name in getattr(
+                self.pipeline, "rois", {}
+            ):
+                self.sensors[stream_name] = Sensor(
+                    self.all_sensors[sensor_name],
+                    self.pipeline.cameras[sensor_name],
+                    self.__get_sensor_queues(sensor_name, True),
+                    self.__get_sensor_queues(stream_name, False),
+                    restart_pipeline,
+                )
+
         if (
             not any(map(lambda x: x.startswith("DEPTH"), self.all_sensors.keys()))
             or not isinstance(self.pipeline, DepthPipeline)
@@ -130,8 +162,22 @@ class Camera:
             self.pipeline = None
             logger.debug(f"Closed camera {self.mxid}")
 
+    def __apply_encodings(self, pipeline: Pipeline):
+        if not isinstance(pipeline, StreamingPipeline):
+            return
+
+        for stream_name, roi in self.rois.items():
+            pipeline.add_roi(stream_name, roi)
+
+        for sensor_name, encoding in self.encodings.items():
+            pipeline.set_video_encoding(sensor_name, encoding)
+
+        for sensor_name in self.mjpeg_sensors:
+            pipeline.add_mjpeg_encoder(sensor_name)
+
     def open(self, pipeline: Pipeline):
         self.close()
+        self.__apply_encodings(pipeline)
         self.pipeline = pipeline
         self.__boot_camera()
         self.reload_sensors()
@@ -155,7 +201,9 @@ class Camera:
             else:
                 self.pipeline = DepthPipeline(stereo_pair, [], self.pipeline.pipeline)
         else:
-            self.pipeline.add_sensor(self.all_sensors[sensor_name])
+            self.pipeline.add_sensor(
+                self.all_sensors[sensor_name], self.encodings.get(sensor_name)
+            )
 
         self.open(self.pipeline)
 
@@ -166,10 +214,91 @@ class Camera:
         if not isinstance(self.pipeline, StreamingPipeline):
             raise RuntimeError("Server is in invalid state")
 
+        if sensor_name in self.rois:
+            return self.remove_roi(sensor_name)
+
+        self.mjpeg_sensors.discard(sensor_name)
         self.pipeline.remove_sensor(sensor_name)
         self.open(self.pipeline)
 
+    def set_roi(self, sensor_name: str, roi_name: str, roi: RoiConfig) -> str:
+        if self.camera_handle is None:
+            raise CameraShutDownException()
+
+        if not isinstance(self.pipeline, StreamingPipeline):
+            raise RuntimeError("Server is in invalid state")
+
+        if sensor_name not in self.all_sensors:
+            raise SensorNotFoundException()
+
+        stream_name = get_roi_stream_name(sensor_name, roi_name)
+        self.rois[stream_name] = roi
+        self.all_sensors[stream_name] = self.all_sensors[sensor_name]
+        # The crop is part of the nodes, a changed ROI is built from scratch
+        self.pipeline.remove_roi(stream_name)
+        self.open(self.pipeline)
+
+        return stream_name
+
+    def remove_roi(self, stream_name: str):
+        if self.camera_handle is None:
+            raise CameraShutDownException()
+
+        if not isinstance(self.pipeline, StreamingPipeline):
+            raise RuntimeError("Server is in invalid state")
+
+        if stream_name not in self.rois:
+            raise SensorNotFoundException()
+
+        del self.rois[stream_name]
+        del self.all_sensors[stream_name]
+        self.encodings.pop(stream_name, None)
+        self.mjpeg_sensors.discard(stream_name)
+        self.pipeline.remove_roi(stream_name)
+        self.open(self.pipeline)
+
+    def set_encoding(self, sensor_name: str, encoding: VideoEncodingConfig):
+        if self.camera_handle is None:
+            raise CameraShutDownException()
+
+        if not isinstance(self.pipeline, StreamingPipeline):
+            raise RuntimeError("Server is in invalid state")
+
+        self.encodings[sensor_name] = encoding
+
+        if self.pipeline.set_video_encoding(sensor_name, encoding):
+            self.open(self.pipeline)
+
+    def enable_mjpeg(self, sensor_name: str):
+        if self.camera_handle is None:
+            raise CameraShutDownException()
+
+        if not isinstance(self.pipeline, StreamingPipeline):
+            raise RuntimeError("Server is in invalid state")
+
+        self.mjpeg_sensors.add(sensor_name)
+
+        if self.pipeline.add_mjpeg_encoder(sensor_name):
+            self.open(self.pipeline)
+
+    def disable_mjpeg(self, sensor_name: str):
+        if self.camera_handle is None:
+            raise CameraShutDownException()
+
+        if not isinstance(self.pipeline, StreamingPipeline):
+            raise RuntimeError("Server is in invalid state")
+
+        if sensor_name not in self.mjpeg_sensors:
+            return
+
+        self.mjpeg_sensors.discard(sensor_name)
+        self.pipeline.remove_mjpeg_encoder(sensor_name)
+        self.open(self.pipeline)
+
     def deploy_nn(self, nn: CameraNNConfig):
+        if nn.sensor_name in self.rois and nn.sensor_name not in self.sensors:
+            raise SensorNotFoundException()
+
         self.pipeline = NNPipeline([nn], self.pipeline.pipeline)
 
         self.open(self.pipeline)
@@ -186,7 +315,7 @@ class Camera:
                 self.camera_handle.getDeviceInfo(), self.camera_name
             )
 
-        devices = dai.Device.getAllConnectedDevices()
+        devices = self.backend.get_all_connected_devices()
 
         for dev in devices:
             if dev.getMxId() == self.mxid:
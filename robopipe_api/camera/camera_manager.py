@@ -1,8 +1,7 @@
-import depthai as dai
-
 from functools import lru_cache
 
 from ..error import CameraNotFoundException
+from .backend.device_backend import device_backend_factory
 from .camera import Camera
 from .pipeline.depth_pipeline import DepthPipeline
 from .pipeline.streaming_pipeline import StreamingPipeline
@@ -12,6 +11,7 @@ class CameraManager:
     cameras: dict[str, Camera] = {}
 
     def __init__(self):
+        self.backend = device_backend_factory()
         self.reload_cameras()
 
     def __getitem__(self, key: str):
@@ -26,13 +26,13 @@ class CameraManager:
         return self.cameras.get(key)
 
     def reload_cameras(self):
-        mxids = list(map(lambda x: x.getMxId(), dai.Device.getAllConnectedDevices()))
-        devices = dai.Device.getAllConnectedDevices()
+        devices = self.backend.get_all_connected_devices()
+        mxids = list(map(lambda x: x.getMxId(), devices))
 
         for dev in devices:
             mxid = dev.getMxId()
             if mxid not in self.cameras:
-                self.cameras[dev.mxid] = Camera(mxid, dev.name)
+                self.cameras[dev.mxid] = Camera(mxid, dev.name, backend=self.backend)
 
         for mxid in self.cameras.keys():
             if mxid not in mxids:
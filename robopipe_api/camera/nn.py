@@ -1,23 +1,40 @@
 import depthai as dai
 
+import dataclasses
 import pathlib
 
 
+@dataclasses.dataclass
+class BlobFile:
+    path: pathlib.Path
+    input_shape: list[int]
+    output_shape: list[int]
+
+
 class CameraNNConfig:
     def __init__(
         self,
         sensor_name: str,
         sensor: dai.CameraFeatures,
-        blob: dai.OpenVINO.Blob | pathlib.Path,
+        blob: dai.OpenVINO.Blob | BlobFile,
         num_inference_threads: int = 2,
     ):
         self.sensor_name = sensor_name
         self.sensor = sensor
-        self.blob = (
-            blob if isinstance(blob, dai.OpenVINO.Blob) else dai.OpenVINO.Blob(blob)
-        )
-        self.input_shape = list(self.blob.networkInputs.values())[0].dims
-        self.output_shape = list(self.blob.networkOutputs.values())[0].dims
+
+        if isinstance(blob, BlobFile):
+            # Loaded by depthai itself when the pipeline is built, without a copy
+            # in Python
+            self.blob = None
+            self.blob_path = blob.path
+            self.input_shape = blob.input_shape
+            self.output_shape = blob.output_shape
+        else:
+            self.blob = blob
+            self.blob_path = None
+            self.input_shape = list(blob.networkInputs.values())[0].dims
+            self.output_shape = list(blob.networkOutputs.values())[0].dims
+
         self.num_inference_threads = num_inference_threads
 
     def create_node(
@@ -28,10 +45,10 @@ class CameraNNConfig:
         return self.configure_node(node)
 
     def configure_node(self, node: dai.node.NeuralNetwork):
-        if isinstance(self.blob, dai.OpenVINO.Blob):
+        if self.blob_path is None:
             node.setBlob(self.blob)
         else:
-            node.setBlobPath(self.blob)
+            node.setBlobPath(self.blob_path)
 
         node.input.setBlocking(False)
         node.input.setQueueSize(1)
@@ -45,7 +62,7 @@ class CameraNNYoloConfig(CameraNNConfig):
         self,
         sensor_name: str,
         sensor: dai.CameraFeatures,
-        blob: dai.OpenVINO.Blob | pathlib.Path,
+        blob: dai.OpenVINO.Blob | BlobFile,
         num_inference_threads: int = 2,
         anchor_masks: dict[str, list[int]] | None = None,
         anchors: list[float] | None = None,
@@ -93,7 +110,7 @@ class CameraNNMobileNetConfig(CameraNNConfig):
         self,
         sensor_name: str,
         sensor: dai.CameraFeatures,
-        blob: dai.OpenVINO.Blob | pathlib.Path,
+        blob: dai.OpenVINO.Blob | BlobFile,
         num_inference_threads: int = 2,
         confidence_threshold: float | None = None,
     ):
@@ -114,3 +131,35 @@ class CameraNNMobileNetConfig(CameraNNConfig):
             node.setConfidenceThreshold(self.confidence_threshold)
 
         return super().configure_node(node)
+
+
+class CameraNNCascadeConfig:
+    def __init__(
+        self,
+        detector: CameraNNYoloConfig | CameraNNMobileNetConfig,
+        classifier: CameraNNConfig,
+        padding: float = 0,
+        max_crops: int = 8,
+    ):
+        self.detector = detector
+        self.classifier = classifier
+        self.padding = padding
+        self.max_crops = max_crops
+        self.sensor_name = detector.sensor_name
+        self.sensor = detector.sensor
+        self.input_shape = detector.input_shape
+
+    def create_node(
+        self, pipeline: dai.Pipeline, with_depth: bool = False
+    ) -> dai.node.DetectionNetwork:
+        # Crops are cut from the video, which depth is not aligned to
+        return self.detector.create_node(pipeline)
+
+    def create_classifier_node(self, pipeline: dai.Pipeline) -> dai.node.NeuralNetwork:
+        node = self.classifier.create_node(pipeline)
+        # Every crop is classified, in the order the crops were sent
+        node.input.setBlocking(True)
+        node.input.setQueueSize(self.max_crops)
+        node.setNumInferenceThreads(1)
+
+        return node
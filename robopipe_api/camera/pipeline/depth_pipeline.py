@@ -79,11 +79,17 @@ class DepthPipeline(StreamingPipeline):
                 except:
                     continue
 
-    def add_sensor(self, sensor):
+    def get_sensor_node(self, sensor_name: str):
+        if self.stereo_pair is not None and sensor_name == self.get_depth_name():
+            return self.cam_left_node
+
+        return super().get_sensor_node(sensor_name)
+
+    def add_sensor(self, sensor, encoding=None):
         if self.stereo_pair is not None and sensor.socket.name in self.stereo_pair:
             self.remove_stereo_pair()
 
-        return super().add_sensor(sensor)
+        return super().add_sensor(sensor, encoding)
 
     def add_stereo_pair(self, left: str, right: str):
         if self.stereo_pair is not None:
@@ -149,6 +155,8 @@ class DepthPipeline(StreamingPipeline):
 
         depth_name = self.get_depth_name()
 
+        self.remove_video_encoder(depth_name)
+        self.remove_mjpeg_encoder(depth_name)
         self.del_all_queues(depth_name)
         self.pipeline.remove(self.stereo_node)
         self.pipeline.remove(self.cam_left_node)
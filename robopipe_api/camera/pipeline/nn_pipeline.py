@@ -1,16 +1,30 @@
 import depthai as dai
 
-from ..nn import CameraNNConfig
+from ...utils.detections_parser import CASCADE_HEADER
+from ..nn import CameraNNCascadeConfig, CameraNNConfig
+from ..roi import parse_roi_stream_name
 from .depth_pipeline import DepthPipeline
 from .pipeline_queue_type import PipelineQueueType
 
 
 class NNPipeline(DepthPipeline):
+    # Video frames a cascade keeps waiting for the detector, plus the frame held by
+    # its script and the one being cropped
+    CASCADE_FRAMES_QUEUE_SIZE = 6
+    CASCADE_FRAMES_POOL = CASCADE_FRAMES_QUEUE_SIZE + 2
+    # Seconds the script of a cascade waits for the classifications of a frame
+    CASCADE_CLASSIFICATION_TIMEOUT = 0.5
+
     def __init__(
-        self, networks: list[CameraNNConfig], pipeline: dai.Pipeline | None = None
+        self,
+        networks: list[CameraNNConfig | CameraNNCascadeConfig],
+        pipeline: dai.Pipeline | None = None,
     ):
         self.neural_networks: dict[str, dai.node.NeuralNetwork] = {}
-        self.nn_configs: dict[str, CameraNNConfig] = {}
+        self.nn_configs: dict[str, CameraNNConfig | CameraNNCascadeConfig] = {}
+        self.cascades: dict[
+            str, tuple[dai.node.Script, dai.node.ImageManip, dai.node.NeuralNetwork]
+        ] = {}
         super().__init__(None, [], pipeline)
 
         for nn in networks:
@@ -39,6 +53,86 @@ class NNPipeline(DepthPipeline):
                 except:
                     continue
 
+            for queue_name, x_link in self.outputs.items():
+                queue_type, sensor_name = PipelineQueueType.parse_queue_name(queue_name)
+
+                if queue_type != PipelineQueueType.NN or sensor_name not in self.rois:
+                    continue
+
+                try:
+                    neural_network.out.unlink(x_link.input)
+                except:
+                    continue
+
+                neural_network.out.link(x_link.input)
+                self.neural_networks[sensor_name] = neural_network
+
+                for image_manip in self.pipeline.getAllNodes():
+                    if not isinstance(image_manip, dai.node.ImageManip):
+                        continue
+
+                    try:
+                        image_manip.out.unlink(neural_network.input)
+                    except:
+                        continue
+
+                    image_manip.out.link(neural_network.input)
+                    self.rois[sensor_name][PipelineQueueType.PREVIEW] = image_manip
+                    break
+
+                break
+
+        for script in self.pipeline.getAllNodes():
+            # Accessing an output creates it, scripts of the sensors have none
+            if not isinstance(script, dai.node.Script) or "out" not in script.outputs:
+                continue
+
+            self.__extract_cascade(script)
+
+    def __extract_cascade(self, script: dai.node.Script):
+        for queue_name, x_link in self.outputs.items():
+            queue_type, sensor_name = PipelineQueueType.parse_queue_name(queue_name)
+
+            if queue_type != PipelineQueueType.NN:
+                continue
+
+            try:
+                script.outputs["out"].unlink(x_link.input)
+            except:
+                continue
+
+            script.outputs["out"].link(x_link.input)
+            break
+        else:
+            return
+
+        for classifier in self.pipeline.getAllNodes():
+            if not isinstance(classifier, dai.node.NeuralNetwork):
+                continue
+
+            try:
+                classifier.out.unlink(script.inputs["classifications"])
+            except:
+                continue
+
+            classifier.out.link(script.inputs["classifications"])
+            break
+        else:
+            return
+
+        for image_manip in self.pipeline.getAllNodes():
+            if not isinstance(image_manip, dai.node.ImageManip):
+                continue
+
+            try:
+                image_manip.out.unlink(classifier.input)
+            except:
+                continue
+
+            image_manip.out.link(classifier.input)
+            self.cascades[sensor_name] = (script, image_manip, classifier)
+            break
+
     def get_video_queue(self, sensor_name: str):
         return self.outputs[
             self.output_queues[sensor_name].get(PipelineQueueType.VIDEO)
@@ -82,7 +176,179 @@ class NNPipeline(DepthPipeline):
         self.scripts[nn.sensor_name].outputs["video"].unlink(video_queue.input)
         nn_node.passthrough.link(video_queue.input)
 
-    def add_nn(self, nn: CameraNNConfig):
+    def __setup_cascade(
+        self,
+        camera: dai.node.ColorCamera,
+        nn: CameraNNCascadeConfig,
+        nn_node: dai.node.DetectionNetwork,
+    ):
+        sensor_name = nn.sensor_name
+        nn_out = self.outputs[self.output_queues[sensor_name][PipelineQueueType.NN]]
+        width, height = nn.classifier.input_shape[:2]
+        # Detections are relative to the preview, it has to show the view of the video
+        camera.setPreviewKeepAspectRatio(False)
+        # The frames held by the cascade come from the pool of the video, it is grown
+        # so the video queue is never starved
+        camera.setVideoNumFramesPool(
+            camera.getVideoNumFramesPool() + self.CASCADE_FRAMES_POOL
+        )
+
+        script = self.pipeline.createScript()
+        script.setScript(
+            f"""
+                import struct
+                import time
+
+                padding = {nn.padding}
+                timeout = {self.CASCADE_CLASSIFICATION_TIMEOUT}
+                pending = None
+
+                def clamp(value):
+                    return min(max(value, 0.0), 1.0)
+
+                while True:
+                    detections = node.io["detections"].get()
+                    sequence_num = detections.getSequenceNum()
+                    frame = None
+
+                    # Older frames are released right away, at most one newer frame
+                    # is held for the following detections
+                    while True:
+                        if pending is None:
+                            pending = node.io["frames"].get()
+
+                        if pending.getSequenceNum() < sequence_num:
+                            pending = None
+                            continue
+
+                        if pending.getSequenceNum() == sequence_num:
+                            frame = pending
+                            pending = None
+
+                        break
+
+                    crops = sorted(
+                        detections.detections, key=lambda d: d.confidence, reverse=True
+                    )[:{nn.max_crops}]
+                    sent = []
+
+                    for d in crops if frame is not None else []:
+                        pad_x = padding * (d.xmax - d.xmin)
+                        pad_y = padding * (d.ymax - d.ymin)
+                        xmin = clamp(d.xmin - pad_x)
+                        ymin = clamp(d.ymin - pad_y)
+                        xmax = clamp(d.xmax + pad_x)
+                        ymax = clamp(d.ymax + pad_y)
+
+                        # ImageManip outputs nothing for a crop under a pixel, its
+                        # classification would never come
+                        if (
+                            (xmax - xmin) * frame.getWidth() < 1
+                            or (ymax - ymin) * frame.getHeight() < 1
+                        ):
+                            continue
+
+                        config = ImageManipConfig()
+                        config.setCropRect(xmin, ymin, xmax, ymax)
+                        config.setResize({width}, {height})
+                        config.setKeepAspectRatio(False)
+                        config.setFrameType(ImgFrame.Type.BGR888p)
+                        node.io["manip_config"].send(config)
+                        node.io["manip_frame"].send(frame)
+                        sent.append(d)
+
+                    records = []
+                    deadline = time.time() + timeout
+
+                    # Crops are classified in the order they were sent, results of
+                    # crops that timed out on an older frame are dropped
+                    for d in sent:
+                        classification = None
+
+                        while time.time() < deadline:
+                            classification = node.io["classifications"].tryGet()
+
+                            if classification is None:
+                                time.sleep(0.001)
+                            elif classification.getSequenceNum() == sequence_num:
+                                break
+
+                            classification = None
+
+                        if classification is None:
+                            break
+
+                        records.append(
+                            [d.label, d.confidence, d.xmin, d.ymin, d.xmax, d.ymax]
+                            + classification.getFirstLayerFp16()
+                        )
+
+                    # Without a frame the detections are sent without classifications
+                    for d in crops if frame is None else []:
+                        records.append(
+                            [d.label, d.confidence, d.xmin, d.ymin, d.xmax, d.ymax]
+                        )
+
+                    # Packed as float32, layers of NNData would round them to FP16
+                    values = len(records[0]) if records else 6
+                    data = struct.pack(
+                        "{CASCADE_HEADER.format}", len(records), values
+                    ) + struct.pack(
+                        "<%df" % (len(records) * values),
+                        *[value for record in records for value in record],
+                    )
+                    out = Buffer(len(data))
+                    out.setData(data)
+                    out.setSequenceNum(sequence_num)
+                    out.setTimestamp(detections.getTimestamp())
+                    node.io["out"].send(out)
+            """
+        )
+
+        script.inputs["detections"].setBlocking(False)
+        script.inputs["detections"].setQueueSize(1)
+        # Covers the latency of the detector, older frames are dropped
+        script.inputs["frames"].setBlocking(False)
+        script.inputs["frames"].setQueueSize(self.CASCADE_FRAMES_QUEUE_SIZE)
+        script.inputs["classifications"].setBlocking(True)
+        script.inputs["classifications"].setQueueSize(nn.max_crops)
+
+        image_manip = self.pipeline.createImageManip()
+        image_manip.setWaitForConfigInput(True)
+        image_manip.setMaxOutputFrameSize(width * height * 3)
+        image_manip.inputConfig.setBlocking(True)
+        image_manip.inputConfig.setQueueSize(nn.max_crops)
+        image_manip.inputImage.setBlocking(True)
+        image_manip.inputImage.setQueueSize(nn.max_crops)
+
+        classifier = nn.create_classifier_node(self.pipeline)
+
+        nn_node.out.unlink(nn_out.input)
+        nn_node.out.link(script.inputs["detections"])
+        camera.video.link(script.inputs["frames"])
+        script.outputs["manip_config"].link(image_manip.inputConfig)
+        script.outputs["manip_frame"].link(image_manip.inputImage)
+        image_manip.out.link(classifier.input)
+        classifier.out.link(script.inputs["classifications"])
+        script.outputs["out"].link(nn_out.input)
+        self.cascades[sensor_name] = (script, image_manip, classifier)
+
+    def __setup_roi(self, nn: CameraNNConfig, nn_node: dai.node.NeuralNetwork):
+        # The ROI keeps its video, detections are relative to the same crop
+        sensor_name = parse_roi_stream_name(nn.sensor_name)[0]
+        camera = self.cameras[sensor_name]
+        mono = isinstance(camera, dai.node.MonoCamera)
+        preview_manip = self.create_roi_manip(
+            sensor_name,
+            camera.out if mono else camera.video,
+            self.get_roi_config(nn.sensor_name),
+            tuple(nn.input_shape[:2]),
+            frame_type=None if mono else dai.ImgFrame.Type.BGR888p,
+        )
+        preview_manip.out.link(nn_node.input)
+        self.rois[nn.sensor_name][PipelineQueueType.PREVIEW] = preview_manip
+
+    def add_nn(self, nn: CameraNNConfig | CameraNNCascadeConfig):
         sensor_name = nn.sensor_name
         self.nn_configs[sensor_name] = nn
         self.remove_nn(sensor_name)
@@ -107,6 +373,10 @@ class NNPipeline(DepthPipeline):
             self.__setup_stereo_camera(nn, nn_node)
             return
 
+        if sensor_name in self.rois:
+            self.__setup_roi(nn, nn_node)
+            return
+
         if sensor_name not in self.cameras:
             self.add_sensor(nn.sensor)
 
@@ -117,6 +387,9 @@ class NNPipeline(DepthPipeline):
         else:
             self.__setup_camera(cam, nn, nn_node)
 
+        if isinstance(nn, CameraNNCascadeConfig):
+            self.__setup_cascade(cam, nn, nn_node)
+
     def add_stereo_pair(self, left, right):
         nn_to_remove: list[CameraNNConfig] = []
         nn_to_reconfigure: list[CameraNNConfig] = []
@@ -161,7 +434,19 @@ class NNPipeline(DepthPipeline):
         nn_node = self.neural_networks[sensor_name]
         video_queue = self.get_video_queue(sensor_name)
 
-        if sensor_name.startswith("DEPTH"):
+        if sensor_name in self.cascades:
+            for node in self.cascades.pop(sensor_name):
+                self.pipeline.remove(node)
+
+            camera = self.cameras[sensor_name]
+            camera.setPreviewKeepAspectRatio(True)
+            camera.setVideoNumFramesPool(
+                camera.getVideoNumFramesPool() - self.CASCADE_FRAMES_POOL
+            )
+
+        if sensor_name in self.rois:
+            self.pipeline.remove(self.rois[sensor_name].pop(PipelineQueueType.PREVIEW))
+        elif sensor_name.startswith("DEPTH"):
             script = self.scripts[self.get_depth_name()]
             script.outputs["video"].link(video_queue.input)
         else:
@@ -174,9 +459,14 @@ class NNPipeline(DepthPipeline):
 
         self.pipeline.remove(nn_node)
         del self.neural_networks[sensor_name]
-        del self.nn_configs[sensor_name]
+        self.nn_configs.pop(sensor_name, None)
         self.del_queue(sensor_name, PipelineQueueType.NN)
 
+    def remove_roi(self, stream_name: str):
+        self.remove_nn(stream_name)
+
+        return super().remove_roi(stream_name)
+
     def remove_sensor(self, sensor):
         self.remove_nn(sensor)
 
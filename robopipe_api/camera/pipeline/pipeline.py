@@ -92,8 +92,8 @@ class Pipeline:
             except:
                 pass
 
-        del self.input_queues[sensor_name]
-        del self.output_queues[sensor_name]
+        self.input_queues.pop(sensor_name, None)
+        self.output_queues.pop(sensor_name, None)
 
 
 class EmptyPipeline(Pipeline):
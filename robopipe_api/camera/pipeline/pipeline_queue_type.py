@@ -8,6 +8,8 @@ class PipelineQueueType(Enum):
     STILL = "still"
     PREVIEW = "preview"
     VIDEO = "video"
+    ENCODED = "encoded"
+    MJPEG = "mjpeg"
     NN = "nn"
     NN_PASSTHROUGH = "nn_passthrough"
 
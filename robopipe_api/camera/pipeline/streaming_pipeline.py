@@ -1,5 +1,9 @@
 import depthai as dai
 
+import math
+
+from ..roi import RoiConfig, parse_roi_stream_name
+from ..video_encoding import VideoEncoding, VideoEncodingConfig
 from .pipeline import Pipeline
 from .pipeline_queue_type import PipelineQueueType
 
@@ -9,6 +13,9 @@ class StreamingPipeline(Pipeline):
         self, sensors: list[dai.CameraFeatures], pipeline: dai.Pipeline | None = None
     ):
         self.scripts: dict[str, dai.node.Script] = {}
+        self.video_encoders: dict[str, dai.node.VideoEncoder] = {}
+        self.mjpeg_encoders: dict[str, dai.node.VideoEncoder] = {}
+        self.rois: dict[str, dict[PipelineQueueType, dai.node.ImageManip]] = {}
         super().__init__(pipeline)
 
         for sensor in sensors:
@@ -34,7 +41,156 @@ class StreamingPipeline(Pipeline):
                 self.scripts[camera.getBoardSocket().name] = script
                 break
 
-    def add_sensor(self, sensor: dai.CameraFeatures):
+        for video_encoder in self.pipeline.getAllNodes():
+            if not isinstance(video_encoder, dai.node.VideoEncoder):
+                continue
+
+            for queue_name, x_link in self.outputs.items():
+                queue_type, sensor_name = PipelineQueueType.parse_queue_name(queue_name)
+
+                if queue_type == PipelineQueueType.ENCODED:
+                    video_encoders = self.video_encoders
+                elif queue_type == PipelineQueueType.MJPEG:
+                    video_encoders = self.mjpeg_encoders
+                else:
+                    continue
+
+                try:
+                    video_encoder.out.unlink(x_link.input)
+                except:
+                    continue
+
+                video_encoder.out.link(x_link.input)
+                video_encoders[sensor_name] = video_encoder
+                break
+
+        for image_manip in self.pipeline.getAllNodes():
+            if not isinstance(image_manip, dai.node.ImageManip):
+                continue
+
+            for queue_name, x_link in self.outputs.items():
+                queue_type, sensor_name = PipelineQueueType.parse_queue_name(queue_name)
+
+                if parse_roi_stream_name(sensor_name) is None:
+                    continue
+
+                try:
+                    image_manip.out.unlink(x_link.input)
+                except:
+                    continue
+
+                image_manip.out.link(x_link.input)
+                self.rois.setdefault(sensor_name, {})[queue_type] = image_manip
+                break
+
+    def get_sensor_node(
+        self, sensor_name: str
+    ) -> dai.node.ColorCamera | dai.node.MonoCamera | dai.node.Camera | None:
+        if sensor_name in self.rois:
+            sensor_name = parse_roi_stream_name(sensor_name)[0]
+
+        return self.cameras.get(sensor_name)
+
+    def get_video_output(self, sensor_name: str) -> dai.Node.Output:
+        if sensor_name in self.rois:
+            return self.rois[sensor_name][PipelineQueueType.VIDEO].out
+
+        if sensor_name in self.scripts:
+            return self.scripts[sensor_name].outputs["video"]
+
+        return self.cameras[sensor_name].video
+
+    def get_video_encoding(self, sensor_name: str) -> VideoEncodingConfig:
+        if sensor_name not in self.video_encoders:
+            return VideoEncodingConfig()
+
+        video_encoder = self.video_encoders[sensor_name]
+
+        return VideoEncodingConfig(
+            encoding=VideoEncoding.from_dai_profile(video_encoder.getProfile()),
+            gop_size=video_encoder.getKeyframeFrequency(),
+        )
+
+    def set_video_encoding(
+        self, sensor_name: str, encoding: VideoEncodingConfig
+    ) -> bool:
+        sensor_node = self.get_sensor_node(sensor_name)
+        current_encoding = self.get_video_encoding(sensor_name)
+
+        if sensor_node is None or not (
+            encoding.encoding.on_device or current_encoding.encoding.on_device
+        ):
+            return False
+
+        if (encoding.encoding, encoding.gop_size) == (
+            current_encoding.encoding,
+            current_encoding.gop_size,
+        ):
+            return False
+
+        self.remove_video_encoder(sensor_name)
+
+        if not encoding.encoding.on_device:
+            return True
+
+        cam_encoded = self.create_x_link(
+            sensor_name, PipelineQueueType.ENCODED, False, False, 30
+        )
+
+        video_encoder = self.pipeline.createVideoEncoder()
+        video_encoder.setDefaultProfilePreset(
+            sensor_node.getFps(), encoding.encoding.to_dai_profile()
+        )
+        video_encoder.setKeyframeFrequency(encoding.gop_size)
+
+        self.get_video_output(sensor_name).link(video_encoder.input)
+        video_encoder.out.link(cam_encoded.input)
+        self.video_encoders[sensor_name] = video_encoder
+
+        return True
+
+    def remove_video_encoder(self, sensor_name: str):
+        if sensor_name not in self.video_encoders:
+            return
+
+        self.del_queue(sensor_name, PipelineQueueType.ENCODED)
+        self.pipeline.remove(self.video_encoders[sensor_name])
+        del self.video_encoders[sensor_name]
+
+    def add_mjpeg_encoder(self, sensor_name: str) -> bool:
+        sensor_node = self.get_sensor_node(sensor_name)
+
+        if sensor_node is None or sensor_name in self.mjpeg_encoders:
+            return False
+
+        cam_mjpeg = self.create_x_link(
+            sensor_name, PipelineQueueType.MJPEG, False, False, 4
+        )
+
+        mjpeg_encoder = self.pipeline.createVideoEncoder()
+        mjpeg_encoder.setDefaultProfilePreset(
+            sensor_node.getFps(), VideoEncoding.MJPEG.to_dai_profile()
+        )
+
+        self.get_video_output(sensor_name).link(mjpeg_encoder.input)
+        mjpeg_encoder.out.link(cam_mjpeg.input)
+        self.mjpeg_encoders[sensor_name] = mjpeg_encoder
+
+        return True
+
+    def remove_mjpeg_encoder(self, sensor_name: str):
+        if sensor_name not in self.mjpeg_encoders:
+            return
+
+        self.del_queue(sensor_name, PipelineQueueType.MJPEG)
+        self.pipeline.remove(self.mjpeg_encoders[sensor_name])
+        del self.mjpeg_encoders[sensor_name]
+
+    def add_sensor(
+        self,
+        sensor: dai.CameraFeatures,
+        encoding: VideoEncodingConfig | None = None,
+    ):
         sensor_name = sensor.socket.name
 
         if sensor_name in self.cameras:
@@ -87,11 +243,132 @@ class StreamingPipeline(Pipeline):
         self.cameras[sensor_name] = cam
 
         cam_control.out.link(cam.inputControl)
+        self.set_video_encoding(sensor_name, encoding or VideoEncodingConfig())
+
+    def add_roi(self, stream_name: str, roi: RoiConfig) -> bool:
+        sensor_name = parse_roi_stream_name(stream_name)[0]
+        sensor_node = self.cameras.get(sensor_name)
+
+        if sensor_node is None or stream_name in self.rois:
+            return False
+
+        if isinstance(sensor_node, dai.node.MonoCamera):
+            video_output = still_output = sensor_node.out
+            still_size = (
+                sensor_node.getResolutionWidth(),
+                sensor_node.getResolutionHeight(),
+            )
+        else:
+            video_output = sensor_node.video
+            still_output = sensor_node.still
+            still_size = sensor_node.getStillSize()
+
+        video = self.create_x_link(
+            stream_name, PipelineQueueType.VIDEO, False, False, 1
+        )
+        still = self.create_x_link(
+            stream_name, PipelineQueueType.STILL, False, False, 1
+        )
+
+        # Stills keep the full resolution of the cropped region
+        video_manip = self.create_roi_manip(
+            sensor_name, video_output, roi, (roi.output_width, roi.output_height)
+        )
+        still_manip = self.create_roi_manip(
+            sensor_name,
+            still_output,
+            roi,
+            (
+                math.ceil(still_size[0] * roi.width / 2) * 2,
+                math.ceil(still_size[1] * roi.height / 2) * 2,
+            ),
+            False,
+        )
+        video_manip.out.link(video.input)
+        still_manip.out.link(still.input)
+        self.rois[stream_name] = {
+            PipelineQueueType.VIDEO: video_manip,
+            PipelineQueueType.STILL: still_manip,
+        }
+
+        return True
+
+    def create_roi_manip(
+        self,
+        sensor_name: str,
+        output: dai.Node.Output,
+        roi: RoiConfig,
+        size: tuple[int, int],
+        resize: bool = True,
+        frame_type: dai.ImgFrame.Type | None = None,
+    ) -> dai.node.ImageManip:
+        mono = isinstance(self.cameras[sensor_name], dai.node.MonoCamera)
+        frame_type = frame_type or (
+            dai.ImgFrame.Type.GRAY8 if mono else dai.ImgFrame.Type.NV12
+        )
+
+        image_manip = self.pipeline.createImageManip()
+        image_manip.initialConfig.setCropRect(
+            roi.x, roi.y, roi.x + roi.width, roi.y + roi.height
+        )
+        image_manip.initialConfig.setFrameType(frame_type)
+
+        if resize:
+            image_manip.initialConfig.setResize(*size)
+            image_manip.initialConfig.setKeepAspectRatio(False)
+
+        image_manip.setMaxOutputFrameSize(
+            size[0]
+            * size[1]
+            * (6 if frame_type == dai.ImgFrame.Type.BGR888p else 3)
+            // 2
+        )
+        image_manip.setNumFramesPool(2)
+        image_manip.inputImage.setBlocking(False)
+        image_manip.inputImage.setQueueSize(1)
+        output.link(image_manip.inputImage)
+
+        return image_manip
+
+    def get_roi_config(self, stream_name: str) -> RoiConfig:
+        video_manip = self.rois[stream_name][PipelineQueueType.VIDEO]
+        config = video_manip.initialConfig
+
+        return RoiConfig.model_construct(
+            x=config.getCropXMin(),
+            y=config.getCropYMin(),
+            width=config.getCropXMax() - config.getCropXMin(),
+            height=config.getCropYMax() - config.getCropYMin(),
+            output_width=config.getResizeWidth(),
+            output_height=config.getResizeHeight(),
+        )
+
+    def remove_roi(self, stream_name: str):
+        if stream_name not in self.rois:
+            return
+
+        self.remove_video_encoder(stream_name)
+        self.remove_mjpeg_encoder(stream_name)
+        self.del_all_queues(stream_name)
+
+        for image_manip in self.rois[stream_name].values():
+            self.pipeline.remove(image_manip)
+
+        del self.rois[stream_name]
 
     def remove_sensor(self, sensor_name: str):
+        if sensor_name in self.rois:
+            return self.remove_roi(sensor_name)
+
         if sensor_name not in self.cameras:
             return
 
+        for stream_name in list(self.rois.keys()):
+            if parse_roi_stream_name(stream_name)[0] == sensor_name:
+                self.remove_roi(stream_name)
+
+        self.remove_video_encoder(sensor_name)
+        self.remove_mjpeg_encoder(sensor_name)
         self.del_all_queues(sensor_name)
         self.pipeline.remove(self.cameras[sensor_name])
         del self.cameras[sensor_name]
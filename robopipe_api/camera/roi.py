@@ -0,0 +1,67 @@
+from pydantic import Field, model_validator
+
+from typing import Annotated, Self
+
+from ..models.base_model import BaseModel
+
+# Separates the sensor and the ROI in a stream name, e.g. CAM_A_ROI_DOOR
+ROI_SEPARATOR = "_ROI_"
+
+
+def get_roi_stream_name(sensor_name: str, roi_name: str) -> str:
+    return sensor_name + ROI_SEPARATOR + roi_name
+
+
+def parse_roi_stream_name(stream_name: str) -> tuple[str, str] | None:
+    if ROI_SEPARATOR not in stream_name:
+        return None
+
+    sensor_name, roi_name = stream_name.split(ROI_SEPARATOR, 1)
+
+    return (sensor_name, roi_name)
+
+
+class RoiConfig(BaseModel):
+    x: Annotated[
+        float,
+        Field(description="Left edge of the crop relative to the frame width", ge=0),
+    ]
+    y: Annotated[
+        float,
+        Field(description="Top edge of the crop relative to the frame height", ge=0),
+    ]
+    width: Annotated[
+        float,
+        Field(description="Width of the crop relative to the frame width", gt=0, le=1),
+    ]
+    height: Annotated[
+        float,
+        Field(
+            description="Height of the crop relative to the frame height", gt=0, le=1
+        ),
+    ]
+    output_width: Annotated[
+        int,
+        Field(
+            description="Width of the streamed frames",
+            ge=16,
+            le=3840,
+            multiple_of=2,
+        ),
+    ]
+    output_height: Annotated[
+        int,
+        Field(
+            description="Height of the streamed frames",
+            ge=16,
+            le=2160,
+            multiple_of=2,
+        ),
+    ]
+
+    @model_validator(mode="after")
+    def check_crop(self) -> Self:
+        if self.x + self.width > 1 or self.y + self.height > 1:
+            raise ValueError("crop must lie within the frame")
+
+        return self
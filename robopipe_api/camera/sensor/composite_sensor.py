@@ -0,0 +1,166 @@
+import av
+import depthai as dai
+import numpy as np
+
+from collections import deque
+import math
+import time
+
+from ...utils.image import VIDEO_FRAME_TIME_BASE, img_frame_to_video_frame
+from .sensor_base import VideoReader
+from .sensor_config import SensorConfigProperties
+
+
+def get_capture_time(img_frame: dai.ImgFrame) -> float:
+    return img_frame.getTimestamp().total_seconds()
+
+
+class CompositeSensor:
+    PIXEL_FORMAT = "yuv420p"
+    # Frames of the other sensors kept around to pair with the first sensor
+    HISTORY_SIZE = 4
+    # Frame periods a lagging sensor is waited for before its closest frame is used
+    MAX_WAIT_FRAMES = 3
+    # Seconds a sensor may fall behind before the composite fails
+    MAX_LAG = 1
+    POLL_INTERVAL = 0.002
+
+    def __init__(self, sensors: list[VideoReader]):
+        self.sensors = sensors
+        self.histories: list[deque[dai.ImgFrame]] = [
+            deque(maxlen=self.HISTORY_SIZE) for _ in sensors[1:]
+        ]
+        self.tile_sizes: list[tuple[int, int]] | None = None
+        self.canvas: np.ndarray | None = None
+        self.dropped_video_frames = 0
+
+    @property
+    def config(self) -> SensorConfigProperties:
+        return self.sensors[0].config
+
+    @property
+    def encoded_on_device(self) -> bool:
+        return False
+
+    @property
+    def tolerance(self) -> float:
+        return 0.5 / self.config.fps
+
+    def close(self):
+        for sensor in self.sensors:
+            sensor.close()
+
+    def get_video_frame(self) -> av.VideoFrame:
+        canvas, format, capture_time = self.get_video_array()
+        video_frame = av.VideoFrame.from_ndarray(canvas, format)
+        video_frame.pts = round(capture_time / VIDEO_FRAME_TIME_BASE)
+        video_frame.time_base = VIDEO_FRAME_TIME_BASE
+
+        return video_frame
+
+    def get_video_array(self) -> tuple[np.ndarray, str, float]:
+        # The first sensor drives the composite, the others are paired to its frames
+        primary_frames = self.sensors[0].get_video_img_frames()
+        primary_frame = primary_frames[-1]
+        self.dropped_video_frames += len(primary_frames) - 1
+        capture_time = get_capture_time(primary_frame)
+        img_frames = [primary_frame] + [
+            self.__get_matching_frame(sensor, history, capture_time)
+            for sensor, history in zip(self.sensors[1:], self.histories)
+        ]
+
+        if self.canvas is None:
+            self.__create_layout(img_frames)
+
+        self.__draw(img_frames)
+
+        return self.canvas, self.PIXEL_FORMAT, capture_time
+
+    def __get_matching_frame(
+        self, sensor: VideoReader, history: deque[dai.ImgFrame], capture_time: float
+    ) -> dai.ImgFrame:
+        history.extend(sensor.get_video_img_frames(block=False))
+        start = time.monotonic()
+
+        # A lagging sensor is waited for a few frames, so the views don't drift apart.
+        # A stalled or reconfigured one fails the stream instead of freezing it
+        while not history or get_capture_time(history[-1]) < (
+            capture_time - self.tolerance
+        ):
+            waited = time.monotonic() - start
+
+            if (
+                history
+                and get_capture_time(history[-1]) >= capture_time - self.MAX_LAG
+                and waited >= self.MAX_WAIT_FRAMES / self.config.fps
+            ):
+                break
+
+            if waited >= self.MAX_LAG:
+                raise RuntimeError("A sensor of the composite stopped sending frames")
+
+            time.sleep(self.POLL_INTERVAL)
+            history.extend(sensor.get_video_img_frames(block=False))
+
+        return min(
+            history,
+            key=lambda img_frame: abs(get_capture_time(img_frame) - capture_time),
+        )
+
+    def __create_layout(self, img_frames: list[dai.ImgFrame]):
+        # Tiles are scaled down to the smallest sensor, the grid is as square as possible
+        tile_height = min(img_frame.getHeight() for img_frame in img_frames)
+        tile_height -= tile_height % 2
+        self.tile_sizes = [
+            (
+                round(img_frame.getWidth() * tile_height / img_frame.getHeight() / 2)
+                * 2,
+                tile_height,
+            )
+            for img_frame in img_frames
+        ]
+        self.columns = math.ceil(math.sqrt(len(img_frames)))
+        self.cell_width = max(width for width, _ in self.tile_sizes)
+        self.width = self.columns * self.cell_width
+        self.height = math.ceil(len(img_frames) / self.columns) * tile_height
+
+        # Black in YUV, cells without a tile stay empty
+        self.canvas = np.full((self.height * 3 // 2, self.width), 128, dtype=np.uint8)
+        self.canvas[: self.height] = 0
+
+    def __draw(self, img_frames: list[dai.ImgFrame]):
+        luma, chroma_u, chroma_v = self.__split_planes(
+            self.canvas, self.width, self.height
+        )
+
+        for index, (img_frame, (width, height)) in enumerate(
+            zip(img_frames, self.tile_sizes)
+        ):
+            tile = (
+                img_frame_to_video_frame(img_frame)
+                .reformat(width, height, self.PIXEL_FORMAT)
+                .to_ndarray()
+            )
+            tile_luma, tile_u, tile_v = self.__split_planes(tile, width, height)
+            x = index % self.columns * self.cell_width
+            y = index // self.columns * height
+
+            luma[y : y + height, x : x + width] = tile_luma
+            chroma_u[y // 2 : (y + height) // 2, x // 2 : (x + width) // 2] = tile_u
+            chroma_v[y // 2 : (y + height) // 2, x // 2 : (x + width) // 2] = tile_v
+
+    @staticmethod
+    def __split_planes(
+        array: np.ndarray, width: int, height: int
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        planes = array.reshape(-1)
+        luma_size = width * height
+        chroma_size = luma_size // 4
+
+        return (
+            planes[:luma_size].reshape(height, width),
+            planes[luma_size : luma_size + chroma_size].reshape(
+                height // 2, width // 2
+            ),
+            planes[luma_size + chroma_size :].reshape(height // 2, width // 2),
+        )
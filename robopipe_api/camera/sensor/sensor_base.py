@@ -3,9 +3,18 @@ import numpy as np
 from PIL import Image
 
 from abc import ABC, abstractmethod
-from typing import Callable
+from collections import deque
+import datetime
+import threading
+import time
+from typing import Callable, Iterator
 
-from ...utils.image import img_frame_to_pil_image, img_frame_to_video_frame
+from ...utils.image import (
+    encode_img_frame,
+    img_frame_to_ndarray,
+    img_frame_to_pil_image,
+    img_frame_to_video_frame,
+)
 from ..pipeline.pipeline_queue_type import PipelineQueueType
 from .sensor_config import SensorConfigProperties
 from .sensor_control import SensorControl
@@ -21,6 +30,15 @@ class SensorBase(ABC):
         self.input_queues = input_queues
         self.output_queues = output_queues
         self.restart_pipeline = restart_pipeline
+        self.latest_video_frame: dai.ImgFrame | None = None
+        self.latest_still: tuple[tuple[int, str], bytes] | None = None
+        self.capture_lock = threading.Lock()
+        self.latest_still_lock = threading.Lock()
+        # Only one reader takes frames from the video queue and hands them to the
+        # others, so every consumer sees all frames of the sensor
+        self.video_lock = threading.Lock()
+        self.video_readers_lock = threading.Lock()
+        self.video_readers: list[VideoReader] = []
 
     @property
     @abstractmethod
@@ -43,29 +61,150 @@ class SensorBase(ABC):
 
     def capture_still(self):
         try:
+            img_frame = self.capture_still_img_frame()
+        except:
+            return
+
+        return img_frame_to_pil_image(img_frame)
+
+    def capture_still_img_frame(
+        self, before_trigger: Callable[[], None] | None = None
+    ) -> dai.ImgFrame:
+        # Concurrent captures would take each other's frames from the queue
+        with self.capture_lock:
+            still_queue = self.output_queues[PipelineQueueType.STILL]
+            # Captures triggered through a ROI of the same sensor leave stale stills
+            still_queue.tryGetAll()
+
             control_queue = self.input_queues[PipelineQueueType.CONTROL]
             ctrl = dai.CameraControl()
             ctrl.setCaptureStill(True)
+
+            if before_trigger is not None:
+                before_trigger()
+
             control_queue.send(ctrl)
 
-            img_frame: dai.ImgFrame = self.output_queues[
-                PipelineQueueType.STILL
-            ].getAll()[-1]
+            img_frame: dai.ImgFrame = still_queue.getAll()[-1]
 
-            self.__extract_img_properties(img_frame)
-        except:
-            return
+        self.__extract_img_properties(img_frame)
 
-        return img_frame_to_pil_image(img_frame)
+        return img_frame
 
-    def get_video_frame(self):
-        video_frame: dai.ImgFrame = self.output_queues[
-            PipelineQueueType.VIDEO
-        ].getAll()[-1]
+    def capture_burst(self, count: int, interval: float = 0) -> Iterator[dai.ImgFrame]:
+        next_capture = time.monotonic()
+
+        for _ in range(count):
+            delay = next_capture - time.monotonic()
+
+            if delay > 0:
+                time.sleep(delay)
+
+            next_capture = time.monotonic() + interval
+
+            # Locked per still, so a paused or abandoned burst holds up no other capture
+            yield self.capture_still_img_frame()
+
+    def get_latest_still(self, max_age: float, format: str = "jpeg") -> bytes | None:
+        with self.latest_still_lock:
+            img_frame = self.__get_recent_video_frame(max_age)
+
+            if img_frame is None:
+                return None
+
+            # Requests for the same frame share a single encode
+            key = (img_frame.getSequenceNum(), format)
+
+            if self.latest_still is None or self.latest_still[0] != key:
+                self.latest_still = (key, encode_img_frame(img_frame, format))
+
+            return self.latest_still[1]
+
+    def __get_recent_video_frame(self, max_age: float) -> dai.ImgFrame | None:
+        max_age = datetime.timedelta(seconds=max_age)
+        is_recent = lambda img_frame: (
+            img_frame is not None
+            and dai.Clock.now() - img_frame.getTimestamp() <= max_age
+        )
+
+        if is_recent(self.latest_video_frame):
+            return self.latest_video_frame
+
+        # Running consumers keep the latest frame fresh, the queue is only read
+        # when nobody else reads it
+        if PipelineQueueType.VIDEO in self.output_queues and not self.video_readers:
+            reader = self.open_video_reader()
+
+            try:
+                reader.get_video_img_frames(block=False)
+            finally:
+                reader.close()
+
+        return self.latest_video_frame if is_recent(self.latest_video_frame) else None
+
+    def open_video_reader(self) -> "VideoReader":
+        reader = VideoReader(self)
+
+        with self.video_readers_lock:
+            self.video_readers.append(reader)
+
+        return reader
+
+    def close_video_reader(self, reader: "VideoReader"):
+        with self.video_readers_lock:
+            if reader in self.video_readers:
+                self.video_readers.remove(reader)
+
+            reader.frames.clear()
+
+    def read_video_img_frames(
+        self, reader: "VideoReader", block: bool = True
+    ) -> list[dai.ImgFrame]:
+        video_frames = reader.take_frames()
 
-        self.__extract_img_properties(video_frame)
+        if video_frames:
+            return video_frames
 
-        return img_frame_to_video_frame(video_frame).to_rgb()
+        # A reader that waited for the lock finds the frames read meanwhile
+        if not self.video_lock.acquire(blocking=block):
+            return []
+
+        try:
+            video_frames = reader.take_frames()
+
+            if video_frames:
+                return video_frames
+
+            video_queue = self.output_queues[PipelineQueueType.VIDEO]
+            video_frames = video_queue.getAll() if block else video_queue.tryGetAll()
+
+            # Handed out before the lock is released, so no reader gets them out of order
+            if video_frames:
+                self.latest_video_frame = video_frames[-1]
+                self.__extract_img_properties(self.latest_video_frame)
+
+                with self.video_readers_lock:
+                    for other in self.video_readers:
+                        if other is not reader:
+                            other.put_frames(video_frames)
+        finally:
+            self.video_lock.release()
+
+        return video_frames
+
+    @property
+    def encoded_on_device(self) -> bool:
+        return PipelineQueueType.ENCODED in self.output_queues
+
+    def get_encoded_frame(self) -> dai.EncodedFrame:
+        return self.output_queues[PipelineQueueType.ENCODED].get()
+
+    @property
+    def mjpeg_on_device(self) -> bool:
+        return PipelineQueueType.MJPEG in self.output_queues
+
+    def get_mjpeg_frame(self) -> dai.EncodedFrame:
+        return self.output_queues[PipelineQueueType.MJPEG].get()
 
     def get_nn_frame(self):
         try:
@@ -82,7 +221,61 @@ class SensorBase(ABC):
 
     def get_nn_detections(
         self,
-    ) -> dai.NNData | dai.ImgDetections | dai.SpatialImgDetections:
+    ) -> dai.Buffer | dai.NNData | dai.ImgDetections | dai.SpatialImgDetections:
         detections = self.output_queues[PipelineQueueType.NN].get()
 
         return detections
+
+
+class VideoReader:
+    # Frames kept for a reader that falls behind the others, older ones are dropped
+    BUFFER_SIZE = 8
+
+    def __init__(self, sensor: SensorBase):
+        self.sensor = sensor
+        self.frames: deque[dai.ImgFrame] = deque(maxlen=self.BUFFER_SIZE)
+        self.dropped_video_frames = 0
+
+    @property
+    def config(self) -> SensorConfigProperties:
+        return self.sensor.config
+
+    @property
+    def encoded_on_device(self) -> bool:
+        return False
+
+    def put_frames(self, video_frames: list[dai.ImgFrame]):
+        self.dropped_video_frames += max(
+            len(self.frames) + len(video_frames) - self.BUFFER_SIZE, 0
+        )
+        self.frames.extend(video_frames)
+
+    def take_frames(self) -> list[dai.ImgFrame]:
+        with self.sensor.video_readers_lock:
+            video_frames = list(self.frames)
+            self.frames.clear()
+
+        return video_frames
+
+    def close(self):
+        self.sensor.close_video_reader(self)
+
+    def get_video_img_frames(self, block: bool = True) -> list[dai.ImgFrame]:
+        return self.sensor.read_video_img_frames(self, block)
+
+    def __get_latest_video_frame(self) -> dai.ImgFrame:
+        video_frames = self.get_video_img_frames()
+        self.dropped_video_frames += len(video_frames) - 1
+
+        return video_frames[-1]
+
+    def get_video_frame(self):
+        return img_frame_to_video_frame(self.__get_latest_video_frame())
+
+    def get_video_array(self) -> tuple[np.ndarray, str, float]:
+        img_frame = self.__get_latest_video_frame()
+
+        return (
+            *img_frame_to_ndarray(img_frame),
+            img_frame.getTimestamp().total_seconds(),
+        )
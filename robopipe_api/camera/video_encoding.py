@@ -0,0 +1,49 @@
+import depthai as dai
+from pydantic import Field
+
+from enum import Enum
+from typing import Annotated
+
+from ..models.base_model import BaseModel
+
+
+class VideoEncoding(Enum):
+    HOST = "host"
+    H264 = "h264"
+    H265 = "h265"
+    MJPEG = "mjpeg"
+
+    @classmethod
+    def from_dai_profile(cls, profile: dai.VideoEncoderProperties.Profile):
+        if profile == dai.VideoEncoderProperties.Profile.H265_MAIN:
+            return cls.H265
+        elif profile == dai.VideoEncoderProperties.Profile.MJPEG:
+            return cls.MJPEG
+
+        return cls.H264
+
+    def to_dai_profile(self) -> dai.VideoEncoderProperties.Profile:
+        if self == VideoEncoding.H264:
+            return dai.VideoEncoderProperties.Profile.H264_MAIN
+        elif self == VideoEncoding.H265:
+            return dai.VideoEncoderProperties.Profile.H265_MAIN
+        elif self == VideoEncoding.MJPEG:
+            return dai.VideoEncoderProperties.Profile.MJPEG
+
+        raise ValueError(f"{self} is not an on-device encoding")
+
+    @property
+    def on_device(self) -> bool:
+        return self != VideoEncoding.HOST
+
+
+class VideoEncodingConfig(BaseModel):
+    encoding: VideoEncoding = VideoEncoding.HOST
+    gop_size: Annotated[
+        int,
+        Field(
+            description="Number of frames between two consecutive keyframes",
+            ge=1,
+            le=600,
+        ),
+    ] = 30
@@ -0,0 +1,286 @@
+from functools import lru_cache
+
+from concurrent.futures import Future, ThreadPoolExecutor
+import os
+import queue
+import threading
+import time
+from typing import BinaryIO, Callable
+import uuid
+
+from .camera.camera_manager import CameraManager
+from .camera.sensor.sensor_base import SensorBase, VideoReader
+from .error import CaptureJobNotFoundException, SensorNotFoundException
+from .log import logger
+from .metrics import RollingCounter, RollingHistogram
+from .models.capture_job import CaptureJobConfig, CaptureJobStatus
+from .utils.image import encode_img_frame
+
+
+class CaptureJob:
+    RETRY_DELAY = 1
+
+    def __init__(
+        self,
+        id: str,
+        config: CaptureJobConfig,
+        path: str,
+        get_sensor: Callable[[], SensorBase],
+        executor: ThreadPoolExecutor,
+    ):
+        self.id = id
+        self.config = config
+        self.path = path
+        self.get_sensor = get_sensor
+        self.active = True
+        self.error: str | None = None
+        # Holds the images being encoded, the capture drops frames instead of waiting
+        self.queue: queue.Queue[Future[bytes] | None] = queue.Queue(config.queue_size)
+        self.executor = executor
+        self.directory: str | None = None
+        self.files_written = 0
+        self.unsynced_files: list[BinaryIO] = []
+        self.captured = RollingCounter()
+        self.dropped = RollingCounter()
+        self.written = RollingCounter()
+        self.bytes_written = RollingCounter()
+        self.write_time = RollingHistogram()
+
+        os.makedirs(path, exist_ok=True)
+
+    def start(self):
+        self.directory = self.claim_directory()
+        threading.Thread(target=self.capture, daemon=True).start()
+        threading.Thread(target=self.write, daemon=True).start()
+
+    def stop(self):
+        self.active = False
+
+    def capture(self):
+        interval = 1 / self.config.fps if self.config.fps is not None else 0
+        next_capture = 0.0
+        reader: VideoReader | None = None
+
+        while self.active:
+            try:
+                sensor = self.get_sensor()
+
+                # A restarted pipeline comes with new sensors
+                if reader is None or reader.sensor is not sensor:
+                    if reader is not None:
+                        reader.close()
+
+                    reader = sensor.open_video_reader()
+
+                img_frame = reader.get_video_img_frames()[-1]
+            except Exception as e:
+                # Resumes once the pipeline is restarted
+                logger.warning(f"Capture job {self.id} interrupted: {e}")
+                time.sleep(self.RETRY_DELAY)
+                continue
+
+            capture_time = img_frame.getTimestamp().total_seconds()
+            # Frames are taken on the sensor's cadence, a little early is on time
+            tolerance = 0.5 / sensor.config.fps
+
+            if capture_time + tolerance < next_capture:
+                continue
+
+            next_capture = max(next_capture, capture_time - tolerance) + interval
+
+            if self.queue.full():
+                self.dropped.increment()
+                continue
+
+            try:
+                image = self.executor.submit(
+                    encode_img_frame, img_frame, self.config.format
+                )
+            except RuntimeError:
+                # The service shut the executor down
+                break
+
+            self.queue.put(image)
+            self.captured.increment()
+
+            if (
+                self.config.max_frames is not None
+                and self.captured.total >= self.config.max_frames
+            ):
+                break
+
+        if reader is not None:
+            reader.close()
+
+        self.queue.put(None)
+
+    def write(self):
+        while True:
+            # An idle writer syncs right away instead of waiting for a full batch
+            if self.queue.empty():
+                self.sync()
+
+            image = self.queue.get()
+
+            if image is None:
+                break
+
+            if self.error is not None:
+                continue
+
+            try:
+                self.write_file(image.result())
+            except Exception as e:
+                logger.error(f"Capture job {self.id} failed: {e}")
+                self.error = str(e)
+                self.active = False
+
+        try:
+            self.sync()
+        except Exception as e:
+            self.error = self.error or str(e)
+
+        self.active = False
+
+    def write_file(self, data: bytes):
+        start = time.perf_counter()
+
+        if self.files_written and (
+            self.files_written % self.config.files_per_directory == 0
+        ):
+            self.sync()
+            self.directory = self.claim_directory()
+
+        file = open(
+            os.path.join(
+                self.directory, f"{self.files_written:08d}.{self.config.format}"
+            ),
+            "wb",
+        )
+        self.unsynced_files.append(file)
+        file.write(data)
+        self.files_written += 1
+
+        if len(self.unsynced_files) >= self.config.sync_batch:
+            self.sync()
+
+        self.write_time.record(time.perf_counter() - start)
+        self.written.increment()
+        self.bytes_written.increment(len(data))
+
+    def claim_directory(self) -> str:
+        # Every job continues in a new subdirectory, so it never overwrites files.
+        # Jobs sharing the path race for the next number, mkdir decides the winner
+        while True:
+            index = (
+                max(
+                    (int(name) for name in os.listdir(self.path) if name.isdigit()),
+                    default=-1,
+                )
+                + 1
+            )
+            directory = os.path.join(self.path, f"{index:05d}")
+
+            try:
+                os.mkdir(directory)
+            except FileExistsError:
+                continue
+
+            return directory
+
+    def sync(self):
+        if not self.unsynced_files:
+            return
+
+        # One sync per batch instead of per file keeps the disk streaming
+        for file in self.unsynced_files:
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+
+        self.unsynced_files.clear()
+
+        try:
+            directory_fd = os.open(self.directory, os.O_RDONLY)
+        except OSError:
+            return
+
+        try:
+            os.fsync(directory_fd)
+        except OSError:
+            pass
+        finally:
+            os.close(directory_fd)
+
+    @property
+    def status(self) -> CaptureJobStatus:
+        return CaptureJobStatus(
+            id=self.id,
+            config=self.config,
+            active=self.active,
+            error=self.error,
+            directory=self.directory,
+            captured=self.captured.snapshot(),
+            dropped=self.dropped.snapshot(),
+            written=self.written.snapshot(),
+            bytes_written=self.bytes_written.snapshot(),
+            backlog=self.queue.qsize(),
+            write_time=self.write_time.snapshot(),
+        )
+
+
+class CaptureJobService:
+    def __init__(self, camera_manager: CameraManager):
+        self.camera_manager = camera_manager
+        self.capture_dir = os.getenv("CAPTURE_DIR") or "captures"
+        self.jobs: dict[str, CaptureJob] = {}
+        # Shared by all jobs, so concurrent jobs don't multiply the encoder threads
+        self.executor = ThreadPoolExecutor(os.cpu_count())
+
+    def __del__(self):
+        self.stop()
+
+    def stop(self):
+        for job in self.jobs.values():
+            job.stop()
+
+        # Images already submitted are still encoded and written by their jobs
+        self.executor.shutdown(wait=False)
+
+    def start(self, config: CaptureJobConfig) -> CaptureJobStatus:
+        camera = self.camera_manager[config.mxid]
+
+        if config.stream_name not in camera.sensors.keys():
+            raise SensorNotFoundException()
+
+        job = CaptureJob(
+            uuid.uuid4().hex,
+            config,
+            os.path.join(self.capture_dir, config.directory),
+            lambda: self.camera_manager[config.mxid].sensors[config.stream_name],
+            self.executor,
+        )
+        self.jobs[job.id] = job
+        job.start()
+
+        return job.status
+
+    def __getitem__(self, job_id: str) -> CaptureJob:
+        job = self.jobs.get(job_id)
+
+        if job is None:
+            raise CaptureJobNotFoundException()
+
+        return job
+
+    def remove(self, job_id: str) -> CaptureJobStatus:
+        job = self[job_id]
+        job.stop()
+        del self.jobs[job_id]
+
+        return job.status
+
+
+@lru_cache(maxsize=1)
+def capture_job_service_factory(camera_manager: CameraManager):
+    return CaptureJobService(camera_manager)
@@ -0,0 +1,129 @@
+from functools import lru_cache
+import depthai as dai
+from enum import Enum
+import json
+import numpy as np
+import struct
+from typing import Any, Callable
+
+from .broadcast import BroadcastService
+from .camera.camera_manager import CameraManager
+from .camera.sensor.sensor_base import SensorBase
+from .stream import StreamKey
+from .utils.detections_parser import (
+    cascade_to_array,
+    detections_to_array,
+    is_cascade,
+    parse_cascade,
+    parse_detections,
+)
+from .video_encoder import VideoEncoder
+from .websocket import MessageSink
+
+DETECTIONS_MAGIC = b"DETS"
+DETECTIONS_VERSION = 1
+# Magic, version, kind, float32 values per record, sequence number, capture time
+# and number of records
+DETECTIONS_HEADER = struct.Struct("<4sBBHQdI4x")
+
+
+class DetectionsKind(Enum):
+    DETECTIONS = 0
+    SPATIAL_DETECTIONS = 1
+    TENSOR = 2
+    CASCADE = 3
+
+
+class DetectionsFormat(Enum):
+    JSON = "json"
+    BINARY = "binary"
+
+
+def pack_detections(
+    detections: dai.Buffer | dai.NNData | dai.ImgDetections | dai.SpatialImgDetections,
+) -> bytes:
+    if is_cascade(detections):
+        kind = DetectionsKind.CASCADE
+        records = cascade_to_array(detections)
+    elif isinstance(detections, dai.NNData):
+        kind = DetectionsKind.TENSOR
+        records = np.array(detections.getFirstLayerFp16(), dtype="<f4").reshape(-1, 1)
+    else:
+        kind = (
+            DetectionsKind.SPATIAL_DETECTIONS
+            if isinstance(detections, dai.SpatialImgDetections)
+            else DetectionsKind.DETECTIONS
+        )
+        records = detections_to_array(detections)
+
+    header = DETECTIONS_HEADER.pack(
+        DETECTIONS_MAGIC,
+        DETECTIONS_VERSION,
+        kind.value,
+        records.shape[1],
+        detections.getSequenceNum(),
+        detections.getTimestamp().total_seconds(),
+        records.shape[0],
+    )
+
+    return header + records.tobytes()
+
+
+def serialize_detections(
+    detections: dai.Buffer | dai.NNData | dai.ImgDetections | dai.SpatialImgDetections,
+) -> list[Any]:
+    if is_cascade(detections):
+        return parse_cascade(detections)
+    elif isinstance(detections, dai.NNData):
+        return detections.getFirstLayerFp16()
+
+    return parse_detections(detections)
+
+
+class DetectionsStreamService(BroadcastService):
+    NAME = "Detections"
+    ITEMS = "results"
+
+    async def subscribe(
+        self,
+        key: StreamKey,
+        handler: MessageSink,
+        on_close: Callable[[], None] | None = None,
+        max_queue_size: int = 10,
+        format: DetectionsFormat = DetectionsFormat.JSON,
+    ):
+        await super().subscribe(key, handler, on_close, max_queue_size, format)
+
+    # The only reader of the NN queue, every result reaches all subscribers
+    def read(
+        self, sensor: SensorBase
+    ) -> dai.Buffer | dai.NNData | dai.ImgDetections | dai.SpatialImgDetections:
+        return sensor.get_nn_detections()
+
+    def serialize(
+        self,
+        sensor: SensorBase,
+        detections: (
+            dai.Buffer | dai.NNData | dai.ImgDetections | dai.SpatialImgDetections
+        ),
+        format: DetectionsFormat,
+    ) -> str | bytes:
+        if format == DetectionsFormat.BINARY:
+            return pack_detections(detections)
+
+        capture_time = detections.getTimestamp().total_seconds()
+
+        return json.dumps(
+            {
+                "sequence_num": detections.getSequenceNum(),
+                "timestamp": capture_time,
+                # Matches the PTS of the frame in the video of the sensor
+                "pts": VideoEncoder.to_pts(capture_time),
+                "detections": serialize_detections(detections),
+            }
+        )
+
+
+@lru_cache(maxsize=1)
+def detections_stream_service_factory(camera_manager: CameraManager):
+    return DetectionsStreamService(camera_manager)
@@ -24,3 +24,11 @@ class DeviceNotFound(Exception):
 
 class CameraException(Exception):
     pass
+
+
+class CaptureJobNotFoundException(Exception):
+    pass
+
+
+class ModelNotFoundException(Exception):
+    pass
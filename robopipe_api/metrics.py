@@ -0,0 +1,107 @@
+from collections import deque
+import bisect
+import math
+import time
+
+from .models.metrics import Counter, Histogram, HistogramBucket
+
+WINDOW = 10.0
+TIME_BUCKETS = (0.001, 0.002, 0.005, 0.01, 0.02, 0.05, 0.1, 0.2, 0.5, 1.0)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class RollingWindow:
+    def __init__(self, window: float = WINDOW):
+        self.window = window
+        self.samples: deque[tuple[float, float]] = deque()
+        self.started = time.monotonic()
+
+    def add(self, value: float):
+        now = time.monotonic()
+        self.samples.append((now, value))
+        self.expire(now)
+
+    def expire(self, now: float):
+        while self.samples and self.samples[0][0] < now - self.window:
+            self.samples.popleft()
+
+    def values(self) -> list[float]:
+        since = time.monotonic() - self.window
+
+        # Only the recording thread expires samples, readers just skip old ones
+        return [value for timestamp, value in list(self.samples) if timestamp >= since]
+
+    @property
+    def elapsed(self) -> float:
+        # Rates of a window that is not filled yet are not diluted
+        return max(min(self.window, time.monotonic() - self.started), 1e-3)
+
+
+class RollingHistogram(RollingWindow):
+    def __init__(
+        self, buckets: tuple[float, ...] = TIME_BUCKETS, window: float = WINDOW
+    ):
+        super().__init__(window)
+        self.buckets = buckets
+        self.last: float | None = None
+
+    def record(self, value: float):
+        self.last = value
+        self.add(value)
+
+    def snapshot(self) -> Histogram:
+        values = sorted(self.values())
+
+        if not values:
+            return Histogram(count=0, rate=0.0)
+
+        counts = [0] * (len(self.buckets) + 1)
+
+        for value in values:
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+
+        percentile = lambda p: values[
+            min(len(values) - 1, math.ceil(len(values) * p) - 1)
+        ]
+
+        return Histogram(
+            count=len(values),
+            rate=len(values) / self.elapsed,
+            mean=sum(values) / len(values),
+            min=values[0],
+            max=values[-1],
+            p50=percentile(0.5),
+            p90=percentile(0.9),
+            p99=percentile(0.99),
+            buckets=[
+                HistogramBucket(upper_bound=upper_bound, count=count)
+                for upper_bound, count in zip((*self.buckets, None), counts)
+            ],
+        )
+
+
+class RollingCounter(RollingWindow):
+    def __init__(self, window: float = WINDOW):
+        super().__init__(window)
+        self.total = 0
+
+    def increment(self, count: int = 1):
+        if count <= 0:
+            return
+
+        self.total += count
+        self.add(count)
+
+    def snapshot(self) -> Counter:
+        count = int(sum(self.values()))
+
+        return Counter(total=self.total, window=count, rate=count / self.elapsed)
+
+
+class EncoderMetrics:
+    def __init__(self):
+        self.fragment_size = RollingHistogram(SIZE_BUCKETS)
+        self.conversion_time = RollingHistogram()
+        self.encode_time = RollingHistogram()
+        self.mux_time = RollingHistogram()
+        self.skipped_frames = RollingCounter()
@@ -0,0 +1,48 @@
+from functools import lru_cache
+import depthai as dai
+from typing import Callable, Hashable
+
+from .broadcast import BroadcastService
+from .camera.camera_manager import CameraManager
+from .camera.sensor.sensor_base import SensorBase
+from .stream import StreamKey
+from .websocket import MessageSink
+
+MJPEG_BOUNDARY = "frame"
+
+
+class MjpegStreamService(BroadcastService):
+    NAME = "MJPEG"
+    ITEMS = "frames"
+
+    async def subscribe(
+        self,
+        key: StreamKey,
+        handler: MessageSink,
+        on_close: Callable[[], None] | None = None,
+        max_queue_size: int = 2,
+    ):
+        await super().subscribe(key, handler, on_close, max_queue_size)
+
+    def read(self, sensor: SensorBase) -> dai.EncodedFrame:
+        return sensor.get_mjpeg_frame()
+
+    def serialize(
+        self, sensor: SensorBase, frame: dai.EncodedFrame, variant: Hashable
+    ) -> bytes:
+        data = frame.getData()
+
+        return b"".join(
+            (
+                b"--" + MJPEG_BOUNDARY.encode() + b"\r\n",
+                b"Content-Type: image/jpeg\r\n",
+                b"Content-Length: %d\r\n\r\n" % len(data),
+                data,
+                b"\r\n",
+            )
+        )
+
+
+@lru_cache(maxsize=1)
+def mjpeg_stream_service_factory(camera_manager: CameraManager):
+    return MjpegStreamService(camera_manager)
@@ -0,0 +1,128 @@
+from fastapi import UploadFile
+from functools import lru_cache
+import anyio.to_thread
+import depthai as dai
+
+import hashlib
+import json
+import os
+import pathlib
+import re
+import tempfile
+
+from .camera.nn import BlobFile
+from .error import ModelNotFoundException
+from .models.model_blob import SHA256_PATTERN, ModelBlob
+
+BLOB_EXTENSION = ".blob"
+# Input and output dims of a blob, stored next to it so it is parsed only once
+SHAPES_EXTENSION = ".json"
+
+
+class ModelCache:
+    CHUNK_SIZE = 1024 * 1024
+
+    def __init__(self, path: str):
+        self.path = pathlib.Path(path)
+
+    def get_blob_path(self, sha256: str) -> pathlib.Path:
+        if not re.match(SHA256_PATTERN, sha256):
+            raise ModelNotFoundException()
+
+        blob_path = self.path / (sha256 + BLOB_EXTENSION)
+
+        if not blob_path.exists():
+            raise ModelNotFoundException()
+
+        return blob_path
+
+    def get_blob_file(self, sha256: str) -> BlobFile:
+        blob_path = self.get_blob_path(sha256)
+
+        try:
+            with open(blob_path.with_suffix(SHAPES_EXTENSION)) as f:
+                shapes = json.load(f)
+        except (OSError, ValueError):
+            # Blobs cached before the dims were stored are parsed on first use
+            shapes = self.store_shapes(blob_path, dai.OpenVINO.Blob(blob_path))
+
+        return BlobFile(blob_path, shapes["input_shape"], shapes["output_shape"])
+
+    def store_shapes(self, blob_path: pathlib.Path, blob: dai.OpenVINO.Blob) -> dict:
+        shapes = {
+            "input_shape": list(blob.networkInputs.values())[0].dims,
+            "output_shape": list(blob.networkOutputs.values())[0].dims,
+        }
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        with os.fdopen(fd, "w") as f:
+            json.dump(shapes, f)
+
+        os.replace(temp_path, blob_path.with_suffix(SHAPES_EXTENSION))
+
+        return shapes
+
+    def get(self, sha256: str) -> ModelBlob:
+        stat = self.get_blob_path(sha256).stat()
+
+        return ModelBlob(sha256=sha256, size=stat.st_size, created=stat.st_mtime)
+
+    def list(self) -> list[ModelBlob]:
+        if not self.path.exists():
+            return []
+
+        return sorted(
+            (
+                self.get(blob_path.stem)
+                for blob_path in self.path.glob("*" + BLOB_EXTENSION)
+                if re.match(SHA256_PATTERN, blob_path.stem)
+            ),
+            key=lambda blob: blob.created,
+        )
+
+    async def store(self, upload: UploadFile) -> ModelBlob:
+        self.path.mkdir(parents=True, exist_ok=True)
+        sha256 = hashlib.sha256()
+        # The upload is hashed while it streams to disk, it is never held in memory
+        fd, temp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                while chunk := await upload.read(self.CHUNK_SIZE):
+                    sha256.update(chunk)
+                    await anyio.to_thread.run_sync(f.write, chunk)
+
+                await anyio.to_thread.run_sync(os.fsync, f.fileno())
+
+            # Only valid blobs are cached, parsing reads the file outside of Python
+            try:
+                blob = await anyio.to_thread.run_sync(
+                    dai.OpenVINO.Blob, pathlib.Path(temp_path)
+                )
+            except Exception as e:
+                raise ValueError(f"Invalid model blob: {e}")
+
+            blob_path = self.path / (sha256.hexdigest() + BLOB_EXTENSION)
+            await anyio.to_thread.run_sync(self.store_shapes, blob_path, blob)
+
+            if blob_path.exists():
+                os.remove(temp_path)
+            else:
+                os.replace(temp_path, blob_path)
+        except:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+            raise
+
+        return self.get(sha256.hexdigest())
+
+    def remove(self, sha256: str):
+        blob_path = self.get_blob_path(sha256)
+        os.remove(blob_path)
+        blob_path.with_suffix(SHAPES_EXTENSION).unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=1)
+def model_cache_factory():
+    return ModelCache(os.getenv("MODEL_CACHE_DIR") or "models")
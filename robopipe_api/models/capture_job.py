@@ -0,0 +1,95 @@
+from PIL import Image
+from pydantic import Field, field_validator
+
+from typing import Annotated
+
+from .base_model import BaseModel
+from .metrics import Counter, Histogram
+
+
+class CaptureJobConfig(BaseModel):
+    mxid: Annotated[str, Field(pattern=r"^[A-Z0-9]+$")]
+    stream_name: Annotated[
+        str, Field(pattern=r"^(CAM_[A-H](_ROI_[A-Z0-9]+)?|DEPTH_[A-H]_[A-H])$")
+    ]
+    fps: Annotated[
+        float | None,
+        Field(description="Frames written per second, all frames if not set", gt=0),
+    ] = None
+    format: Annotated[str, Field(description="Image format of the files")] = "jpeg"
+    directory: Annotated[
+        str,
+        Field(
+            description="Target directory, relative to the capture directory of the server"
+        ),
+    ]
+    files_per_directory: Annotated[
+        int,
+        Field(
+            description="Files written before the job continues in a new subdirectory",
+            ge=1,
+            le=100000,
+        ),
+    ] = 1000
+    sync_batch: Annotated[
+        int,
+        Field(description="Files written between two syncs to the disk", ge=1, le=1000),
+    ] = 30
+    queue_size: Annotated[
+        int,
+        Field(
+            description="Frames waiting to be written before new ones are dropped",
+            ge=1,
+            le=1000,
+        ),
+    ] = 60
+    max_frames: Annotated[
+        int | None,
+        Field(description="The job finishes after writing this many frames", ge=1),
+    ] = None
+
+    @field_validator("directory")
+    @classmethod
+    def check_directory(cls, directory: str) -> str:
+        parts = directory.replace("\\", "/").split("/")
+
+        if directory.startswith(("/", "\\")) or any(
+            part in ("", ".", "..") for part in parts
+        ):
+            raise ValueError("directory must be a relative path without . or ..")
+
+        return directory
+
+    @field_validator("format")
+    @classmethod
+    def check_format(cls, format: str) -> str:
+        # Registers the plugins, the writers are only known once they are loaded
+        Image.init()
+
+        if format.upper() not in Image.SAVE:
+            raise ValueError(
+                f"format must be one of {', '.join(sorted(Image.SAVE)).lower()}"
+            )
+
+        return format
+
+
+class CaptureJobStatus(BaseModel):
+    id: str
+    config: CaptureJobConfig
+    active: bool
+    error: str | None = None
+    directory: Annotated[
+        str | None, Field(description="Directory the job is writing to")
+    ] = None
+    captured: Annotated[Counter, Field(description="Frames taken from the sensor")]
+    dropped: Annotated[
+        Counter, Field(description="Frames dropped because the queue was full")
+    ]
+    written: Annotated[Counter, Field(description="Files written")]
+    bytes_written: Counter
+    backlog: Annotated[int, Field(description="Frames waiting to be written")]
+    write_time: Annotated[
+        Histogram,
+        Field(description="Seconds spent writing a file, excluding the encoding"),
+    ]
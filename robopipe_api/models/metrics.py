@@ -0,0 +1,87 @@
+from pydantic import Field
+
+from typing import Annotated
+
+from .base_model import BaseModel
+
+
+class HistogramBucket(BaseModel):
+    upper_bound: Annotated[
+        float | None,
+        Field(description="Inclusive upper bound, None for the overflow bucket"),
+    ]
+    count: int
+
+
+class Histogram(BaseModel):
+    count: Annotated[int, Field(description="Number of samples in the window")]
+    rate: Annotated[float, Field(description="Samples per second in the window")]
+    mean: float | None = None
+    min: float | None = None
+    max: float | None = None
+    p50: float | None = None
+    p90: float | None = None
+    p99: float | None = None
+    buckets: list[HistogramBucket] = []
+
+
+class Counter(BaseModel):
+    total: Annotated[int, Field(description="Count since the stream started")]
+    window: Annotated[int, Field(description="Count in the window")]
+    rate: Annotated[float, Field(description="Count per second in the window")]
+
+
+class SubscriberMetrics(BaseModel):
+    sent: int
+    dropped: int
+    queued: int
+    send_latency: Annotated[
+        Histogram,
+        Field(
+            description="Seconds spent sending a fragment, its rate is the delivered fps"
+        ),
+    ]
+    capture_latency: Annotated[
+        Histogram,
+        Field(description="Seconds from the frame capture until its fragment was sent"),
+    ]
+
+
+class RenditionMetrics(BaseModel):
+    width: int
+    height: int
+    adaptive: bool
+    bit_rate: int | None = None
+    frame_interval: int
+    fragment_size: Annotated[
+        Histogram,
+        Field(description="Fragment size in bytes, its rate is the encoded fps"),
+    ]
+    conversion_time: Annotated[
+        Histogram,
+        Field(description="Seconds spent scaling and converting the pixel format"),
+    ]
+    encode_time: Annotated[Histogram, Field(description="Seconds spent encoding")]
+    mux_time: Annotated[Histogram, Field(description="Seconds spent muxing")]
+    skipped_frames: Annotated[
+        Counter, Field(description="Frames left out to lower the frame rate")
+    ]
+    subscribers: list[SubscriberMetrics]
+
+
+class StreamMetrics(BaseModel):
+    window: Annotated[
+        float, Field(description="Length of the rolling window in seconds")
+    ]
+    active: bool
+    acquire_time: Annotated[
+        Histogram,
+        Field(
+            description="Seconds spent waiting for a frame from the camera, its rate is the captured fps"
+        ),
+    ]
+    dropped_frames: Annotated[
+        Counter,
+        Field(description="Camera frames replaced by a newer one before encoding"),
+    ]
+    renditions: list[RenditionMetrics] = []
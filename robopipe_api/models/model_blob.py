@@ -0,0 +1,13 @@
+from pydantic import Field
+
+from typing import Annotated
+
+from .base_model import BaseModel
+
+SHA256_PATTERN = r"^[0-9a-f]{64}$"
+
+
+class ModelBlob(BaseModel):
+    sha256: Annotated[str, Field(description="SHA-256 of the blob, used to deploy it")]
+    size: Annotated[int, Field(description="Size of the blob in bytes")]
+    created: Annotated[float, Field(description="Time of the first upload")]
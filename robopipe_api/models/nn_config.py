@@ -1,9 +1,10 @@
-from pydantic import model_validator
+from pydantic import Field, model_validator
 
 from enum import Enum
-from typing import Any
+from typing import Annotated, Any
 
 from .base_model import BaseModel
+from .model_blob import SHA256_PATTERN
 
 
 class NNType(Enum):
@@ -45,3 +46,44 @@ class NNConfig(BaseModel):
     type: NNType
     num_inference_threads: int = 2
     nn_config: NNYoloConfig | NNMobileNetConfig | None = None
+
+
+class NNCascadeConfig(BaseModel):
+    detector: Annotated[
+        NNConfig, Field(description="YOLO or MobileNet network finding the objects")
+    ]
+    detector_sha256: Annotated[
+        str,
+        Field(
+            description="Blob of the detector in the model cache",
+            pattern=SHA256_PATTERN,
+        ),
+    ]
+    classifier_sha256: Annotated[
+        str,
+        Field(
+            description="Blob of the generic network run on the crop of each detection",
+            pattern=SHA256_PATTERN,
+        ),
+    ]
+    padding: Annotated[
+        float,
+        Field(
+            description="Margin added around each crop relative to its size",
+            ge=0,
+            le=0.5,
+        ),
+    ] = 0
+    max_crops: Annotated[
+        int,
+        Field(
+            description="Most confident detections classified per frame", ge=1, le=32
+        ),
+    ] = 8
+
+    @model_validator(mode="after")
+    def check_detector_type(self):
+        if self.detector.type not in (NNType.YOLO, NNType.MobileNet):
+            raise ValueError("detector must be a YOLO or MobileNet network")
+
+        return self
@@ -0,0 +1,37 @@
+from pydantic import Field
+
+from typing import Annotated
+
+from .base_model import BaseModel
+
+
+class RecordingConfig(BaseModel):
+    segment_duration: Annotated[
+        int,
+        Field(
+            description="Length of one segment file in seconds, segments always start with a keyframe",
+            ge=1,
+            le=600,
+        ),
+    ] = 10
+    max_duration: Annotated[
+        int | None,
+        Field(description="Seconds of video kept on disk", ge=1),
+    ] = 600
+    max_size: Annotated[
+        int | None,
+        Field(description="Megabytes of video kept on disk", ge=1),
+    ] = None
+
+
+class RecordingSegment(BaseModel):
+    name: str
+    start: float
+    end: float
+    size: int
+
+
+class RecordingStatus(BaseModel):
+    active: bool
+    config: RecordingConfig | None = None
+    segments: list[RecordingSegment] = []
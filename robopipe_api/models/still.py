@@ -0,0 +1,36 @@
+from pydantic import Field
+
+from typing import Annotated
+
+from .base_model import BaseModel
+
+
+class StillTarget(BaseModel):
+    mxid: Annotated[str, Field(pattern=r"^[A-Z0-9]+$")]
+    stream_name: Annotated[
+        str, Field(pattern=r"^(CAM_[A-H](_ROI_[A-Z0-9]+)?|DEPTH_[A-H]_[A-H])$")
+    ]
+
+
+class SynchronizedStill(BaseModel):
+    mxid: str
+    stream_name: str
+    image: Annotated[str, Field(description="Base64 encoded image")]
+    width: int
+    height: int
+    sequence_num: int
+    timestamp: Annotated[
+        float,
+        Field(description="Capture time in seconds, synchronized to the host clock"),
+    ]
+    device_timestamp: Annotated[
+        float, Field(description="Capture time in seconds of the camera's own clock")
+    ]
+
+
+class SynchronizedStills(BaseModel):
+    stills: list[SynchronizedStill]
+    skew: Annotated[
+        float,
+        Field(description="Seconds between the first and the last capture"),
+    ]
@@ -0,0 +1,278 @@
+import av
+import numpy as np
+
+from multiprocessing import get_context
+from multiprocessing.connection import Connection
+from multiprocessing.shared_memory import SharedMemory
+from types import SimpleNamespace
+import time
+from typing import NamedTuple
+
+from .camera.sensor.sensor_base import VideoReader
+from .camera.video_encoding import VideoEncodingConfig
+from .log import logger
+from .metrics import EncoderMetrics
+from .utils.buffer_pool import BufferPool, PooledBuffer
+from .utils.image import VIDEO_FRAME_TIME_BASE
+from .video_encoder import VideoEncoder, VideoFragment
+
+# Array, its pixel format and the capture time
+RawFrame = tuple[np.ndarray, str, float]
+
+
+class FrameMessage(NamedTuple):
+    shape: tuple[int, ...]
+    dtype: str
+    format: str
+    capture_time: float
+    frame_index: int
+    bit_rate: int | None
+    # Only set when the frame does not fit into the shared memory
+    array: np.ndarray | None = None
+
+
+class FragmentMessage(NamedTuple):
+    # Size of the fragment in the shared memory, or the data if it did not fit
+    data: int | bytes
+    keyframe: bool
+    timestamp: float | None
+    capture_time: float | None
+    # Conversion, encode and mux time of the worker
+    timings: tuple[float, float, float]
+
+
+class SharedFrameSource:
+    def __init__(self, fps: float, frame: av.VideoFrame):
+        self.config = SimpleNamespace(fps=fps)
+        self.frame = frame
+
+    def get_video_frame(self) -> av.VideoFrame:
+        return self.frame
+
+
+def load_frame(memory: SharedMemory, message: FrameMessage) -> av.VideoFrame:
+    if message.array is not None:
+        frame = av.VideoFrame.from_ndarray(message.array, message.format)
+    else:
+        array = np.ndarray(message.shape, message.dtype, memory.buf)
+        frame = av.VideoFrame.from_ndarray(array, message.format)
+        del array
+
+    frame.pts = round(message.capture_time / VIDEO_FRAME_TIME_BASE)
+    frame.time_base = VIDEO_FRAME_TIME_BASE
+
+    return frame
+
+
+def encoder_worker(
+    connection: Connection,
+    fps: float,
+    encoding: VideoEncodingConfig,
+    height: int | None,
+    input_name: str,
+    output_name: str,
+):
+    input_memory = SharedMemory(input_name)
+    output_memory = SharedMemory(output_name)
+    encoder = None
+
+    try:
+        while (message := connection.recv()) is not None:
+            frame = load_frame(input_memory, message)
+
+            if encoder is None:
+                encoder = VideoEncoder(SharedFrameSource(fps, frame), encoding, height)
+                connection.send(
+                    (
+                        encoder.width,
+                        encoder.height,
+                        encoder.source_height,
+                        encoder.bit_rate,
+                        encoder.init_fragment,
+                    )
+                )
+                continue
+
+            if message.bit_rate is not None:
+                encoder.bit_rate = message.bit_rate
+
+            encoder.frame_index = message.frame_index
+            fragment = encoder.encode_frame(frame)
+
+            if fragment is None:
+                connection.send(None)
+                continue
+
+            size = len(fragment.data)
+
+            if size <= output_memory.size:
+                output_memory.buf[:size] = fragment.data
+                data = size
+            else:
+                data = bytes(fragment.data)
+
+            connection.send(
+                FragmentMessage(
+                    data,
+                    fragment.keyframe,
+                    fragment.timestamp,
+                    fragment.capture_time,
+                    (
+                        encoder.metrics.conversion_time.last,
+                        encoder.metrics.encode_time.last,
+                        encoder.metrics.mux_time.last,
+                    ),
+                )
+            )
+            fragment.release()
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        del encoder
+        input_memory.close()
+        output_memory.close()
+
+
+class ProcessVideoEncoder(VideoEncoder):
+    OUTPUT_MEMORY_SIZE = 8 * 1024 * 1024
+
+    def __init__(
+        self,
+        sensor: VideoReader,
+        encoding: VideoEncodingConfig | None = None,
+        height: int | None = None,
+    ):
+        self.sensor = sensor
+        self.encoding = encoding or VideoEncodingConfig()
+        self.buffer_pool = BufferPool()
+        self.bit_rate = None
+        self.frame_interval = 1
+        self.frame_index = 0
+        self.metrics = EncoderMetrics()
+        self.process = None
+
+        sample_frame = self.read_frame()
+        self.input_memory = SharedMemory(create=True, size=sample_frame[0].nbytes)
+        self.output_memory = SharedMemory(create=True, size=self.OUTPUT_MEMORY_SIZE)
+
+        # Forking a process with running XLink threads is not safe
+        context = get_context("spawn")
+        self.connection, worker_connection = context.Pipe()
+        self.process = context.Process(
+            target=encoder_worker,
+            args=(
+                worker_connection,
+                self.sensor.config.fps,
+                self.encoding,
+                height,
+                self.input_memory.name,
+                self.output_memory.name,
+            ),
+            daemon=True,
+        )
+        self.process.start()
+        worker_connection.close()
+
+        try:
+            self.send_frame(sample_frame)
+            (
+                self.width,
+                self.height,
+                self.source_height,
+                self.bit_rate,
+                self.initialization_fragment,
+            ) = self.connection.recv()
+        except:
+            self.close()
+            raise
+
+    def __del__(self):
+        self.close()
+
+    def close(self):
+        if self.process is None:
+            return
+
+        try:
+            self.connection.send(None)
+        except OSError:
+            pass
+
+        self.process.join(1)
+
+        if self.process.is_alive():
+            self.process.terminate()
+
+        self.process = None
+        self.connection.close()
+
+        for memory in (self.input_memory, self.output_memory):
+            memory.close()
+            memory.unlink()
+
+    def read_frame(self) -> RawFrame:
+        return self.sensor.get_video_array()
+
+    def send_frame(self, frame: RawFrame):
+        array, format, capture_time = frame
+        array = np.ascontiguousarray(array)
+
+        if array.nbytes <= self.input_memory.size:
+            np.ndarray(array.shape, array.dtype, self.input_memory.buf)[...] = array
+            shared_array = None
+        else:
+            logger.debug("Frame does not fit into the shared memory, sending a copy")
+            shared_array = array
+
+        self.connection.send(
+            FrameMessage(
+                array.shape,
+                array.dtype.str,
+                format,
+                capture_time,
+                self.frame_index,
+                self.bit_rate,
+                shared_array,
+            )
+        )
+
+    def encode_frame(self, frame: RawFrame) -> VideoFragment | None:
+        if self.frame_index % self.frame_interval:
+            self.frame_index += 1
+            self.metrics.skipped_frames.increment()
+            return None
+
+        start = time.perf_counter()
+        self.send_frame(frame)
+        copy_time = time.perf_counter() - start
+        self.frame_index += 1
+        message: FragmentMessage | None = self.connection.recv()
+
+        if message is None:
+            return None
+
+        # Copying the frame into the shared memory replaces the host conversion
+        conversion_time, encode_time, mux_time = message.timings
+        self.metrics.conversion_time.record(copy_time + conversion_time)
+        self.metrics.encode_time.record(encode_time)
+        self.metrics.mux_time.record(mux_time)
+
+        if isinstance(message.data, int):
+            size = message.data
+            buffer = PooledBuffer(
+                self.buffer_pool, self.buffer_pool.acquire(size), size
+            )
+            buffer.view[:] = self.output_memory.buf[:size]
+        else:
+            size = len(message.data)
+            buffer = PooledBuffer(self.buffer_pool, bytearray(message.data), size)
+
+        self.metrics.fragment_size.record(size)
+
+        return VideoFragment(
+            buffer.view,
+            message.keyframe,
+            buffer,
+            message.timestamp,
+            message.capture_time,
+        )
@@ -0,0 +1,97 @@
+import time
+
+from .log import logger
+from .video_encoder import VideoEncoder
+
+
+class AdaptiveBitrateController:
+    UPDATE_INTERVAL = 1.0
+    RECOVERY_DELAY = 5.0
+    DECREASE_FACTOR = 0.7
+    INCREASE_FACTOR = 1.2
+    MIN_BIT_RATE_RATIO = 0.1
+    MAX_FRAME_INTERVAL = 4
+    CONGESTED_QUEUE_FILL = 0.5
+    RECOVERED_QUEUE_FILL = 0.1
+
+    def __init__(self, encoder: VideoEncoder):
+        self.encoder = encoder
+        self.max_bit_rate = encoder.bit_rate
+        self.min_bit_rate = int(encoder.bit_rate * self.MIN_BIT_RATE_RATIO)
+        self.last_update = time.monotonic()
+        self.last_congestion = self.last_update
+        self.dropped: dict[int, int] = {}
+
+    def update(self, subscribers: list):
+        now = time.monotonic()
+
+        if now - self.last_update < self.UPDATE_INTERVAL:
+            return
+
+        self.last_update = now
+        congested = False
+        recovered = True
+        dropped_total = {}
+
+        for subscriber in subscribers:
+            queue_fill = len(subscriber.queue) / subscriber.queue.max_size
+            dropped = subscriber.dropped - self.dropped.get(id(subscriber), 0)
+            dropped_total[id(subscriber)] = subscriber.dropped
+
+            if (
+                dropped > 0
+                or queue_fill > self.CONGESTED_QUEUE_FILL
+                or subscriber.send_latency > self.frame_period
+            ):
+                congested = True
+
+            if (
+                queue_fill > self.RECOVERED_QUEUE_FILL
+                or subscriber.send_latency > self.frame_period / 2
+            ):
+                recovered = False
+
+        self.dropped = dropped_total
+
+        if congested:
+            self.last_congestion = now
+            self.decrease()
+        elif recovered and now - self.last_congestion >= self.RECOVERY_DELAY:
+            # Probes the link one step at a time, any congestion resets the delay
+            self.last_congestion = now
+            self.increase()
+
+    def decrease(self):
+        if self.encoder.bit_rate > self.min_bit_rate:
+            self.encoder.bit_rate = max(
+                self.min_bit_rate, int(self.encoder.bit_rate * self.DECREASE_FACTOR)
+            )
+        elif self.encoder.frame_interval < self.MAX_FRAME_INTERVAL:
+            self.encoder.frame_interval *= 2
+        else:
+            return
+
+        self.log("Lowered")
+
+    def increase(self):
+        if self.encoder.frame_interval > 1:
+            self.encoder.frame_interval //= 2
+        elif self.encoder.bit_rate < self.max_bit_rate:
+            self.encoder.bit_rate = min(
+                self.max_bit_rate, int(self.encoder.bit_rate * self.INCREASE_FACTOR)
+            )
+        else:
+            return
+
+        self.log("Raised")
+
+    def log(self, action: str):
+        logger.debug(
+            f"{action} stream quality to "
+            f"{self.encoder.bit_rate} b/s at 1/{self.encoder.frame_interval} "
+            "of the frame rate"
+        )
+
+    @property
+    def frame_period(self) -> float:
+        return self.encoder.frame_interval / self.encoder.sensor.config.fps
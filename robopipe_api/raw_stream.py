@@ -0,0 +1,96 @@
+from functools import lru_cache
+import depthai as dai
+import struct
+from typing import Callable
+
+from .broadcast import BroadcastService
+from .camera.camera_manager import CameraManager
+from .camera.sensor.sensor_base import SensorBase
+from .stream import StreamKey
+from .utils.compression import Compression, Compressor
+from .websocket import MessageSink
+
+RAW_FRAME_MAGIC = b"RAWF"
+RAW_FRAME_VERSION = 1
+# Magic, version, compression, number of dimensions, pixel format, numpy dtype,
+# shape padded to 4 dimensions, sequence number, capture time and data size
+RAW_FRAME_HEADER = struct.Struct("<4sBBBx16s4s4IQdI")
+RAW_FRAME_COMPRESSIONS = {
+    Compression.NONE: 0,
+    Compression.ZSTD: 1,
+    Compression.LZ4: 2,
+}
+
+
+def pack_raw_frame(img_frame: dai.ImgFrame, compressor: Compressor) -> bytes:
+    data = img_frame.getData()
+
+    try:
+        frame = img_frame.getFrame()
+        shape, dtype = frame.shape, frame.dtype
+    except Exception:
+        # Packed and vendor specific formats are sent as plain bytes
+        shape, dtype = data.shape, data.dtype
+
+    header = RAW_FRAME_HEADER.pack(
+        RAW_FRAME_MAGIC,
+        RAW_FRAME_VERSION,
+        RAW_FRAME_COMPRESSIONS[compressor.compression],
+        len(shape),
+        img_frame.getType().name.encode(),
+        dtype.str.encode(),
+        *shape,
+        *(0,) * (4 - len(shape)),
+        img_frame.getSequenceNum(),
+        img_frame.getTimestamp().total_seconds(),
+        data.nbytes,
+    )
+
+    return b"".join((header, compressor.compress(data)))
+
+
+class RawFrameSource:
+    def __init__(self, sensor: SensorBase):
+        self.reader = sensor.open_video_reader()
+        # Compression contexts are kept for the following frames
+        self.compressors: dict[Compression, Compressor] = {}
+
+
+class RawStreamService(BroadcastService):
+    NAME = "Raw"
+    ITEMS = "frames"
+
+    async def subscribe(
+        self,
+        key: StreamKey,
+        handler: MessageSink,
+        on_close: Callable[[], None] | None = None,
+        max_queue_size: int = 2,
+        compression: Compression = Compression.NONE,
+        decimation: int = 1,
+    ):
+        await super().subscribe(
+            key, handler, on_close, max_queue_size, compression, decimation
+        )
+
+    def open(self, sensor: SensorBase) -> RawFrameSource:
+        return RawFrameSource(sensor)
+
+    def close(self, source: RawFrameSource):
+        source.reader.close()
+
+    def read(self, source: RawFrameSource) -> dai.ImgFrame:
+        return source.reader.get_video_img_frames()[-1]
+
+    def serialize(
+        self, source: RawFrameSource, img_frame: dai.ImgFrame, compression: Compression
+    ) -> bytes:
+        if compression not in source.compressors:
+            source.compressors[compression] = Compressor(compression)
+
+        return pack_raw_frame(img_frame, source.compressors[compression])
+
+
+@lru_cache(maxsize=1)
+def raw_stream_service_factory(camera_manager: CameraManager):
+    return RawStreamService(camera_manager)
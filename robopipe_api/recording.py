@@ -0,0 +1,321 @@
+import av
+from functools import lru_cache
+import anyio
+import anyio.abc
+import anyio.to_thread
+
+from contextlib import asynccontextmanager
+import fractions
+import json
+import os
+import time
+from typing import Any, BinaryIO
+
+from .log import logger
+from .models.recording import RecordingConfig, RecordingSegment, RecordingStatus
+from .stream import StreamKey, StreamService
+from .subscriber import DropPolicy
+from .video_encoder import VideoFragment
+from .websocket import MessageSink
+
+INDEX_FILE = "index.json"
+
+
+def load_index(path: str) -> list[RecordingSegment]:
+    try:
+        with open(os.path.join(path, INDEX_FILE)) as f:
+            return [
+                RecordingSegment.model_validate(segment) for segment in json.load(f)
+            ]
+    except (FileNotFoundError, ValueError):
+        return []
+
+
+def save_index(path: str, segments: list[RecordingSegment]):
+    index_path = os.path.join(path, INDEX_FILE)
+
+    with open(index_path + ".tmp", "w") as f:
+        json.dump([segment.model_dump() for segment in segments], f)
+
+    os.replace(index_path + ".tmp", index_path)
+
+
+class Recorder(MessageSink):
+    def __init__(self, path: str, config: RecordingConfig):
+        self.path = path
+        self.config = config
+        self.active = True
+        self.init_fragment: bytes | None = None
+        self.segment: RecordingSegment | None = None
+        self.segment_file: BinaryIO | None = None
+
+        os.makedirs(path, exist_ok=True)
+        self.segments = load_index(path)
+
+    async def close(self):
+        await anyio.to_thread.run_sync(self.finish_segment)
+
+    async def send(self, data: VideoFragment | bytes | Any):
+        if not self.active:
+            raise RuntimeError("Recording stopped")
+
+        if isinstance(data, VideoFragment):
+            await anyio.to_thread.run_sync(self.write_fragment, data)
+        else:
+            # A new initialization segment means the stream was restarted
+            await anyio.to_thread.run_sync(self.finish_segment)
+            self.init_fragment = bytes(data)
+
+    def write_fragment(self, fragment: VideoFragment):
+        timestamp = fragment.timestamp or time.time()
+
+        if self.segment is None:
+            # Each segment must be decodable on its own
+            if not fragment.keyframe or self.init_fragment is None:
+                return
+
+            self.start_segment(timestamp)
+        elif (
+            fragment.keyframe
+            and timestamp - self.segment.start >= self.config.segment_duration
+        ):
+            self.finish_segment()
+            self.start_segment(timestamp)
+
+        self.segment_file.write(fragment.data)
+        self.segment_file.flush()
+        self.segment.end = timestamp
+        self.segment.size += len(fragment.data)
+
+    def start_segment(self, timestamp: float):
+        name = f"{round(timestamp * 1000)}.mp4"
+        self.segment_file = open(os.path.join(self.path, name), "wb")
+        self.segment_file.write(self.init_fragment)
+        self.segment = RecordingSegment(
+            name=name, start=timestamp, end=timestamp, size=len(self.init_fragment)
+        )
+
+    def finish_segment(self):
+        if self.segment is None:
+            return
+
+        self.segment_file.close()
+        self.segments.append(self.segment)
+        self.segment = None
+        self.segment_file = None
+        self.enforce_limits()
+        save_index(self.path, self.segments)
+
+    def enforce_limits(self):
+        max_size = self.config.max_size * 1024 * 1024 if self.config.max_size else None
+
+        while len(self.segments) > 1 and (
+            (
+                max_size is not None
+                and sum(segment.size for segment in self.segments) > max_size
+            )
+            or (
+                self.config.max_duration is not None
+                and self.segments[-1].end - self.segments[0].start
+                > self.config.max_duration
+            )
+        ):
+            segment = self.segments.pop(0)
+
+            try:
+                os.remove(os.path.join(self.path, segment.name))
+            except FileNotFoundError:
+                pass
+
+    @property
+    def all_segments(self) -> list[RecordingSegment]:
+        if self.segment is None:
+            return list(self.segments)
+
+        return self.segments + [self.segment.model_copy()]
+
+
+def export_recording(
+    path: str,
+    segments: list[RecordingSegment],
+    start: float,
+    end: float,
+    output_path: str,
+) -> bool:
+    EXPORT_TIME_BASE = fractions.Fraction(1, 90000)
+
+    output = av.open(output_path, "w", "mp4")
+    output_stream = None
+    exported = False
+    gop: list[tuple[av.Packet, float]] = []
+
+    def mux(packet: av.Packet, timestamp: float):
+        # Segments are rebased onto the wall clock, so gaps between them are kept
+        packet.stream = output_stream
+        packet.time_base = EXPORT_TIME_BASE
+        packet.pts = round((timestamp - start) / EXPORT_TIME_BASE)
+        packet.dts = packet.pts
+        output.mux(packet)
+
+    try:
+        for segment in segments:
+            if segment.end < start or segment.start > end:
+                continue
+
+            try:
+                segment_container = av.open(os.path.join(path, segment.name))
+            except (FileNotFoundError, av.FFmpegError):
+                continue
+
+            with segment_container:
+                segment_stream = segment_container.streams.video[0]
+
+                if output_stream is None:
+                    output_stream = output.add_stream(template=segment_stream)
+                elif (
+                    segment_stream.codec_context.name
+                    != output_stream.codec_context.name
+                    or segment_stream.codec_context.width
+                    != output_stream.codec_context.width
+                    or segment_stream.codec_context.height
+                    != output_stream.codec_context.height
+                ):
+                    logger.warning(
+                        f"Recording export stopped at {segment.name}, stream changed"
+                    )
+                    break
+
+                first_pts = None
+
+                try:
+                    for packet in segment_container.demux(segment_stream):
+                        if packet.pts is None:
+                            continue
+
+                        if first_pts is None:
+                            first_pts = packet.pts
+
+                        timestamp = segment.start + float(
+                            (packet.pts - first_pts) * packet.time_base
+                        )
+
+                        if timestamp > end:
+                            break
+
+                        if not exported:
+                            # Starts with the keyframe preceding the range
+                            if packet.is_keyframe:
+                                gop.clear()
+
+                            gop.append((packet, timestamp))
+
+                            if timestamp < start or not gop[0][0].is_keyframe:
+                                continue
+
+                            start = min(start, gop[0][1])
+                            exported = True
+
+                            for gop_packet, gop_timestamp in gop:
+                                mux(gop_packet, gop_timestamp)
+
+                            gop.clear()
+                            continue
+
+                        mux(packet, timestamp)
+                except av.FFmpegError:
+                    # The segment being recorded might end with a partial fragment
+                    pass
+    finally:
+        output.close()
+
+    return exported
+
+
+class RecordingService:
+    RETRY_DELAY = 1
+    QUEUE_SIZE = 300
+
+    def __init__(self, stream_service: StreamService):
+        self.stream_service = stream_service
+        self.recordings_dir = os.getenv("RECORDINGS_DIR") or "recordings"
+        self.recorders: dict[StreamKey, Recorder] = {}
+        self.task_group: anyio.abc.TaskGroup | None = None
+
+    @asynccontextmanager
+    async def run(self):
+        async with anyio.create_task_group() as tg:
+            self.task_group = tg
+
+            try:
+                yield
+            finally:
+                for key in list(self.recorders.keys()):
+                    self.stop(key)
+
+                self.task_group = None
+
+    def get_path(self, key: StreamKey) -> str:
+        return os.path.join(self.recordings_dir, *key)
+
+    def start(self, key: StreamKey, config: RecordingConfig):
+        if self.task_group is None:
+            raise RuntimeError("Recording service is not running")
+
+        if key in self.recorders:
+            # Limits apply from the next finished segment on
+            self.recorders[key].config = config
+            return
+
+        recorder = Recorder(self.get_path(key), config)
+        self.recorders[key] = recorder
+        self.task_group.start_soon(self.record, key, recorder)
+
+    def stop(self, key: StreamKey):
+        recorder = self.recorders.pop(key, None)
+
+        if recorder is None:
+            return
+
+        recorder.active = False
+        self.stream_service.unsubscribe(key, recorder)
+
+    async def record(self, key: StreamKey, recorder: Recorder):
+        # Keeps the stream running, resubscribing after pipeline restarts
+        while recorder.active:
+            try:
+                await self.stream_service.subscribe(
+                    key,
+                    recorder,
+                    max_queue_size=self.QUEUE_SIZE,
+                    drop_policy=DropPolicy.SKIP_TO_KEYFRAME,
+                    pass_fragments=True,
+                )
+            except Exception as e:
+                logger.warning(f"Recording of {key} interrupted: {e}")
+
+            if recorder.active:
+                await anyio.sleep(self.RETRY_DELAY)
+
+        await anyio.to_thread.run_sync(recorder.finish_segment)
+
+    def status(self, key: StreamKey) -> RecordingStatus:
+        recorder = self.recorders.get(key)
+
+        if recorder is None:
+            return RecordingStatus(
+                active=False, segments=load_index(self.get_path(key))
+            )
+
+        return RecordingStatus(
+            active=True, config=recorder.config, segments=recorder.all_segments
+        )
+
+    def export(self, key: StreamKey, start: float, end: float, output_path: str):
+        return export_recording(
+            self.get_path(key), self.status(key).segments, start, end, output_path
+        )
+
+
+@lru_cache(maxsize=1)
+def recording_service_factory(stream_service: StreamService):
+    return RecordingService(stream_service)
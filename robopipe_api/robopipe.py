@@ -10,13 +10,20 @@ from importlib.metadata import version
 import os
 
 from .camera.camera_manager import camera_manager_factory
+from .capture_job import capture_job_service_factory
 from .controller.config import EvokConfig, HWDict, create_devices
 from .controller.devices import Devices, RUN, OWBUS, TCPBUS, SERIALBUS, MODBUS_SLAVE
+from .detections_stream import detections_stream_service_factory
 from .error import (
     CameraNotFoundException,
+    CaptureJobNotFoundException,
+    ModelNotFoundException,
     SensorNotFoundException,
 )
-from .routers import cameras, controller, streams
+from .mjpeg_stream import mjpeg_stream_service_factory
+from .raw_stream import raw_stream_service_factory
+from .recording import recording_service_factory
+from .routers import cameras, capture_jobs, controller, nn_models, streams
 from .stream import stream_service_factory
 from . import __version__
 
@@ -33,36 +40,48 @@ async def lifespan(app: FastAPI):
     camera_manager = camera_manager_factory()
     camera_manager.boot_cameras()
     stream_service = stream_service_factory(camera_manager)
+    mjpeg_stream_service = mjpeg_stream_service_factory(camera_manager)
+    detections_stream_service = detections_stream_service_factory(camera_manager)
+    raw_stream_service = raw_stream_service_factory(camera_manager)
+    recording_service = recording_service_factory(stream_service)
+    capture_job_service = capture_job_service_factory(camera_manager)
     controller_config_path = os.getenv("CONTROLLER_CONFIG")
 
-    if controller_config_path is not None and os.path.exists(controller_config_path):
-        hw_dict = HWDict([f"{controller_config_path}/hw_definitions/"])
-        controller_config = EvokConfig(controller_config_path)
+    async with recording_service.run():
+        if controller_config_path is not None and os.path.exists(
+            controller_config_path
+        ):
+            hw_dict = HWDict([f"{controller_config_path}/hw_definitions/"])
+            controller_config = EvokConfig(controller_config_path)
 
-        create_devices(controller_config, hw_dict)
-        Devices.register_device(RUN, Devices.aliases)
+            create_devices(controller_config, hw_dict)
+            Devices.register_device(RUN, Devices.aliases)
 
-        async with anyio.create_task_group() as tg:
-            for owbus in Devices.by_int(OWBUS):
-                tg.start_soon(owbus.bus_driver.switch_to_async)
+            async with anyio.create_task_group() as tg:
+                for owbus in Devices.by_int(OWBUS):
+                    tg.start_soon(owbus.bus_driver.switch_to_async)
 
-            for bustype in [TCPBUS, SERIALBUS]:
-                for device in Devices.by_int(bustype):
-                    tg.start_soon(device.switch_to_async)
+                for bustype in [TCPBUS, SERIALBUS]:
+                    for device in Devices.by_int(bustype):
+                        tg.start_soon(device.switch_to_async)
 
-            for modbus_slave in Devices.by_int(MODBUS_SLAVE):
-                tg.start_soon(modbus_slave.switch_to_async)
+                for modbus_slave in Devices.by_int(MODBUS_SLAVE):
+                    tg.start_soon(modbus_slave.switch_to_async)
 
-                if modbus_slave.scan_enabled:
-                    tg.start_soon(modbus_slave.start_scanning)
+                    if modbus_slave.scan_enabled:
+                        tg.start_soon(modbus_slave.start_scanning)
 
-            yield
+                yield
 
-            tg.cancel_scope.cancel()
-    else:
-        yield
+                tg.cancel_scope.cancel()
+        else:
+            yield
 
     stream_service.stop()
+    mjpeg_stream_service.stop()
+    detections_stream_service.stop()
+    raw_stream_service.stop()
+    capture_job_service.stop()
 
 
 app = FastAPI(
@@ -106,6 +125,8 @@ if os.getenv("GITHUB_ACTIONS") is not None:
 
 app.include_router(cameras.router)
 app.include_router(streams.router)
+app.include_router(capture_jobs.router)
+app.include_router(nn_models.router)
 controller.register_device_endpoints(controller.DEVICE_ENDPOINTS)
 app.include_router(controller.router)
 
@@ -117,7 +138,15 @@ def hello_robopipe():
 
 @app.exception_handler(Exception)
 def global_exception_handler(request: Request, exc: Exception):
-    if isinstance(exc, (CameraNotFoundException, SensorNotFoundException)):
+    if isinstance(
+        exc,
+        (
+            CameraNotFoundException,
+            SensorNotFoundException,
+            CaptureJobNotFoundException,
+            ModelNotFoundException,
+        ),
+    ):
         return JSONResponse(status_code=404, content=None)
 
 
@@ -1,8 +1,12 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Body, HTTPException, status
+
+from typing import Annotated
 
 from ..camera.camera_stats import CameraStats
 from ..camera.device_info import DeviceInfo
 from ..camera.ir import IRConfig
+from ..models.still import StillTarget, SynchronizedStills
+from ..sync_capture import capture_synchronized_stills
 from .common import CameraManagerDep, Mxid, CameraDep
 
 router = APIRouter(prefix="/cameras", tags=["cameras"])
@@ -13,6 +17,21 @@ def list_cameras(camera_manager: CameraManagerDep) -> list[DeviceInfo]:
     return list(map(lambda x: x.info, camera_manager.cameras.values()))
 
 
+@router.post("/stills")
+def capture_synchronized_still_images(
+    camera_manager: CameraManagerDep,
+    targets: Annotated[list[StillTarget], Body(min_length=1, max_length=32)],
+    format: str = "jpeg",
+) -> SynchronizedStills:
+    if len({(target.mxid, target.stream_name) for target in targets}) < len(targets):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Every stream can be captured only once",
+        )
+
+    return capture_synchronized_stills(camera_manager, targets, format)
+
+
 camera_router = APIRouter(
     prefix="/{mxid}",
     tags=["cameras"],
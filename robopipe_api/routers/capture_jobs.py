@@ -0,0 +1,38 @@
+from fastapi import APIRouter, status
+
+from ..models.capture_job import CaptureJobConfig, CaptureJobStatus
+from .common import CaptureJobServiceDep
+
+router = APIRouter(
+    prefix="/capture-jobs",
+    tags=["capture jobs"],
+    responses={404: {"description": "Capture job not found"}},
+)
+
+
+@router.get("/")
+def list_capture_jobs(
+    capture_job_service: CaptureJobServiceDep,
+) -> list[CaptureJobStatus]:
+    return [job.status for job in list(capture_job_service.jobs.values())]
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+def start_capture_job(
+    capture_job_service: CaptureJobServiceDep, config: CaptureJobConfig
+) -> CaptureJobStatus:
+    return capture_job_service.start(config)
+
+
+@router.get("/{job_id}")
+def get_capture_job(
+    capture_job_service: CaptureJobServiceDep, job_id: str
+) -> CaptureJobStatus:
+    return capture_job_service[job_id].status
+
+
+@router.delete("/{job_id}")
+def delete_capture_job(
+    capture_job_service: CaptureJobServiceDep, job_id: str
+) -> CaptureJobStatus:
+    return capture_job_service.remove(job_id)
@@ -8,13 +8,22 @@ from typing import Annotated
 from ..camera.camera import Camera
 from ..camera.camera_manager import CameraManager, camera_manager_factory
 from ..camera.sensor.sensor_base import SensorBase
+from ..capture_job import CaptureJobService, capture_job_service_factory
+from ..detections_stream import (
+    DetectionsStreamService,
+    detections_stream_service_factory,
+)
+from ..model_cache import ModelCache, model_cache_factory
 from ..models.nn_config import NNConfig, NNType, NNYoloConfig, NNMobileNetConfig
+from ..mjpeg_stream import MjpegStreamService, mjpeg_stream_service_factory
+from ..raw_stream import RawStreamService, raw_stream_service_factory
+from ..recording import RecordingService, recording_service_factory
 from ..stream import StreamService, stream_service_factory
 from ..controller.devices import DeviceList, Devices, Device
 from ..controller.devices import *
 
 CameraManagerDep = Annotated[CameraManager, Depends(camera_manager_factory)]
-Mxid = Annotated[str, Path(regex=r"[A-Z0-9]+")]
+Mxid = Annotated[str, Path(regex=r"^[A-Z0-9]+$")]
 
 
 def get_camera(camera_manager: CameraManagerDep, mxid: Mxid):
@@ -22,7 +31,10 @@ def get_camera(camera_manager: CameraManagerDep, mxid: Mxid):
 
 
 CameraDep = Annotated[Camera, Depends(get_camera)]
-StreamName = Annotated[str, Path(regex=r"CAM_[A-H]|DEPTH_[A-H]_[A-H]")]
+StreamName = Annotated[
+    str, Path(regex=r"^(CAM_[A-H](_ROI_[A-Z0-9]+)?|DEPTH_[A-H]_[A-H])$")
+]
+RoiName = Annotated[str, Path(regex=r"^[A-Z0-9]+$")]
 
 
 def get_sensor(camera: CameraDep, stream_name: StreamName):
@@ -38,6 +50,47 @@ def get_stream_service(camera_manager: CameraManagerDep):
 
 StreamServiceDep = Annotated[StreamService, Depends(get_stream_service)]
 
+
+def get_mjpeg_stream_service(camera_manager: CameraManagerDep):
+    return mjpeg_stream_service_factory(camera_manager)
+
+
+MjpegStreamServiceDep = Annotated[
+    MjpegStreamService, Depends(get_mjpeg_stream_service)
+]
+
+
+def get_raw_stream_service(camera_manager: CameraManagerDep):
+    return raw_stream_service_factory(camera_manager)
+
+
+RawStreamServiceDep = Annotated[RawStreamService, Depends(get_raw_stream_service)]
+
+
+def get_detections_stream_service(camera_manager: CameraManagerDep):
+    return detections_stream_service_factory(camera_manager)
+
+
+DetectionsStreamServiceDep = Annotated[
+    DetectionsStreamService, Depends(get_detections_stream_service)
+]
+
+
+def get_recording_service(stream_service: StreamServiceDep):
+    return recording_service_factory(stream_service)
+
+
+RecordingServiceDep = Annotated[RecordingService, Depends(get_recording_service)]
+
+ModelCacheDep = Annotated[ModelCache, Depends(model_cache_factory)]
+
+
+def get_capture_job_service(camera_manager: CameraManagerDep):
+    return capture_job_service_factory(camera_manager)
+
+
+CaptureJobServiceDep = Annotated[CaptureJobService, Depends(get_capture_job_service)]
+
 DEVICE_TYPES = [
     DI,
     RO,
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, HTTPException, Path, UploadFile, status
+
+from typing import Annotated
+
+from ..model_cache import ModelCache
+from ..models.model_blob import SHA256_PATTERN, ModelBlob
+from .common import ModelCacheDep
+
+router = APIRouter(
+    prefix="/models",
+    tags=["nn"],
+    responses={404: {"description": "Model not found"}},
+)
+
+Sha256 = Annotated[str, Path(pattern=SHA256_PATTERN)]
+
+
+async def store_model(model_cache: ModelCache, model: UploadFile) -> ModelBlob:
+    try:
+        return await model_cache.store(model)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=str(e)
+        )
+
+
+@router.get("/")
+def list_models(model_cache: ModelCacheDep) -> list[ModelBlob]:
+    return model_cache.list()
+
+
+@router.post("/", status_code=status.HTTP_201_CREATED)
+async def upload_model(model_cache: ModelCacheDep, model: UploadFile) -> ModelBlob:
+    return await store_model(model_cache, model)
+
+
+@router.get("/{sha256}")
+def get_model(model_cache: ModelCacheDep, sha256: Sha256) -> ModelBlob:
+    return model_cache.get(sha256)
+
+
+@router.delete("/{sha256}", status_code=status.HTTP_202_ACCEPTED)
+def delete_model(model_cache: ModelCacheDep, sha256: Sha256):
+    model_cache.remove(sha256)
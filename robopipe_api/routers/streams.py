@@ -1,25 +1,65 @@
-import depthai as dai
-from fastapi import APIRouter, WebSocket, UploadFile, WebSocketDisconnect, status
+from fastapi import (
+    APIRouter,
+    Form,
+    HTTPException,
+    Path,
+    Query,
+    WebSocket,
+    WebSocketException,
+    UploadFile,
+    status,
+)
 import anyio
-from fastapi.responses import Response
+import depthai as dai
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from starlette.background import BackgroundTask
 
+from datetime import datetime
 from io import BytesIO
-
-from ..camera.nn import CameraNNConfig, CameraNNYoloConfig, CameraNNMobileNetConfig
+import os
+import tempfile
+from typing import Annotated
+
+from ..burst import stream_burst_archive
+from ..camera.nn import (
+    BlobFile,
+    CameraNNCascadeConfig,
+    CameraNNConfig,
+    CameraNNYoloConfig,
+    CameraNNMobileNetConfig,
+)
+from ..camera.roi import RoiConfig, get_roi_stream_name, parse_roi_stream_name
 from ..camera.sensor.sensor_config import SensorConfigProperties
 from ..camera.sensor.sensor_control import SensorControl
-from ..models.nn_config import NNType
+from ..camera.video_encoding import VideoEncodingConfig
+from ..detections_stream import DetectionsFormat
+from ..error import SensorNotFoundException
+from ..models.metrics import StreamMetrics
+from ..models.model_blob import SHA256_PATTERN, ModelBlob
+from ..models.nn_config import NNCascadeConfig, NNConfig, NNType
+from ..models.recording import RecordingConfig, RecordingStatus
+from ..mjpeg_stream import MJPEG_BOUNDARY
 from ..models.sensor_control import SensorControlUpdate
-from ..utils.detections_parser import parse_detections
-from ..utils.ws_adapter import WsAdapter
+from ..stream import COMPOSITE_SEPARATOR
+from ..subscriber import DropPolicy
+from ..utils.compression import Compression
+from ..utils.multipart_response import MultipartStreamResponse
+from ..utils.ws_adapter import WsAdapter, WsSideChannel
 from .common import (
     CameraDep,
+    DetectionsStreamServiceDep,
     SensorDep,
+    MjpegStreamServiceDep,
+    ModelCacheDep,
     Mxid,
+    RawStreamServiceDep,
+    RecordingServiceDep,
+    RoiName,
     StreamName,
     StreamServiceDep,
     NNConfigDep,
 )
+from .nn_models import store_model
 
 router = APIRouter(
     prefix="/cameras/{mxid}/streams",
@@ -36,6 +76,46 @@ def list_all_streams(camera: CameraDep):
     }
 
 
+CompositeStreams = Annotated[
+    list[str],
+    Query(
+        description="Sensors tiled into the composite, frames are paired to the first one",
+        min_length=2,
+        max_length=4,
+    ),
+]
+
+
+@router.get("/composite/metrics")
+def get_composite_stream_metrics(
+    mxid: Mxid, streams: CompositeStreams, stream_service: StreamServiceDep
+) -> StreamMetrics:
+    return stream_service.metrics((mxid, COMPOSITE_SEPARATOR.join(streams)))
+
+
+@router.websocket("/composite/video")
+async def get_composite_stream_video(
+    ws: WebSocket,
+    mxid: Mxid,
+    streams: CompositeStreams,
+    stream_service: StreamServiceDep,
+    queue_size: Annotated[int, Query(ge=1, le=300)] = 30,
+    drop_policy: DropPolicy = DropPolicy.SKIP_TO_KEYFRAME,
+    height: Annotated[int | None, Query(ge=16)] = None,
+    adaptive: bool = False,
+):
+    ws_adapter = WsAdapter(ws)
+    await ws_adapter.accept()
+    await stream_service.subscribe(
+        (mxid, COMPOSITE_SEPARATOR.join(streams)),
+        ws_adapter,
+        max_queue_size=queue_size,
+        drop_policy=drop_policy,
+        height=height,
+        adaptive=adaptive,
+    )
+
+
 stream_router = APIRouter(
     prefix="/{stream_name}",
     tags=["streams"],
@@ -84,49 +164,314 @@ def update_stream_control(
     return sensor.control
 
 
+@stream_router.get("/encoding")
+def get_stream_encoding(
+    camera: CameraDep, stream_name: StreamName
+) -> VideoEncodingConfig:
+    return camera.encodings.get(stream_name, VideoEncodingConfig())
+
+
+@stream_router.post("/encoding")
+async def update_stream_encoding(
+    camera: CameraDep,
+    stream_name: StreamName,
+    encoding: VideoEncodingConfig,
+    stream_service: StreamServiceDep,
+) -> VideoEncodingConfig:
+    previous_encoding = camera.encodings.get(stream_name, VideoEncodingConfig())
+    await anyio.to_thread.run_sync(camera.set_encoding, stream_name, encoding)
+
+    # On-device encoders are replaced with the pipeline, host encoders by the service
+    if encoding != previous_encoding and not encoding.encoding.on_device:
+        stream_service.restart(camera.mxid, stream_name)
+
+    return camera.encodings[stream_name]
+
+
+SensorName = Annotated[str, Path(regex=r"^CAM_[A-H]$")]
+
+
+@stream_router.get("/rois")
+def get_stream_rois(camera: CameraDep, stream_name: SensorName) -> dict[str, RoiConfig]:
+    return {
+        roi_stream_name: roi
+        for roi_stream_name, roi in camera.rois.items()
+        if parse_roi_stream_name(roi_stream_name)[0] == stream_name
+    }
+
+
+@stream_router.put("/rois/{roi_name}")
+def set_stream_roi(
+    camera: CameraDep, stream_name: SensorName, roi_name: RoiName, roi: RoiConfig
+) -> RoiConfig:
+    roi_stream_name = camera.set_roi(stream_name, roi_name, roi)
+
+    return camera.rois[roi_stream_name]
+
+
+@stream_router.delete("/rois/{roi_name}", status_code=status.HTTP_202_ACCEPTED)
+def delete_stream_roi(camera: CameraDep, stream_name: SensorName, roi_name: RoiName):
+    camera.remove_roi(get_roi_stream_name(stream_name, roi_name))
+
+
+@stream_router.get("/metrics")
+def get_stream_metrics(
+    camera: CameraDep, stream_name: StreamName, stream_service: StreamServiceDep
+) -> StreamMetrics:
+    return stream_service.metrics((camera.mxid, stream_name))
+
+
 @stream_router.get(
     "/still",
     response_description="Image bytes in the selected format",
     response_model=bytes,
     response_class=Response(media_type="image/*"),
 )
-def capture_still_image(sensor: SensorDep, format: str | None = "jpeg") -> Response:
+def capture_still_image(
+    sensor: SensorDep,
+    format: str | None = "jpeg",
+    max_age: Annotated[
+        float | None,
+        Query(
+            description="Serve the latest video frame if it is at most this many seconds old",
+            gt=0,
+            le=60,
+        ),
+    ] = None,
+) -> Response:
+    if max_age is not None:
+        image = sensor.get_latest_still(max_age, format)
+
+        if image is not None:
+            return Response(image, media_type=f"image/{format}")
+
     img_buffer = BytesIO()
     sensor.capture_still().save(img_buffer, format)
 
     return Response(img_buffer.getvalue(), media_type=f"image/{format}")
 
 
+@stream_router.post(
+    "/still/burst",
+    response_description="Tar archive of the captured images, named by sequence number",
+    response_class=StreamingResponse,
+)
+def capture_still_burst(
+    sensor: SensorDep,
+    stream_name: StreamName,
+    count: Annotated[int, Query(description="Number of stills", ge=1, le=300)] = 30,
+    interval_ms: Annotated[
+        int,
+        Query(description="Minimum time between the captures", ge=0, le=10000),
+    ] = 0,
+    format: str = "jpeg",
+) -> StreamingResponse:
+    return StreamingResponse(
+        stream_burst_archive(sensor.capture_burst(count, interval_ms / 1000), format),
+        media_type="application/x-tar",
+        headers={
+            "Content-Disposition": f'attachment; filename="{stream_name}_burst.tar"'
+        },
+    )
+
+
+@stream_router.post("/mjpeg", status_code=status.HTTP_201_CREATED)
+def enable_stream_mjpeg(camera: CameraDep, stream_name: StreamName):
+    if stream_name not in camera.sensors:
+        raise SensorNotFoundException()
+
+    camera.enable_mjpeg(stream_name)
+
+
+@stream_router.delete("/mjpeg", status_code=status.HTTP_202_ACCEPTED)
+def disable_stream_mjpeg(camera: CameraDep, stream_name: StreamName):
+    camera.disable_mjpeg(stream_name)
+
+
+@stream_router.get(
+    "/mjpeg",
+    response_description="Multipart stream of JPEG frames encoded on the camera",
+    response_class=Response(
+        media_type=f"multipart/x-mixed-replace; boundary={MJPEG_BOUNDARY}"
+    ),
+    responses={409: {"description": "MJPEG is not enabled for the stream"}},
+)
+def get_stream_mjpeg(
+    camera: CameraDep,
+    stream_name: StreamName,
+    mjpeg_stream_service: MjpegStreamServiceDep,
+    queue_size: Annotated[int, Query(ge=1, le=30)] = 2,
+) -> Response:
+    if stream_name not in camera.sensors:
+        raise SensorNotFoundException()
+
+    if not camera.sensors[stream_name].mjpeg_on_device:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="MJPEG is not enabled, enable it with POST first",
+        )
+
+    key = (camera.mxid, stream_name)
+
+    return MultipartStreamResponse(
+        lambda response: mjpeg_stream_service.subscribe(
+            key, response, max_queue_size=queue_size
+        ),
+        lambda response: mjpeg_stream_service.unsubscribe(key, response),
+        MJPEG_BOUNDARY,
+    )
+
+
+@stream_router.get("/recording")
+def get_stream_recording(
+    mxid: Mxid, stream_name: StreamName, recording_service: RecordingServiceDep
+) -> RecordingStatus:
+    return recording_service.status((mxid, stream_name))
+
+
+@stream_router.post("/recording")
+def start_stream_recording(
+    camera: CameraDep,
+    sensor: SensorDep,
+    stream_name: StreamName,
+    recording_service: RecordingServiceDep,
+    config: RecordingConfig,
+) -> RecordingStatus:
+    recording_service.start((camera.mxid, stream_name), config)
+
+    return recording_service.status((camera.mxid, stream_name))
+
+
+@stream_router.delete("/recording", status_code=status.HTTP_202_ACCEPTED)
+def stop_stream_recording(
+    mxid: Mxid, stream_name: StreamName, recording_service: RecordingServiceDep
+):
+    recording_service.stop((mxid, stream_name))
+
+
+@stream_router.get(
+    "/recording/export",
+    response_description="MP4 file with the recorded video between start and end",
+    response_class=Response(media_type="video/mp4"),
+    responses={404: {"description": "No video was recorded in the given range"}},
+)
+async def export_stream_recording(
+    mxid: Mxid,
+    stream_name: StreamName,
+    recording_service: RecordingServiceDep,
+    start: datetime,
+    end: datetime,
+) -> Response:
+    fd, export_path = tempfile.mkstemp(".mp4")
+    os.close(fd)
+    exported = await anyio.to_thread.run_sync(
+        recording_service.export,
+        (mxid, stream_name),
+        start.timestamp(),
+        end.timestamp(),
+        export_path,
+    )
+
+    if not exported:
+        os.remove(export_path)
+
+        return Response(status_code=status.HTTP_404_NOT_FOUND)
+
+    return FileResponse(
+        export_path,
+        media_type="video/mp4",
+        filename=f"{stream_name}_{start.strftime('%Y%m%dT%H%M%S')}.mp4",
+        background=BackgroundTask(os.remove, export_path),
+    )
+
+
 @stream_router.post("/nn", status_code=status.HTTP_201_CREATED, tags=["nn"])
 async def deploy_neural_network(
-    camera: CameraDep, stream_name: StreamName, model: UploadFile, config: NNConfigDep
+    camera: CameraDep,
+    stream_name: StreamName,
+    config: NNConfigDep,
+    model_cache: ModelCacheDep,
+    model: UploadFile | None = None,
+    model_sha256: Annotated[
+        str | None,
+        Form(
+            description="Deploys a blob uploaded before instead of the model file",
+            pattern=SHA256_PATTERN,
+        ),
+    ] = None,
+) -> ModelBlob:
+    sensor = camera.all_sensors[stream_name]
+
+    if model is not None:
+        model_blob = await store_model(model_cache, model)
+    elif model_sha256 is not None:
+        model_blob = model_cache.get(model_sha256)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Either model or model_sha256 is required",
+        )
+
+    # Reading the dims of an older blob and restarting the camera both block
+    blob = await anyio.to_thread.run_sync(model_cache.get_blob_file, model_blob.sha256)
+    await anyio.to_thread.run_sync(
+        camera.deploy_nn, create_nn_config(stream_name, sensor, config, blob)
+    )
+
+    return model_blob
+
+
+@stream_router.post("/nn/cascade", status_code=status.HTTP_201_CREATED, tags=["nn"])
+def deploy_neural_network_cascade(
+    camera: CameraDep,
+    stream_name: StreamName,
+    config: NNCascadeConfig,
+    model_cache: ModelCacheDep,
 ):
     sensor = camera.all_sensors[stream_name]
-    model_bytes = await model.read()
-    blob = dai.OpenVINO.Blob(list(model_bytes))
 
-    if config.type == NNType.Generic:
-        nn_config = CameraNNConfig(
-            stream_name, sensor, blob, config.num_inference_threads
+    # Crops are cut on the device from the video of a color sensor
+    if (
+        parse_roi_stream_name(stream_name) is not None
+        or dai.CameraSensorType.COLOR not in sensor.supportedTypes
+    ):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Cascades can only be deployed on color sensors",
         )
-    elif config.type == NNType.YOLO:
-        nn_config = CameraNNYoloConfig(
-            stream_name,
-            sensor,
-            blob,
-            config.num_inference_threads,
-            **config.nn_config.model_dump(),
+
+    detector_blob = model_cache.get(config.detector_sha256)
+    classifier_blob = model_cache.get(config.classifier_sha256)
+    detector = create_nn_config(
+        stream_name,
+        sensor,
+        config.detector,
+        model_cache.get_blob_file(detector_blob.sha256),
+    )
+    classifier = CameraNNConfig(
+        stream_name, sensor, model_cache.get_blob_file(classifier_blob.sha256)
+    )
+
+    camera.deploy_nn(
+        CameraNNCascadeConfig(detector, classifier, config.padding, config.max_crops)
+    )
+
+
+def create_nn_config(
+    stream_name: str, sensor: dai.CameraFeatures, config: NNConfig, blob: BlobFile
+) -> CameraNNConfig:
+    nn_config = config.nn_config.model_dump() if config.nn_config is not None else {}
+
+    if config.type == NNType.YOLO:
+        return CameraNNYoloConfig(
+            stream_name, sensor, blob, config.num_inference_threads, **nn_config
         )
     elif config.type == NNType.MobileNet:
-        nn_config = CameraNNMobileNetConfig(
-            stream_name,
-            sensor,
-            blob,
-            config.num_inference_threads,
-            **config.nn_config.model_dump(),
+        return CameraNNMobileNetConfig(
+            stream_name, sensor, blob, config.num_inference_threads, **nn_config
         )
 
-    camera.deploy_nn(nn_config)
+    return CameraNNConfig(stream_name, sensor, blob, config.num_inference_threads)
 
 
 @stream_router.delete("/nn", status_code=status.HTTP_202_ACCEPTED, tags=["nn"])
@@ -135,47 +480,89 @@ async def delete_neural_network(camera: CameraDep, stream_name: StreamName):
 
 
 @stream_router.websocket("/nn")
-async def get_sensor_detections(ws: WebSocket, sensor: SensorDep):
-    await ws.accept()
-
-    try:
-        while True:
-            detections = sensor.get_nn_detections()
-
-            if isinstance(detections, dai.NNData):
-                parsed_detections = detections.getFirstLayerFp16()
-            else:
-                parsed_detections = parse_detections(detections)
-
-            await ws.send_json({"detections": parsed_detections})
-            await anyio.sleep(0.001)
-    except WebSocketDisconnect:
-        return
+async def get_sensor_detections(
+    ws: WebSocket,
+    mxid: Mxid,
+    stream_name: StreamName,
+    detections_stream_service: DetectionsStreamServiceDep,
+    queue_size: Annotated[int, Query(ge=1, le=100)] = 10,
+    format: DetectionsFormat = DetectionsFormat.JSON,
+):
+    ws_adapter = WsAdapter(ws)
+    await ws_adapter.accept()
+    await detections_stream_service.subscribe(
+        (mxid, stream_name), ws_adapter, max_queue_size=queue_size, format=format
+    )
 
 
 @stream_router.websocket("/video")
 async def get_stream_video(
-    ws: WebSocket, mxid: Mxid, stream_name: StreamName, stream_service: StreamServiceDep
+    ws: WebSocket,
+    mxid: Mxid,
+    stream_name: StreamName,
+    stream_service: StreamServiceDep,
+    detections_stream_service: DetectionsStreamServiceDep,
+    queue_size: Annotated[int, Query(ge=1, le=300)] = 30,
+    drop_policy: DropPolicy = DropPolicy.SKIP_TO_KEYFRAME,
+    height: Annotated[int | None, Query(ge=16)] = None,
+    adaptive: bool = False,
+    detections: Annotated[
+        bool,
+        Query(description="Interleave the NN detections as text messages"),
+    ] = False,
 ):
-    tg = anyio.create_task_group()
-
-    async def sleep():
-        async with tg:
-            tg.start_soon(anyio.sleep_forever)
+    ws_adapter = WsAdapter(ws)
+    await ws_adapter.accept()
 
-    def on_close():
-        tg.cancel_scope.cancel()
-        stream_service.unsubscribe((mxid, stream_name), ws_adapter)
+    async with anyio.create_task_group() as tg:
+        if detections:
+            side_channel = WsSideChannel(ws_adapter)
+            tg.start_soon(
+                detections_stream_service.subscribe, (mxid, stream_name), side_channel
+            )
+
+        try:
+            await stream_service.subscribe(
+                (mxid, stream_name),
+                ws_adapter,
+                max_queue_size=queue_size,
+                drop_policy=drop_policy,
+                height=height,
+                adaptive=adaptive,
+            )
+        finally:
+            # Ends the side channel with the video
+            if detections:
+                detections_stream_service.unsubscribe((mxid, stream_name), side_channel)
+
+
+@stream_router.websocket("/raw")
+async def get_stream_raw(
+    ws: WebSocket,
+    mxid: Mxid,
+    stream_name: StreamName,
+    raw_stream_service: RawStreamServiceDep,
+    queue_size: Annotated[int, Query(ge=1, le=30)] = 2,
+    compression: Compression = Compression.NONE,
+    decimation: Annotated[
+        int, Query(description="Send every n-th frame of the sensor", ge=1, le=60)
+    ] = 1,
+):
+    if not compression.available:
+        raise WebSocketException(
+            status.WS_1003_UNSUPPORTED_DATA,
+            f"{compression.value} compression is not installed",
+        )
 
     ws_adapter = WsAdapter(ws)
     await ws_adapter.accept()
-    await stream_service.subscribe((mxid, stream_name), ws_adapter, on_close)
-    await sleep()
-
-    try:
-        await ws_adapter.close()
-    except:
-        pass
+    await raw_stream_service.subscribe(
+        (mxid, stream_name),
+        ws_adapter,
+        max_queue_size=queue_size,
+        compression=compression,
+        decimation=decimation,
+    )
 
 
 router.include_router(stream_router)
@@ -2,102 +2,451 @@ from functools import lru_cache
 import anyio
 import anyio.from_thread
 import anyio.to_thread
+import os
+import time
 from typing import Callable
 
+from .camera.camera import Camera
 from .camera.camera_manager import CameraManager
+from .camera.sensor.composite_sensor import CompositeSensor
+from .camera.sensor.sensor_base import SensorBase, VideoReader
+from .camera.video_encoding import VideoEncodingConfig
 from .error import SensorNotFoundException
-from .video_encoder import VideoEncoder
-from .websocket import WebSocket
-
+from .log import logger
+from .metrics import WINDOW, RollingCounter, RollingHistogram
+from .models.metrics import RenditionMetrics, StreamMetrics, SubscriberMetrics
+from .rate_control import AdaptiveBitrateController
+from .subscriber import DropPolicy, SubscriberQueue
+from .video_encoder import VideoEncoder, VideoFragment, create_video_encoder
+from .websocket import MessageSink
 
 StreamKey = tuple[str, str]
-StreamSubscriber = dict[StreamKey, list[tuple[WebSocket, Callable[[], None]]]]
+# Height of the rendition and whether it adapts to its subscribers' links
+RenditionKey = tuple[int | None, bool]
+# Joins the sensor names of a composite stream, e.g. CAM_A+DEPTH_B_C
+COMPOSITE_SEPARATOR = "+"
+
+
+class StreamSubscriber:
+    def __init__(
+        self,
+        handler: MessageSink,
+        max_queue_size: int = 30,
+        drop_policy: DropPolicy = DropPolicy.SKIP_TO_KEYFRAME,
+        pass_fragments: bool = False,
+    ):
+        self.handler = handler
+        self.pass_fragments = pass_fragments
+        self.queue = SubscriberQueue(
+            max_queue_size, drop_policy, lambda fragment: fragment.release()
+        )
+        self.sent = 0
+        self.send_latency = 0.0
+        self.send_time = RollingHistogram()
+        self.capture_latency = RollingHistogram()
+
+    @property
+    def dropped(self):
+        return self.queue.dropped
+
+    async def send_fragments(self):
+        async for fragment in self.queue:
+            start = time.monotonic()
+
+            try:
+                await self.handler.send(
+                    fragment if self.pass_fragments else fragment.data
+                )
+            finally:
+                fragment.release()
+
+            sent = time.monotonic()
+            send_time = sent - start
+            self.send_time.record(send_time)
+
+            if fragment.capture_time is not None:
+                self.capture_latency.record(sent - fragment.capture_time)
+
+            # Exponential moving average, smooths out single slow sends
+            self.send_latency += (send_time - self.send_latency) / 8
+            self.sent += 1
+
+    @property
+    def metrics(self) -> SubscriberMetrics:
+        return SubscriberMetrics(
+            sent=self.sent,
+            dropped=self.dropped,
+            queued=len(self.queue),
+            send_latency=self.send_time.snapshot(),
+            capture_latency=self.capture_latency.snapshot(),
+        )
+
+
+class StreamRendition:
+    def __init__(self, encoder: VideoEncoder, adaptive: bool = False):
+        self.encoder = encoder
+        self.adaptive = adaptive
+        self.subscribers: list[StreamSubscriber] = []
+        self.gop_cache: list[VideoFragment] = []
+        self.rate_controller = (
+            AdaptiveBitrateController(encoder)
+            if adaptive and encoder.supports_rate_control
+            else None
+        )
+
+    def add_subscriber(self, subscriber: StreamSubscriber):
+        self.subscribers.append(subscriber)
+
+        # Late joiners start decoding from the most recent keyframe right away
+        for fragment in self.gop_cache:
+            fragment.acquire()
+
+        subscriber.queue.replay(list(self.gop_cache))
+
+    def broadcast(self, fragment: VideoFragment | None):
+        if fragment is None:
+            for subscriber in self.subscribers:
+                subscriber.queue.close()
+
+            return
+
+        if fragment.keyframe:
+            self.clear_gop_cache()
+
+        if fragment.keyframe or self.gop_cache:
+            fragment.acquire()
+            self.gop_cache.append(fragment)
+
+        for subscriber in self.subscribers:
+            fragment.acquire()
+            subscriber.queue.put(fragment, fragment.keyframe)
+
+        if self.rate_controller is not None:
+            self.rate_controller.update(self.subscribers)
+
+    def clear_gop_cache(self):
+        for fragment in self.gop_cache:
+            fragment.release()
+
+        self.gop_cache.clear()
+
+    @property
+    def metrics(self) -> RenditionMetrics:
+        encoder_metrics = self.encoder.metrics
+
+        return RenditionMetrics(
+            width=self.encoder.width,
+            height=self.encoder.height,
+            adaptive=self.adaptive,
+            bit_rate=getattr(self.encoder, "bit_rate", None),
+            frame_interval=self.encoder.frame_interval,
+            fragment_size=encoder_metrics.fragment_size.snapshot(),
+            conversion_time=encoder_metrics.conversion_time.snapshot(),
+            encode_time=encoder_metrics.encode_time.snapshot(),
+            mux_time=encoder_metrics.mux_time.snapshot(),
+            skipped_frames=encoder_metrics.skipped_frames.snapshot(),
+            subscribers=[subscriber.metrics for subscriber in list(self.subscribers)],
+        )
+
+
+class SensorStream:
+    def __init__(self):
+        self.renditions: dict[RenditionKey, StreamRendition] = {}
+        self.capturing = False
+        # Subscribers waiting for their rendition to be created
+        self.joining = 0
+        self.acquire_time = RollingHistogram()
+        self.dropped_frames = RollingCounter()
+        # All renditions encode the frames of one reader
+        self.sensor: SensorBase | VideoReader | CompositeSensor | None = None
+
+    @property
+    def source_height(self) -> int | None:
+        for rendition in self.renditions.values():
+            return rendition.encoder.source_height
+
+    def close(self):
+        if isinstance(self.sensor, (VideoReader, CompositeSensor)):
+            self.sensor.close()
 
 
 class StreamService:
-    def __init__(self, camera_manager: CameraManager):
+    def __init__(self, camera_manager: CameraManager, process_encoding: bool = False):
         self.camera_manager = camera_manager
-        self.subscribers: StreamSubscriber = {}
-        self.encoders: dict[StreamKey, VideoEncoder] = {}
+        self.process_encoding = process_encoding
+        self.streams: dict[StreamKey, SensorStream] = {}
 
     def __del__(self):
         self.stop()
 
     def stop(self):
-        self.subscribers.clear()
+        for stream in self.streams.values():
+            for rendition in stream.renditions.values():
+                rendition.broadcast(None)
+
+        self.streams.clear()
+
+    def metrics(self, key: StreamKey) -> StreamMetrics:
+        stream = self.streams.get(key) or SensorStream()
+
+        return StreamMetrics(
+            window=WINDOW,
+            active=key in self.streams,
+            acquire_time=stream.acquire_time.snapshot(),
+            dropped_frames=stream.dropped_frames.snapshot(),
+            renditions=[
+                rendition.metrics for rendition in list(stream.renditions.values())
+            ],
+        )
 
     async def subscribe(
         self,
         key: StreamKey,
-        handler: WebSocket,
+        handler: MessageSink,
         on_close: Callable[[], None] | None = None,
+        max_queue_size: int = 30,
+        drop_policy: DropPolicy = DropPolicy.SKIP_TO_KEYFRAME,
+        height: int | None = None,
+        adaptive: bool = False,
+        pass_fragments: bool = False,
     ):
         mxid, sensor_name = key
         camera = self.camera_manager[mxid]
 
-        if sensor_name not in camera.sensors.keys():
+        sensor_names = sensor_name.split(COMPOSITE_SEPARATOR)
+
+        if any(name not in camera.sensors.keys() for name in sensor_names):
             raise SensorNotFoundException()
 
-        if key not in self.subscribers:
-            self.subscribers[key] = []
-            self.encoders[key] = VideoEncoder(camera.sensors[key[1]])
+        if key not in self.streams:
+            self.streams[key] = SensorStream()
 
-        self.subscribers[key].append((handler, on_close))
-        await handler.send(self.encoders[key].init_fragment)
+        stream = self.streams[key]
+        # The last subscriber leaving while the encoder is created must not remove
+        # the stream from under the joiner
+        stream.joining += 1
 
-        if len(self.subscribers[key]) == 1:
-            await anyio.to_thread.run_sync(self.stream, key)
+        try:
+            rendition = await self.__get_rendition(
+                stream,
+                self.__get_sensor(camera, stream, sensor_names),
+                camera.encodings.get(sensor_name),
+                height,
+                adaptive,
+            )
+        except:
+            stream.joining -= 1
 
-    def unsubscribe(self, key: StreamKey, handler: WebSocket):
-        if key in self.subscribers:
-            subscriber_index = None
+            if (
+                not stream.renditions
+                and not stream.joining
+                and self.streams.get(key) is stream
+            ):
+                del self.streams[key]
 
-            for i in range(len(self.subscribers[key])):
-                if self.subscribers[key][i][0] == handler:
-                    subscriber_index = i
-                    break
+            if self.streams.get(key) is not stream and not stream.capturing:
+                stream.close()
 
-            if subscriber_index is not None:
-                self.subscribers[key].pop(subscriber_index)
+            raise
 
-            if not self.subscribers[key]:
-                del self.subscribers[key]
-                del self.encoders[key]
+        stream.joining -= 1
 
-    def stream(self, key: StreamKey):
-        subscribers = self.subscribers.get(key)
-        video_encoder = self.encoders[key]
+        # Fragment aware handlers, e.g. recorders, get the keyframe flags as well
+        subscriber = StreamSubscriber(
+            handler, max_queue_size, drop_policy, pass_fragments
+        )
+        rendition.add_subscriber(subscriber)
 
-        async def broadcast(frame):
-            async def try_send(
-                subscriber: WebSocket, frame, on_close: Callable[[], None] | None = None
-            ):
-                try:
-                    await subscriber.send(frame)
-                except:
-                    if on_close is not None:
-                        on_close()
+        async with anyio.create_task_group() as tg:
+            if not stream.capturing:
+                stream.capturing = True
+                tg.start_soon(anyio.to_thread.run_sync, self.stream, key, stream)
+
+            try:
+                await handler.send(rendition.encoder.init_fragment)
+                await subscriber.send_fragments()
+            except Exception:
+                pass
 
-            async with anyio.create_task_group() as tg:
-                for subscriber, on_close in subscribers:
-                    tg.start_soon(try_send, subscriber, frame, on_close)
+            self.unsubscribe(key, handler)
 
-        while subscribers:
             try:
-                frame = next(video_encoder)
-            except StopIteration:
-                for subscriber, on_close in subscribers:
-                    if on_close is not None:
-                        on_close()
+                await handler.close()
+            except Exception:
+                pass
 
-                    self.unsubscribe(key, subscriber)
+            if on_close is not None:
+                on_close()
+
+    def __get_sensor(
+        self, camera: Camera, stream: SensorStream, sensor_names: list[str]
+    ) -> SensorBase | VideoReader | CompositeSensor:
+        if stream.sensor is not None:
+            return stream.sensor
+
+        sensors = [camera.sensors[name] for name in sensor_names]
+
+        if len(sensors) > 1:
+            # Frames of all sensors are paired and tiled once for every rendition
+            stream.sensor = CompositeSensor(
+                [sensor.open_video_reader() for sensor in sensors]
+            )
+        elif sensors[0].encoded_on_device:
+            stream.sensor = sensors[0]
+        else:
+            stream.sensor = sensors[0].open_video_reader()
+
+        return stream.sensor
+
+    async def __get_rendition(
+        self,
+        stream: SensorStream,
+        sensor: SensorBase | VideoReader | CompositeSensor,
+        encoding: VideoEncodingConfig | None,
+        height: int | None,
+        adaptive: bool,
+    ) -> StreamRendition:
+        source_height = stream.source_height
+
+        if sensor.encoded_on_device or (
+            height is not None and source_height is not None and height >= source_height
+        ):
+            height = None
+
+        # The device bitstream can't be adapted, all subscribers share it
+        if sensor.encoded_on_device:
+            adaptive = False
+
+        if (height, adaptive) not in stream.renditions:
+            encoder = await anyio.to_thread.run_sync(
+                create_video_encoder, sensor, encoding, height, self.process_encoding
+            )
+
+            if encoder.height == encoder.source_height:
+                height = None
+
+            # Another subscriber might have created the rendition in the meantime
+            if (height, adaptive) not in stream.renditions:
+                stream.renditions[(height, adaptive)] = StreamRendition(
+                    encoder, adaptive
+                )
+
+        return stream.renditions[(height, adaptive)]
+
+    def restart(self, mxid: str, sensor_name: str):
+        # Host encoders take the encoding when they are created, the subscribers of
+        # the sensor reconnect to new ones
+        for key, stream in list(self.streams.items()):
+            if key[0] != mxid or sensor_name not in key[1].split(COMPOSITE_SEPARATOR):
+                continue
+
+            del self.streams[key]
+
+            for rendition in stream.renditions.values():
+                rendition.broadcast(None)
+                rendition.clear_gop_cache()
+
+    def unsubscribe(self, key: StreamKey, handler: MessageSink):
+        stream = self.streams.get(key)
+
+        if stream is None:
+            return
+
+        for rendition_key, rendition in list(stream.renditions.items()):
+            for subscriber in rendition.subscribers:
+                if subscriber.handler != handler:
+                    continue
+
+                rendition.subscribers.remove(subscriber)
+                subscriber.queue.close()
+                subscriber.queue.clear()
+                logger.debug(
+                    f"Subscriber of {key} left after {subscriber.sent} sent and "
+                    f"{subscriber.dropped} dropped fragments"
+                )
                 break
 
-            anyio.from_thread.run(broadcast, frame)
+            if not rendition.subscribers:
+                rendition.clear_gop_cache()
+                del stream.renditions[rendition_key]
+
+        if not stream.renditions and not stream.joining:
+            del self.streams[key]
+
+    def broadcast(self, fragments: list[tuple[StreamRendition, VideoFragment | None]]):
+        for rendition, fragment in fragments:
+            rendition.broadcast(fragment)
+
+            if fragment is not None:
+                fragment.release()
+
+    def end_capture(
+        self, key: StreamKey, stream: SensorStream, failed: bool = False
+    ) -> bool:
+        # Runs on the event loop, so a joining subscriber either keeps the capture
+        # going or finds it stopped and starts a new one
+        if not failed and self.streams.get(key) is stream and stream.renditions:
+            return False
+
+        stream.capturing = False
+
+        if failed and self.streams.get(key) is stream:
+            del self.streams[key]
+
+        # Subscribers of a replaced or failed stream are not closed by anyone else
+        if self.streams.get(key) is not stream:
+            for rendition in stream.renditions.values():
+                rendition.broadcast(None)
+                rendition.clear_gop_cache()
+
+            stream.close()
+
+        return True
+
+    def stream(self, key: StreamKey, stream: SensorStream):
+        while True:
+            if not (self.streams.get(key) is stream and stream.renditions):
+                if anyio.from_thread.run_sync(self.end_capture, key, stream):
+                    break
+
+                continue
+
+            renditions = list(stream.renditions.values())
+
+            fragments = []
+
+            # All renditions share the sensor, so any of them can capture the frame
+            try:
+                # Frames encoded on device are read from the sensor, which counts no drops
+                sensor = renditions[0].encoder.sensor
+                dropped_frames = getattr(sensor, "dropped_video_frames", 0)
+                start = time.perf_counter()
+                frame = renditions[0].encoder.read_frame()
+                stream.acquire_time.record(time.perf_counter() - start)
+                stream.dropped_frames.increment(
+                    getattr(sensor, "dropped_video_frames", 0) - dropped_frames
+                )
+
+                for rendition in renditions:
+                    fragment = rendition.encoder.encode_frame(frame)
+
+                    if fragment is not None:
+                        fragments.append((rendition, fragment))
+            except Exception as e:
+                logger.error(f"Stream of {key} failed: {e!r}")
+
+                for _, fragment in fragments:
+                    fragment.release()
+
+                anyio.from_thread.run_sync(self.end_capture, key, stream, True)
+                break
 
-            subscribers = self.subscribers.get(key)
+            # Only enqueues the fragments, subscribers send them at their own pace
+            anyio.from_thread.run_sync(self.broadcast, fragments)
 
 
 @lru_cache(maxsize=1)
 def stream_service_factory(camera_manager: CameraManager):
-    return StreamService(camera_manager)
+    return StreamService(
+        camera_manager, os.getenv("PROCESS_ENCODING", "").lower() in ("1", "true")
+    )
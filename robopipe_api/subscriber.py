@@ -0,0 +1,117 @@
+import anyio
+
+from collections import deque
+from enum import Enum
+from typing import Any, Callable
+
+
+class DropPolicy(Enum):
+    DROP_OLDEST = "drop_oldest"
+    SKIP_TO_KEYFRAME = "skip_to_keyframe"
+    DISCONNECT = "disconnect"
+
+
+class SubscriberQueue:
+    def __init__(
+        self,
+        max_size: int = 30,
+        drop_policy: DropPolicy = DropPolicy.SKIP_TO_KEYFRAME,
+        on_discard: Callable[[Any], None] | None = None,
+    ):
+        self.items: deque[Any] = deque()
+        self.max_size = max_size
+        self.drop_policy = drop_policy
+        self.on_discard = on_discard
+        self.dropped = 0
+        # Replayed items are queued on top of the limit until they are sent
+        self.allowance = 0
+        self.closed = False
+        self.waiting_for_keyframe = False
+        self.item_available = anyio.Event()
+
+    def __len__(self):
+        return len(self.items)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return await self.get()
+        except anyio.EndOfStream:
+            raise StopAsyncIteration()
+
+    def put(self, item: Any, keyframe: bool = True):
+        if self.closed:
+            self.discard(item)
+            return
+
+        if self.waiting_for_keyframe:
+            if not keyframe:
+                self.dropped += 1
+                self.discard(item)
+                return
+
+            self.waiting_for_keyframe = False
+
+        if len(self.items) >= self.max_size + self.allowance:
+            if self.drop_policy == DropPolicy.DISCONNECT:
+                self.dropped += len(self.items) + 1
+                self.clear()
+                self.discard(item)
+                self.close()
+                return
+            elif self.drop_policy == DropPolicy.DROP_OLDEST:
+                self.dropped += 1
+                self.discard(self.items.popleft())
+            else:
+                self.dropped += len(self.items)
+                self.clear()
+
+                if not keyframe:
+                    self.dropped += 1
+                    self.discard(item)
+                    self.waiting_for_keyframe = True
+                    return
+
+        self.items.append(item)
+        self.item_available.set()
+
+    def replay(self, items: list[Any]):
+        if self.closed:
+            for item in items:
+                self.discard(item)
+
+            return
+
+        # The drop policy only applies to the live items that follow
+        self.items.extend(items)
+        self.allowance += len(items)
+        self.item_available.set()
+
+    async def get(self) -> Any:
+        while not self.items:
+            if self.closed:
+                raise anyio.EndOfStream()
+
+            await self.item_available.wait()
+            self.item_available = anyio.Event()
+
+        if self.allowance:
+            self.allowance -= 1
+
+        return self.items.popleft()
+
+    def discard(self, item: Any):
+        if self.on_discard is not None:
+            self.on_discard(item)
+
+    def clear(self):
+        self.allowance = 0
+
+        while self.items:
+            self.discard(self.items.popleft())
+
+    def close(self):
+        self.closed = True
+        self.item_available.set()
@@ -0,0 +1,63 @@
+import depthai as dai
+
+import base64
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+from .camera.camera_manager import CameraManager
+from .camera.sensor.sensor_base import SensorBase
+from .error import SensorNotFoundException
+from .models.still import StillTarget, SynchronizedStill, SynchronizedStills
+from .utils.image import encode_img_frame
+
+# Longest a capture waits for the others to be ready to trigger
+TRIGGER_TIMEOUT = 10
+
+
+def capture_synchronized_stills(
+    camera_manager: CameraManager, targets: list[StillTarget], format: str = "jpeg"
+) -> SynchronizedStills:
+    sensors: list[SensorBase] = []
+
+    for target in targets:
+        camera = camera_manager[target.mxid]
+
+        if target.stream_name not in camera.sensors.keys():
+            raise SensorNotFoundException()
+
+        sensors.append(camera.sensors[target.stream_name])
+
+    # Every capture prepares its trigger and then waits for the others, so the
+    # commands leave for all devices at the same moment
+    trigger = threading.Barrier(len(sensors), timeout=TRIGGER_TIMEOUT)
+
+    def capture(target: StillTarget, sensor: SensorBase) -> SynchronizedStill:
+        try:
+            img_frame = sensor.capture_still_img_frame(trigger.wait)
+        except:
+            trigger.abort()
+            raise
+
+        return create_synchronized_still(target, img_frame, format)
+
+    with ThreadPoolExecutor(len(sensors)) as executor:
+        stills = list(executor.map(capture, targets, sensors))
+
+    timestamps = [still.timestamp for still in stills]
+
+    return SynchronizedStills(stills=stills, skew=max(timestamps) - min(timestamps))
+
+
+def create_synchronized_still(
+    target: StillTarget, img_frame: dai.ImgFrame, format: str
+) -> SynchronizedStill:
+    return SynchronizedStill(
+        mxid=target.mxid,
+        stream_name=target.stream_name,
+        image=base64.b64encode(encode_img_frame(img_frame, format)).decode(),
+        width=img_frame.getWidth(),
+        height=img_frame.getHeight(),
+        sequence_num=img_frame.getSequenceNum(),
+        timestamp=img_frame.getTimestamp().total_seconds(),
+        device_timestamp=img_frame.getTimestampDevice().total_seconds(),
+    )
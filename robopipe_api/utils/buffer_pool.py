@@ -0,0 +1,77 @@
+import threading
+
+
+class BufferPool:
+    def __init__(self, max_buffers: int = 64):
+        self.max_buffers = max_buffers
+        self.buffers: list[bytearray] = []
+        self.lock = threading.Lock()
+
+    def acquire(self, size: int) -> bytearray:
+        with self.lock:
+            for i, buffer in enumerate(self.buffers):
+                if len(buffer) >= size:
+                    return self.buffers.pop(i)
+
+        return bytearray(size)
+
+    def release(self, buffer: bytearray):
+        with self.lock:
+            if len(self.buffers) < self.max_buffers:
+                self.buffers.append(buffer)
+
+
+class PooledBuffer:
+    def __init__(self, pool: BufferPool, buffer: bytearray, size: int):
+        self.pool = pool
+        self.buffer = buffer
+        self.view = memoryview(buffer)[:size]
+        self.references = 1
+
+    def acquire(self):
+        self.references += 1
+
+    def release(self):
+        self.references -= 1
+
+        if self.references > 0:
+            return
+
+        try:
+            self.view.release()
+        except BufferError:
+            # Somebody still holds a view of the data, the buffer cannot be reused
+            return
+
+        self.pool.release(self.buffer)
+
+
+class BufferPoolSink:
+    def __init__(self, pool: BufferPool, initial_size: int = 256 * 1024):
+        self.pool = pool
+        self.buffer = pool.acquire(initial_size)
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        end = self.size + len(data)
+
+        if end > len(self.buffer):
+            buffer = self.pool.acquire(max(end, 2 * len(self.buffer)))
+            buffer[: self.size] = self.buffer[: self.size]
+            self.pool.release(self.buffer)
+            self.buffer = buffer
+
+        self.buffer[self.size : end] = data
+        self.size = end
+
+        return len(data)
+
+    def take(self) -> PooledBuffer | None:
+        if not self.size:
+            return None
+
+        pooled_buffer = PooledBuffer(self.pool, self.buffer, self.size)
+        self.buffer = self.pool.acquire(len(self.buffer))
+        self.size = 0
+
+        return pooled_buffer
@@ -0,0 +1,45 @@
+from enum import Enum
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    import lz4.frame
+except ImportError:
+    lz4 = None
+
+
+class Compression(Enum):
+    NONE = "none"
+    ZSTD = "zstd"
+    LZ4 = "lz4"
+
+    @property
+    def available(self) -> bool:
+        if self == Compression.ZSTD:
+            return zstandard is not None
+        elif self == Compression.LZ4:
+            return lz4 is not None
+
+        return True
+
+
+class Compressor:
+    # Pixels change every frame, low levels keep up with the frame rate
+    ZSTD_LEVEL = 1
+
+    def __init__(self, compression: Compression):
+        self.compression = compression
+
+        if compression == Compression.ZSTD:
+            self.compressor = zstandard.ZstdCompressor(level=self.ZSTD_LEVEL)
+
+    def compress(self, data: bytes | memoryview) -> bytes | memoryview:
+        if self.compression == Compression.ZSTD:
+            return self.compressor.compress(data)
+        elif self.compression == Compression.LZ4:
+            return lz4.frame.compress(data)
+
+        return data
@@ -1,4 +1,9 @@
 import depthai as dai
+import numpy as np
+import struct
+
+# Number of records and of float32 values in a record, sent by the script of a cascade
+CASCADE_HEADER = struct.Struct("<II")
 
 
 def parse_detections(detections: dai.ImgDetections | dai.SpatialImgDetections):
@@ -19,3 +24,57 @@ def parse_detections(detections: dai.ImgDetections | dai.SpatialImgDetections):
         return res
 
     return list(map(parse_detection, detections.detections))
+
+
+def detections_to_array(
+    detections: dai.ImgDetections | dai.SpatialImgDetections,
+) -> np.ndarray:
+    # One record of label, confidence and bbox per detection, plus x, y, z if spatial.
+    # depthai has no bulk accessor, the columns are filled from the attributes
+    items = detections.detections
+    spatial = isinstance(detections, dai.SpatialImgDetections)
+    records = np.empty((len(items), 9 if spatial else 6), dtype="<f4")
+    records[:, 0] = [detection.label for detection in items]
+    records[:, 1] = [detection.confidence for detection in items]
+    records[:, 2] = [detection.xmin for detection in items]
+    records[:, 3] = [detection.ymin for detection in items]
+    records[:, 4] = [detection.xmax for detection in items]
+    records[:, 5] = [detection.ymax for detection in items]
+
+    if spatial:
+        coordinates = [detection.spatialCoordinates for detection in items]
+        records[:, 6] = [point.x for point in coordinates]
+        records[:, 7] = [point.y for point in coordinates]
+        records[:, 8] = [point.z for point in coordinates]
+
+    return records
+
+
+def is_cascade(
+    detections: dai.Buffer | dai.NNData | dai.ImgDetections | dai.SpatialImgDetections,
+) -> bool:
+    # The script of a cascade sends its records in a plain buffer
+    return type(detections) is dai.Buffer
+
+
+def cascade_to_array(buffer: dai.Buffer) -> np.ndarray:
+    # Label, confidence and bbox of each cropped detection, followed by the output of
+    # the classifier for its crop
+    data = buffer.getData()
+    count, values = CASCADE_HEADER.unpack_from(data)
+
+    return np.frombuffer(data, "<f4", count * values, CASCADE_HEADER.size).reshape(
+        count, values
+    )
+
+
+def parse_cascade(buffer: dai.Buffer):
+    return [
+        {
+            "label": int(record[0]),
+            "confidence": float(record[1]),
+            "coords": record[2:6].tolist(),
+            "classification": record[6:].tolist(),
+        }
+        for record in cascade_to_array(buffer)
+    ]
@@ -3,6 +3,12 @@ import depthai as dai
 from PIL import Image
 import numpy as np
 
+import fractions
+from io import BytesIO
+
+# Capture timestamps are kept with microsecond precision
+VIDEO_FRAME_TIME_BASE = fractions.Fraction(1, 1_000_000)
+
 
 class UnsupportedImageFormat(Exception):
     pass
@@ -11,7 +17,7 @@ class UnsupportedImageFormat(Exception):
 def img_frame_to_pil_image(img_frame: dai.ImgFrame) -> Image.Image:
     img_type = img_frame.getType()
 
-    if img_type == dai.RawImgFrame.Type.RAW8:
+    if img_type in (dai.RawImgFrame.Type.RAW8, dai.RawImgFrame.Type.GRAY8):
         return Image.fromarray(img_frame.getFrame(), "L")
     elif img_type == dai.RawImgFrame.Type.RAW16:
         return Image.fromarray((img_frame.getFrame() / 256).astype(np.uint8), "L")
@@ -25,9 +31,17 @@ def img_frame_to_pil_image(img_frame: dai.ImgFrame) -> Image.Image:
         raise UnsupportedImageFormat(f"Given format: {img_type}")
 
 
-def img_frame_to_video_frame(img_frame: dai.ImgFrame) -> av.VideoFrame:
+def encode_img_frame(img_frame: dai.ImgFrame, format: str = "jpeg") -> bytes:
+    img_buffer = BytesIO()
+    img_frame_to_pil_image(img_frame).save(img_buffer, format)
+
+    return img_buffer.getvalue()
+
+
+def img_frame_to_ndarray(img_frame: dai.ImgFrame) -> tuple[np.ndarray, str]:
     FORMAT_MAP = {
         dai.RawImgFrame.Type.RAW8: "gray",
+        dai.RawImgFrame.Type.GRAY8: "gray",
         dai.RawImgFrame.Type.RAW16: "gray",
         dai.RawImgFrame.Type.NV12: "nv12",
         dai.RawImgFrame.Type.BGR888i: "bgr24",
@@ -40,10 +54,18 @@ def img_frame_to_video_frame(img_frame: dai.ImgFrame) -> av.VideoFrame:
         raise UnsupportedImageFormat(f"Given format: {img_type}")
 
     if img_type == dai.RawImgFrame.Type.RAW16:
-        img_frame = (img_frame.getFrame() / 256).astype(np.uint8)
-        return av.VideoFrame.from_ndarray(img_frame, FORMAT_MAP[img_type])
+        return (img_frame.getFrame() / 256).astype(np.uint8), FORMAT_MAP[img_type]
     elif img_type in (dai.RawImgFrame.Type.BGR888p, dai.RawImgFrame.Type.BGR888i):
-        img_frame = img_frame.getFrame().transpose((1, 2, 0))
-        return av.VideoFrame.from_ndarray(img_frame, FORMAT_MAP[img_type])
+        return img_frame.getFrame().transpose((1, 2, 0)), FORMAT_MAP[img_type]
+
+    return img_frame.getFrame(), FORMAT_MAP[img_type]
+
+
+def img_frame_to_video_frame(img_frame: dai.ImgFrame) -> av.VideoFrame:
+    video_frame = av.VideoFrame.from_ndarray(*img_frame_to_ndarray(img_frame))
+    video_frame.pts = round(
+        img_frame.getTimestamp().total_seconds() / VIDEO_FRAME_TIME_BASE
+    )
+    video_frame.time_base = VIDEO_FRAME_TIME_BASE
 
-    return av.VideoFrame.from_ndarray(img_frame.getFrame(), FORMAT_MAP[img_type])
+    return video_frame
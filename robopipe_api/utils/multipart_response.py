@@ -0,0 +1,73 @@
+import anyio
+from fastapi import Response
+from starlette.types import Receive, Scope, Send
+
+from typing import Any, Awaitable, Callable
+
+from ..websocket import MessageSink, WebSocket
+
+
+class MultipartStreamResponse(Response, WebSocket):
+    def __init__(
+        self,
+        subscribe: Callable[[MessageSink], Awaitable[None]],
+        unsubscribe: Callable[[MessageSink], None],
+        boundary: str,
+    ):
+        super().__init__(
+            media_type=f"multipart/x-mixed-replace; boundary={boundary}",
+            headers={"Cache-Control": "no-cache"},
+        )
+        self.subscribe = subscribe
+        self.unsubscribe = unsubscribe
+        self.boundary = boundary.encode()
+        self.asgi_send: Send | None = None
+        self.asgi_receive: Receive | None = None
+        self.closed = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        self.asgi_send = send
+        self.asgi_receive = receive
+
+        async with anyio.create_task_group() as tg:
+            tg.start_soon(self.wait_for_disconnect)
+            await self.accept()
+            await self.subscribe(self)
+            tg.cancel_scope.cancel()
+
+    async def wait_for_disconnect(self):
+        while (await self.receive())["type"] != "http.disconnect":
+            pass
+
+        self.closed = True
+        self.unsubscribe(self)
+
+    async def accept(self):
+        await self.asgi_send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+
+    async def close(self):
+        if self.closed:
+            return
+
+        self.closed = True
+        await self.asgi_send(
+            {
+                "type": "http.response.body",
+                "body": b"--" + self.boundary + b"--\r\n",
+                "more_body": False,
+            }
+        )
+
+    async def send(self, data: bytes | Any):
+        await self.asgi_send(
+            {"type": "http.response.body", "body": data, "more_body": True}
+        )
+
+    async def receive(self) -> dict:
+        return await self.asgi_receive()
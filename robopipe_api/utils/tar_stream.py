@@ -0,0 +1,20 @@
+import tarfile
+
+TAR_BLOCK_SIZE = 512
+# Two empty blocks mark the end of the archive
+TAR_END = b"\0" * TAR_BLOCK_SIZE * 2
+
+
+def tar_entry(name: str, data: bytes, mtime: float) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = len(data)
+    info.mtime = int(mtime)
+    info.mode = 0o644
+
+    return b"".join(
+        (
+            info.tobuf(tarfile.USTAR_FORMAT),
+            data,
+            b"\0" * (-len(data) % TAR_BLOCK_SIZE),
+        )
+    )
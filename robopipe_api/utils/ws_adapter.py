@@ -2,7 +2,7 @@ import fastapi
 
 from typing import Any
 
-from ..websocket import WebSocket
+from ..websocket import MessageSink, WebSocket
 
 
 class WsAdapter(WebSocket):
@@ -18,7 +18,7 @@ class WsAdapter(WebSocket):
     def send(self, data: str | bytes | dict | Any):
         if isinstance(data, str):
             return self.ws.send_text(data)
-        elif isinstance(data, bytes):
+        elif isinstance(data, (bytes, bytearray, memoryview)):
             return self.ws.send_bytes(data)
         elif isinstance(data, dict):
             return self.ws.send_json(data)
@@ -27,3 +27,15 @@ class WsAdapter(WebSocket):
 
     def receive(self):
         return self.ws.receive()
+
+
+class WsSideChannel(MessageSink):
+    def __init__(self, ws: MessageSink):
+        self.ws = ws
+
+    async def close(self):
+        # The connection belongs to the main channel, it outlives the side channel
+        pass
+
+    def send(self, data: str | bytes | dict | Any):
+        return self.ws.send(data)
@@ -1,51 +1,117 @@
 import av
+import depthai as dai
 
+from collections import deque
+from dataclasses import dataclass
 import fractions
 import io
 import math
+import time
 
 
-from .camera.sensor.sensor_base import SensorBase
+from .camera.sensor.sensor_base import SensorBase, VideoReader
+from .camera.video_encoding import VideoEncodingConfig
+from .metrics import EncoderMetrics
+from .utils.buffer_pool import BufferPool, BufferPoolSink, PooledBuffer
+from .utils.image import VIDEO_FRAME_TIME_BASE
+
+
+@dataclass
+class VideoFragment:
+    data: bytes | memoryview
+    keyframe: bool = True
+    buffer: PooledBuffer | None = None
+    timestamp: float | None = None
+    # Host monotonic time the frame was captured at
+    capture_time: float | None = None
+
+    def acquire(self):
+        if self.buffer is not None:
+            self.buffer.acquire()
+
+    def release(self):
+        if self.buffer is not None:
+            self.buffer.release()
 
 
 class VideoEncoder:
+    supports_rate_control = True
+    # Keeps the capture timestamps in the fragments instead of starting from 0
     CONTAINER_OPTIONS = {
-        "movflags": "frag_keyframe+empty_moov+faststart+default_base_moof",
+        "movflags": "frag_every_frame+empty_moov+default_base_moof+frag_discont",
+        "avoid_negative_ts": "disabled",
         "flush_packets": "1",
     }
+    CONTAINER_BUFFER_SIZE = 1024 * 1024
+    # Formats libx264 accepts without a host side colour conversion
+    NATIVE_PIXEL_FORMATS = ("nv12", "yuv420p")
     ENCODER_OPTIONS = {
         "tune": "zerolatency",
         "preset": "ultrafast",
-        "reset_timestamps": "1",
     }
+    TIME_BASE = fractions.Fraction(1, 90000)
 
     def __init__(
         self,
-        sensor: SensorBase,
+        sensor: VideoReader,
+        encoding: VideoEncodingConfig | None = None,
+        height: int | None = None,
         container_options: dict = CONTAINER_OPTIONS,
         encoder_options: dict = ENCODER_OPTIONS,
     ):
         self.sensor = sensor
-        self.buffer = io.BytesIO()
-        self.container = av.open(self.buffer, "w", "mp4", options=container_options)
+        self.encoding = encoding or VideoEncodingConfig()
+        self.open_container(container_options)
 
-        sample_frame = sensor.get_video_frame()
+        sample_frame = self.read_frame()
+        self.source_height = sample_frame.height
+
+        if height is None or height >= sample_frame.height:
+            self.width = sample_frame.width
+            self.height = sample_frame.height
+        else:
+            self.width = (
+                round(sample_frame.width * height / sample_frame.height / 2) * 2
+            )
+            self.height = height - height % 2
 
-        fps = fractions.Fraction(self.sensor.config.fps)
-        video_stream = self.container.add_stream("h264", fps, options=encoder_options)
-        video_stream.rate = fps
-        video_stream.width = sample_frame.width
-        video_stream.height = sample_frame.height
-        video_stream.gop_size = 1
         bit_rate = math.ceil(
-            sample_frame.width
-            * sample_frame.height
+            self.width
+            * self.height
             * 0.5  # High Quality video
             * self.sensor.config.fps
         )
+        self.bit_rate = bit_rate
+        self.frame_interval = 1
+        self.frame_index = 0
+
+        fps = fractions.Fraction(self.sensor.config.fps)
+        video_stream = self.container.add_stream(
+            "h264",
+            fps,
+            # libx264 only accepts bitrate changes of an open encoder under VBV
+            options={
+                **encoder_options,
+                "maxrate": str(bit_rate),
+                "bufsize": str(bit_rate),
+            },
+        )
+        video_stream.rate = fps
+        video_stream.width = self.width
+        video_stream.height = self.height
+        video_stream.pix_fmt = (
+            sample_frame.format.name
+            if sample_frame.format.name in self.NATIVE_PIXEL_FORMATS
+            else "yuv420p"
+        )
+        video_stream.gop_size = self.encoding.gop_size
         video_stream.bit_rate = bit_rate
+        video_stream.time_base = self.TIME_BASE
+        video_stream.codec_context.time_base = self.TIME_BASE
         self.video_stream = video_stream
-        self.initialization_fragment = self.next()
+        self.initialization_fragment = self.read_init_fragment(
+            self.mux(self.encode(sample_frame))
+        )
 
     def __del__(self):
         self.container.close()
@@ -56,21 +122,213 @@ class VideoEncoder:
     def __next__(self):
         return self.next()
 
-    def next(self):
-        try:
-            frame = self.sensor.get_video_frame()
-        except:
-            raise StopIteration()
+    def open_container(self, container_options: dict):
+        self.buffer_pool = BufferPool()
+        self.sink = BufferPoolSink(self.buffer_pool)
+        self.container = av.open(
+            self.sink,
+            "w",
+            "mp4",
+            options=container_options,
+            buffer_size=self.CONTAINER_BUFFER_SIZE,
+        )
+        self.pending_packets: deque[tuple[bool, float, float]] = deque()
+        self.last_pts: int | None = None
+        self.metrics = EncoderMetrics()
+
+    def next(self) -> VideoFragment:
+        fragment = None
+
+        while fragment is None:
+            try:
+                frame = self.read_frame()
+            except:
+                raise StopIteration()
+
+            fragment = self.encode_frame(frame)
 
+        return fragment
+
+    def encode_frame(self, frame: av.VideoFrame) -> VideoFragment | None:
+        if self.frame_index % self.frame_interval:
+            self.frame_index += 1
+            self.metrics.skipped_frames.increment()
+            return None
+
+        fragment = self.mux(self.encode(frame))
+
+        if fragment is None:
+            return None
+
+        # Each fragment is flushed once the following packet is muxed, which
+        # leaves only the most recent packet pending
+        keyframe, timestamp, capture_time = self.pending_packets.popleft()
+
+        while len(self.pending_packets) > 1:
+            self.pending_packets.popleft()
+
+        self.metrics.fragment_size.record(len(fragment.view))
+
+        return VideoFragment(fragment.view, keyframe, fragment, timestamp, capture_time)
+
+    def read_frame(self) -> av.VideoFrame:
+        return self.sensor.get_video_frame()
+
+    def encode(self, frame: av.VideoFrame) -> list[av.Packet]:
+        start = time.perf_counter()
+        pts = self.get_pts(
+            frame.pts * frame.time_base
+            if frame.pts is not None and frame.time_base is not None
+            else time.monotonic()
+        )
+
+        # Converted here rather than implicitly by the encoder, so it is measured
+        if (
+            frame.width != self.width
+            or frame.height != self.height
+            or frame.format.name != self.video_stream.pix_fmt
+        ):
+            frame = frame.reformat(self.width, self.height, self.video_stream.pix_fmt)
+
+        converted = time.perf_counter()
+
+        if self.video_stream.codec_context.bit_rate != self.bit_rate:
+            self.video_stream.codec_context.bit_rate = self.bit_rate
+
+        frame.pts = pts
+        frame.time_base = self.TIME_BASE
+        self.frame_index += 1
         packets = self.video_stream.encode(frame)
+        self.metrics.conversion_time.record(converted - start)
+        self.metrics.encode_time.record(time.perf_counter() - converted)
+
+        return packets
+
+    def mux(self, packets: list[av.Packet]) -> PooledBuffer | None:
+        timestamp = time.time()
+        start = time.perf_counter()
+
+        for packet in packets:
+            self.pending_packets.append(
+                (packet.is_keyframe, timestamp, float(packet.pts * self.TIME_BASE))
+            )
+
         self.container.mux(packets)
-        buffer = self.buffer.getvalue()
+        fragment = self.sink.take()
+        self.metrics.mux_time.record(time.perf_counter() - start)
+
+        return fragment
+
+    @classmethod
+    def to_pts(cls, capture_time: float) -> int:
+        # Host frames carry their capture time in microseconds, every other source
+        # is rounded the same way first, so equal capture times get equal PTS
+        microseconds = round(capture_time / VIDEO_FRAME_TIME_BASE)
+
+        return round(microseconds * VIDEO_FRAME_TIME_BASE / cls.TIME_BASE)
+
+    def get_pts(self, capture_time: float) -> int:
+        # Frames are stamped with their capture time on the host monotonic clock,
+        # so all renditions and sensors share one timeline
+        pts = self.to_pts(capture_time)
 
-        self.buffer.seek(0)
-        self.buffer.truncate()
+        if self.last_pts is not None and pts <= self.last_pts:
+            pts = self.last_pts + 1
 
-        return buffer
+        self.last_pts = pts
+
+        return pts
+
+    @staticmethod
+    def read_init_fragment(fragment: PooledBuffer) -> bytes:
+        init_fragment = bytes(fragment.view)
+        fragment.release()
+
+        return init_fragment
 
     @property
     def init_fragment(self):
         return self.initialization_fragment
+
+
+class DeviceVideoEncoder(VideoEncoder):
+    supports_rate_control = False
+    STREAM_FORMATS = {
+        dai.EncodedFrame.Profile.AVC: "h264",
+        dai.EncodedFrame.Profile.HEVC: "hevc",
+        dai.EncodedFrame.Profile.JPEG: "mjpeg",
+    }
+
+    def __init__(
+        self,
+        sensor: SensorBase,
+        encoding: VideoEncodingConfig | None = None,
+        container_options: dict = VideoEncoder.CONTAINER_OPTIONS,
+    ):
+        self.sensor = sensor
+        self.encoding = encoding or VideoEncodingConfig()
+        self.open_container(container_options)
+
+        keyframe = self.read_frame()
+
+        while not self.is_keyframe(keyframe):
+            keyframe = self.read_frame()
+
+        self.width = keyframe.getWidth()
+        self.height = keyframe.getHeight()
+        self.source_height = self.height
+
+        # The device bitstream already carries the parameter sets, so the stream
+        # is created from a demuxed template instead of opening a host encoder
+        probe = av.open(
+            io.BytesIO(keyframe.getData()),
+            "r",
+            self.STREAM_FORMATS[keyframe.getProfile()],
+        )
+        self.video_stream = self.container.add_stream(template=probe.streams.video[0])
+        probe.close()
+
+        self.frame_interval = 1
+        self.frame_index = 0
+        self.initialization_fragment = self.read_init_fragment(
+            self.mux(self.encode(keyframe))
+        )
+
+    def read_frame(self) -> dai.EncodedFrame:
+        return self.sensor.get_encoded_frame()
+
+    def encode(self, frame: dai.EncodedFrame) -> list[av.Packet]:
+        packet = av.Packet(frame.getData())
+        packet.stream = self.video_stream
+        packet.time_base = self.TIME_BASE
+        packet.pts = self.get_pts(frame.getTimestamp().total_seconds())
+        packet.dts = packet.pts
+        packet.is_keyframe = self.is_keyframe(frame)
+        self.frame_index += 1
+
+        return [packet]
+
+    @staticmethod
+    def is_keyframe(frame: dai.EncodedFrame):
+        return (
+            frame.getProfile() == dai.EncodedFrame.Profile.JPEG
+            or frame.getFrameType() == dai.EncodedFrame.FrameType.I
+        )
+
+
+def create_video_encoder(
+    sensor: SensorBase | VideoReader,
+    encoding: VideoEncodingConfig | None = None,
+    height: int | None = None,
+    in_process: bool = False,
+) -> VideoEncoder:
+    # The device bitstream can only be muxed as is, in its native resolution
+    if sensor.encoded_on_device:
+        return DeviceVideoEncoder(sensor, encoding)
+
+    if in_process:
+        from .process_encoder import ProcessVideoEncoder
+
+        return ProcessVideoEncoder(sensor, encoding, height)
+
+    return VideoEncoder(sensor, encoding, height)
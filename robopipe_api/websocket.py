@@ -2,15 +2,17 @@ from abc import abstractmethod
 from typing import Protocol, Any
 
 
-class WebSocket(Protocol):
-    @abstractmethod
-    async def accept(self): ...
-
+class MessageSink(Protocol):
     @abstractmethod
     async def close(self): ...
 
     @abstractmethod
     async def send(self, data: str | bytes | dict | Any): ...
 
+
+class WebSocket(MessageSink, Protocol):
+    @abstractmethod
+    async def accept(self): ...
+
     @abstractmethod
     async def receive(self) -> str | bytes | Any: ...